@@ -0,0 +1,147 @@
+"""
+AST arena benchmark
+
+Parses a large synthetic Mew program to AST objects and to an arena (see
+mew_pl/ast_arena.py) and reports peak RSS of both (each one is parsed in
+a fresh process, the number is peak RSS above RSS before parsing) and
+time to walk all nodes: AST objects, arena views, and kinds of nodes read
+right from the arena array. Fails (exit code 1) if the arena AST differs
+from the objects, or if walks find different nodes.
+
+Usage: python3 benchmarks/ast_arena.py [lines]
+"""
+
+import os
+import sys
+import gc
+import time
+import collections
+import subprocess as sp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mew_pl import Compiler
+from mew_pl import ast_arena
+
+import parser as parser_benchmark
+
+REPEAT = 3
+
+
+def rss():
+    """
+    (current, peak) RSS of this process in KiB
+
+    Read from /proc, because peak of getrusage() is inherited from the
+    parent process.
+    """
+    with open("/proc/self/status") as f:
+        status = dict(line.split(":", 1) for line in f)
+    return int(status["VmRSS"].split()[0]), int(status["VmHWM"].split()[0])
+
+
+def child(mode, lines):
+    """
+    Parses in this process and prints peak RSS (KiB) above RSS before
+    """
+    text = parser_benchmark.synthetic(lines)
+    comp = Compiler(build_cache=None, arena=mode == "arena")
+    comp.parse("x = 1")  # Load parser tables
+
+    gc.collect()
+    before, _ = rss()
+    ast = comp.parse(text)
+    print(rss()[1] - before)
+
+
+def measure_rss(mode, lines):
+    output = sp.run([sys.executable, os.path.abspath(__file__), "--child", mode, str(lines)],
+                    check=True, capture_output=True, text=True).stdout
+    return int(output)
+
+
+def walk(root):
+    """
+    Counter of kinds of all nodes
+    """
+    layouts = ast_arena.LAYOUTS
+    kinds = collections.Counter()
+    stack = [root]
+
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif node is not None:
+            kinds[node.kind] += 1
+            stack.extend(getattr(node, i) for i in layouts[node.kind].children)
+
+    return kinds
+
+
+def scan(arena):
+    """
+    Same as walk(), from the arena array (also counts no longer used nodes,
+    but the parser leaves none)
+    """
+    kinds = collections.Counter(arena.kinds)
+    del kinds[ast_arena.LIST], kinds[ast_arena.NONE]
+    return kinds
+
+
+def best_time(func, *args):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    if sys.argv[1:2] == ["--child"]:
+        return child(sys.argv[2], int(sys.argv[3]))
+
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+    text = parser_benchmark.synthetic(lines)
+    failed = False
+
+    objects = Compiler(build_cache=None).parse(text)
+    views = Compiler(build_cache=None, arena=True).parse(text)
+    arena = views._arena
+
+    if repr(objects) != repr(views):
+        print("FAILED: arena AST differs from AST objects")
+        failed = True
+
+    object_kinds, object_time = best_time(walk, objects)
+    view_kinds, view_time = best_time(walk, views)
+    scan_kinds, scan_time = best_time(scan, arena)
+
+    if not object_kinds == view_kinds == scan_kinds:
+        print("FAILED: walks found different nodes")
+        failed = True
+
+    nodes = sum(object_kinds.values())
+    print(f"{lines} lines, {nodes} nodes, {len(arena)} arena nodes "
+          f"(arrays {arena.nbytes() / 1024 / 1024:.1f} MiB)")
+
+    del objects, views, arena
+    gc.collect()
+
+    object_rss = measure_rss("objects", lines)
+    arena_rss = measure_rss("arena", lines)
+
+    print(f"peak RSS of parsing: objects {object_rss / 1024:.1f} MiB, arena {arena_rss / 1024:.1f} MiB "
+          f"(saved {1 - arena_rss / object_rss:.1%})")
+    print(f"walk of all nodes:   objects {object_time * 1000:.1f} ms, views {view_time * 1000:.1f} ms, "
+          f"kinds array {scan_time * 1000:.1f} ms")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+AST memory and dispatch benchmark
+
+Parses a large synthetic Mew program and copies its AST twice: to plain
+dataclasses (nodes with __dict__, like the AST used to be) and to the
+slotted node classes. Memory of the copies is measured with tracemalloc
+(leaf values like names are shared, so only nodes and lists are counted)
+and reported in bytes per node. Also times dispatch over all nodes with
+an if/elif chain of `type(node) is` checks and with a table indexed by
+node kind. Fails (exit code 1) if the copies differ from the AST.
+
+Usage: python3 benchmarks/ast_memory.py [lines]
+"""
+
+import os
+import sys
+import gc
+import time
+import tracemalloc
+import dataclasses
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mew_pl import Compiler
+from mew_pl import abstract_syntax_tree as AST
+
+import parser as parser_benchmark
+
+REPEAT = 5
+
+
+def plain_classes():
+    """
+    {node class: plain dataclass with the same fields (and their options)}
+    """
+    return {
+        cls: dataclasses.make_dataclass(cls.__name__, [
+            (i.name, i.type, dataclasses.field(default=i.default, repr=i.repr, compare=i.compare))
+            for i in dataclasses.fields(cls)
+        ])
+        for cls in AST.NODES
+    }
+
+
+def rebuild(node, classes):
+    """
+    Copy of the AST made of `classes` (values that are not nodes or lists
+    are shared)
+    """
+    if isinstance(node, list):
+        return [rebuild(i, classes) for i in node]
+
+    cls = classes.get(type(node))
+    if cls is None:
+        return node
+
+    return cls(*[rebuild(getattr(node, i.name), classes) for i in dataclasses.fields(node)])
+
+
+def measure(ast, classes):
+    gc.collect()
+    tracemalloc.start()
+    copy = rebuild(ast, classes)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return copy, size
+
+
+def all_nodes(ast):
+    nodes = []
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif dataclasses.is_dataclass(node):
+            nodes.append(node)
+            stack.extend(getattr(node, i.name) for i in dataclasses.fields(node))
+    return nodes
+
+
+def dispatch_chain(nodes):
+    count = 0
+    for node in nodes:
+        t = type(node)
+        if t is AST.Program:
+            count += 1
+        elif t is AST.Func:
+            count += 2
+        elif t is AST.ExternC:
+            count += 3
+        elif t is AST.End:
+            count += 4
+        elif t is AST.FunctionCall:
+            count += 5
+        elif t is AST.Assignment:
+            count += 6
+        elif t is AST.IfElse:
+            count += 7
+        elif t is AST.Return:
+            count += 8
+        elif t is AST.While:
+            count += 9
+        elif t is AST.BinOp:
+            count += 10
+        elif t is AST.Name:
+            count += 11
+        elif t is AST.Integer:
+            count += 12
+        else:
+            count += 13
+    return count
+
+
+TABLE = AST.dispatch_table({
+    AST.Program: 1, AST.Func: 2, AST.ExternC: 3, AST.End: 4, AST.FunctionCall: 5,
+    AST.Assignment: 6, AST.IfElse: 7, AST.Return: 8, AST.While: 9, AST.BinOp: 10,
+    AST.Name: 11, AST.Integer: 12,
+}, 13)
+
+
+def dispatch_table(nodes):
+    table = TABLE
+    count = 0
+    for node in nodes:
+        count += table[node.kind]
+    return count
+
+
+def best_time(func, *args):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+
+    comp = Compiler(build_cache=None)
+    ast = comp.parse(parser_benchmark.synthetic(lines))
+    nodes = all_nodes(ast)
+
+    plain, plain_size = measure(ast, plain_classes())
+    slotted, slotted_size = measure(ast, {cls: cls for cls in AST.NODES})
+
+    failed = False
+    if repr(plain) != repr(ast) or repr(slotted) != repr(ast):
+        print("FAILED: copies of the AST differ from it")
+        failed = True
+    del plain
+
+    print(f"{lines} lines, {len(nodes)} nodes")
+    print(f"{'':18} {'MiB':>8} {'bytes/node':>11}")
+    print(f"{'plain dataclasses':18} {plain_size / 1024 / 1024:8.1f} {plain_size / len(nodes):11.1f}")
+    print(f"{'slotted nodes':18} {slotted_size / 1024 / 1024:8.1f} {slotted_size / len(nodes):11.1f}")
+    print(f"saved: {1 - slotted_size / plain_size:.1%}")
+
+    chain_result, chain_time = best_time(dispatch_chain, nodes)
+    table_result, table_time = best_time(dispatch_table, nodes)
+
+    if chain_result != table_result:
+        print("FAILED: dispatch results differ")
+        failed = True
+
+    print(f"dispatch of all nodes: if/elif chain {chain_time * 1000:.1f} ms, "
+          f"kind table {table_time * 1000:.1f} ms ({chain_time / table_time:.2f}x)")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Diagnostics location check
+
+Compiles sources with errors on negated values, with the LALR parser and
+with the Pratt expression parser, and checks line, column and source line
+of every diagnostic.
+
+Usage: python3 benchmarks/diagnostics.py
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mew_pl import Compiler
+
+# Source, expected (line, column, source line) of its first diagnostic
+CASES = [
+    ("func main() {\n    bool y = -1\n}", (2, 13, "    bool y = -1")),
+    ("func main() {\n    i32 y = -1.5\n}", (2, 12, "    i32 y = -1.5")),
+    ("func main() {\n    i32 y = --1.5\n}", (2, 12, "    i32 y = --1.5")),
+    ("func main() {\n    i32 q = 1\n    bool y = -q\n}", (3, 13, "    bool y = -q")),
+    ("func main() {\n\n    bool y = -q + 1\n}", (3, 13, "    bool y = -q + 1")),
+    ("func main() {\n    i32 q = 1\n    bool y = -1 + q\n}", (3, None, "    bool y = -1 + q")),
+]
+
+
+def main():
+    failed = 0
+
+    for pratt in (False, True):
+        for source, expected in CASES:
+            diagnostics = Compiler(pratt=pratt).compile(source, "check.mew").diagnostics
+            errors = [i for i in diagnostics if i.severity == "error"]
+            got = (errors[0].lineno, errors[0].column, errors[0].line) if errors else None
+
+            if got != expected:
+                parser = "pratt" if pratt else "lalr"
+                print(f"FAILED ({parser}): {source!r}: expected {expected}, got {got}")
+                failed += 1
+
+    print(f"{len(CASES) * 2} cases, {failed} failed")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
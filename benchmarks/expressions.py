@@ -0,0 +1,101 @@
+"""
+Expression parser benchmark
+
+Parses expression-heavy synthetic Mew sources (a lookup table initializer,
+unrolled math) and an ordinary program with the LALR parser alone and with
+binary expressions parsed by precedence climbing (expressions.ExpressionFilter),
+and reports tokens/sec. Tokens are lexed once beforehand. Fails (exit code 1)
+if the two ways build different ASTs, with or without folding of constants.
+
+Usage: python3 benchmarks/expressions.py [lines]
+"""
+
+import os
+import sys
+import gc
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mew_pl import Compiler
+from mew_pl.compiler import TokenReplay
+
+import parser as parser_benchmark
+
+REPEAT = 3
+
+
+def lookup_table(lines):
+    return "".join(
+        f"table.values{i % 16} = {i} * 3 + {i % 7} * 5 - ({i} + 1) / 2 + 0x{i:x}\n"
+        for i in range(lines)
+    )
+
+
+def unrolled_math(lines):
+    return "".join(
+        f"acc = acc + a.x{i % 8} * b.y{i % 8} - c{i % 3} * (d - e{i % 5}) / {i + 1} >= limit\n"
+        for i in range(lines)
+    )
+
+
+SOURCES = [
+    ("lookup table", lookup_table),
+    ("unrolled math", unrolled_math),
+    ("ordinary code", parser_benchmark.synthetic),
+]
+
+
+def parse(comp, tokens):
+    return comp.parser.parseopt_notrack(lexer=comp.filter_tokens(TokenReplay(tokens, comp.lexer)))
+
+
+def run(comp, tokens):
+    best = None
+    for _ in range(REPEAT):
+        lexer = comp.filter_tokens(TokenReplay(tokens, comp.lexer))
+        ast = None  # Free the previous one before collecting
+        gc.collect()
+
+        start = time.perf_counter()
+        ast = comp.parser.parseopt_notrack(lexer=lexer)
+        elapsed = time.perf_counter() - start
+
+        best = elapsed if best is None else min(best, elapsed)
+    return ast, best
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    failed = False
+
+    print(f"{'source':<16} {'tokens':>8} {'LALR (tok/s)':>14} {'Pratt (tok/s)':>14} {'speedup':>8}")
+
+    for name, make in SOURCES:
+        lalr = Compiler(build_cache=None)
+        lalr.lexer.input(make(lines))
+        tokens = list(lalr.lexer)
+
+        for optimize in (False, True):
+            lalr_ast = parse(Compiler(build_cache=None, optimize_binops=optimize), tokens)
+            pratt_ast = parse(Compiler(build_cache=None, optimize_binops=optimize, pratt=True), tokens)
+
+            if repr(lalr_ast) != repr(pratt_ast):
+                print(f"FAILED: {name}: ASTs differ (optimize_binops={optimize})")
+                failed = True
+
+        # Speed is measured without folding
+        lalr_ast = pratt_ast = None
+        _, lalr_time = run(lalr, tokens)
+        _, pratt_time = run(Compiler(build_cache=None, pratt=True), tokens)
+
+        print(f"{name:<16} {len(tokens):>8} {len(tokens) / lalr_time:>14.0f} "
+              f"{len(tokens) / pratt_time:>14.0f} {lalr_time / pratt_time:>7.2f}x")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Import-time regression check for the `mew` entry point
+
+Imports `mew_pl.__main__` in a fresh interpreter with `-X importtime` and
+fails (exit code 1) when the cumulative import time exceeds the budget or
+when a module that must be loaded lazily shows up.
+
+Usage: python3 benchmarks/import_time.py [budget_ms]
+"""
+
+import os
+import sys
+import subprocess as sp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY = "mew_pl.__main__"
+
+# Modules which are needed only when something is compiled
+LAZY = ("yaml", "colorama", "pprint", "mew_pl.lex_and_parse", "mew_pl.ply.yacc")
+
+
+def import_times():
+    proc = sp.run([sys.executable, "-X", "importtime", "-c", f"import {ENTRY}"],
+                  cwd=ROOT, stderr=sp.PIPE, stdout=sp.DEVNULL, text=True, check=True)
+    times = {}
+
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+
+    return times
+
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 50.0
+
+    # Take the best of a few runs to filter out noise
+    runs = [import_times() for _ in range(5)]
+    # Cumulative time of the entry point includes its parent package
+    total = min(run.get(ENTRY, 0) for run in runs) / 1000
+
+    print(f"{ENTRY}: {total:.1f} ms (budget {budget:.1f} ms)")
+
+    failed = False
+    eager = [name for name in LAZY if name in runs[0]]
+
+    if eager:
+        print("error: imported eagerly:", ", ".join(eager))
+        failed = True
+
+    if total > budget:
+        print("error: import time budget exceeded")
+        failed = True
+
+    exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,522 @@
+"""
+LALR table generation benchmark
+
+Builds parse tables of Mew's grammar, a few textbook grammars and large
+generated ones with the table generator of the vendored PLY and with the
+reference implementation below (the generator as PLY had it before: lists
+for lookahead sets, a goto cache keyed by object ids and a recursive
+digraph), and reports the time of both. Fails (exit code 1) if any tables,
+conflicts or reduce counts differ.
+
+Usage: python3 benchmarks/lalr_tables.py [levels]
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mew_pl.ply import yacc
+from mew_pl import grammar_report
+
+REPEAT = 3
+
+
+def reference_digraph(X, R, FP):
+    N = {}
+    for x in X:
+        N[x] = 0
+    stack = []
+    F = {}
+    for x in X:
+        if N[x] == 0:
+            reference_traverse(x, N, stack, F, X, R, FP)
+    return F
+
+
+def reference_traverse(x, N, stack, F, X, R, FP):
+    stack.append(x)
+    d = len(stack)
+    N[x] = d
+    F[x] = FP(x)
+
+    for y in R(x):
+        if N[y] == 0:
+            reference_traverse(y, N, stack, F, X, R, FP)
+        N[x] = min(N[x], N[y])
+        for a in F.get(y, []):
+            if a not in F[x]:
+                F[x].append(a)
+    if N[x] == d:
+        N[stack[-1]] = yacc.MAXINT
+        F[stack[-1]] = F[x]
+        element = stack.pop()
+        while element != x:
+            N[stack[-1]] = yacc.MAXINT
+            F[stack[-1]] = F[x]
+            element = stack.pop()
+
+
+class ReferenceLRTable(yacc.LRTable):
+    """
+    LALR(1) table generator of PLY before bitsets and the kernel index
+
+    Logging is left out, everything else is as it was.
+    """
+    def __init__(self, grammar, log=None):
+        self.lr_goto_cache = {}
+        self.lr0_cidhash = {}
+        self._add_count = 0
+        super().__init__(grammar, log)
+
+    def lr0_closure(self, I):
+        self._add_count += 1
+
+        J = I[:]
+        didadd = True
+        while didadd:
+            didadd = False
+            for j in J:
+                for x in j.lr_after:
+                    if getattr(x, 'lr0_added', 0) == self._add_count:
+                        continue
+                    J.append(x.lr_next)
+                    x.lr0_added = self._add_count
+                    didadd = True
+
+        return J
+
+    def lr0_goto(self, I, x):
+        g = self.lr_goto_cache.get((id(I), x))
+        if g:
+            return g
+
+        s = self.lr_goto_cache.get(x)
+        if not s:
+            s = {}
+            self.lr_goto_cache[x] = s
+
+        gs = []
+        for p in I:
+            n = p.lr_next
+            if n and n.lr_before == x:
+                s1 = s.get(id(n))
+                if not s1:
+                    s1 = {}
+                    s[id(n)] = s1
+                gs.append(n)
+                s = s1
+        g = s.get('$end')
+        if not g:
+            if gs:
+                g = self.lr0_closure(gs)
+                s['$end'] = g
+            else:
+                s['$end'] = gs
+        self.lr_goto_cache[(id(I), x)] = g
+        return g
+
+    def lr0_items(self):
+        C = [self.lr0_closure([self.grammar.Productions[0].lr_next])]
+        i = 0
+        for I in C:
+            self.lr0_cidhash[id(I)] = i
+            i += 1
+
+        i = 0
+        while i < len(C):
+            I = C[i]
+            i += 1
+
+            asyms = {}
+            for ii in I:
+                for s in ii.usyms:
+                    asyms[s] = None
+
+            for x in asyms:
+                g = self.lr0_goto(I, x)
+                if not g or id(g) in self.lr0_cidhash:
+                    continue
+                self.lr0_cidhash[id(g)] = len(C)
+                C.append(g)
+
+        return C
+
+    def find_nonterminal_transitions(self, C):
+        trans = []
+        for stateno, state in enumerate(C):
+            for p in state:
+                if p.lr_index < p.len - 1:
+                    t = (stateno, p.prod[p.lr_index+1])
+                    if t[1] in self.grammar.Nonterminals:
+                        if t not in trans:
+                            trans.append(t)
+        return trans
+
+    def dr_relation(self, C, trans, nullable):
+        state, N = trans
+        terms = []
+
+        g = self.lr0_goto(C[state], N)
+        for p in g:
+            if p.lr_index < p.len - 1:
+                a = p.prod[p.lr_index+1]
+                if a in self.grammar.Terminals:
+                    if a not in terms:
+                        terms.append(a)
+
+        if state == 0 and N == self.grammar.Productions[0].prod[0]:
+            terms.append('$end')
+
+        return terms
+
+    def reads_relation(self, C, trans, empty):
+        rel = []
+        state, N = trans
+
+        g = self.lr0_goto(C[state], N)
+        j = self.lr0_cidhash.get(id(g), -1)
+        for p in g:
+            if p.lr_index < p.len - 1:
+                a = p.prod[p.lr_index + 1]
+                if a in empty:
+                    rel.append((j, a))
+
+        return rel
+
+    def compute_lookback_includes(self, C, trans, nullable):
+        lookdict = {}
+        includedict = {}
+
+        dtrans = {}
+        for t in trans:
+            dtrans[t] = 1
+
+        for state, N in trans:
+            lookb = []
+            includes = []
+            for p in C[state]:
+                if p.name != N:
+                    continue
+
+                lr_index = p.lr_index
+                j = state
+                while lr_index < p.len - 1:
+                    lr_index = lr_index + 1
+                    t = p.prod[lr_index]
+
+                    if (j, t) in dtrans:
+                        li = lr_index + 1
+                        while li < p.len:
+                            if p.prod[li] in self.grammar.Terminals:
+                                break
+                            if p.prod[li] not in nullable:
+                                break
+                            li = li + 1
+                        else:
+                            includes.append((j, t))
+
+                    g = self.lr0_goto(C[j], t)
+                    j = self.lr0_cidhash.get(id(g), -1)
+
+                for r in C[j]:
+                    if r.name != p.name:
+                        continue
+                    if r.len != p.len:
+                        continue
+                    i = 0
+                    while i < r.lr_index:
+                        if r.prod[i] != p.prod[i+1]:
+                            break
+                        i = i + 1
+                    else:
+                        lookb.append((j, r))
+            for i in includes:
+                if i not in includedict:
+                    includedict[i] = []
+                includedict[i].append((state, N))
+            lookdict[(state, N)] = lookb
+
+        return lookdict, includedict
+
+    def compute_read_sets(self, C, ntrans, nullable):
+        FP = lambda x: self.dr_relation(C, x, nullable)
+        R = lambda x: self.reads_relation(C, x, nullable)
+        return reference_digraph(ntrans, R, FP)
+
+    def compute_follow_sets(self, ntrans, readsets, inclsets):
+        FP = lambda x: readsets[x]
+        R = lambda x: inclsets.get(x, [])
+        return reference_digraph(ntrans, R, FP)
+
+    def add_lookaheads(self, lookbacks, followset):
+        for trans, lb in lookbacks.items():
+            for state, p in lb:
+                if state not in p.lookaheads:
+                    p.lookaheads[state] = []
+                f = followset.get(trans, [])
+                for a in f:
+                    if a not in p.lookaheads[state]:
+                        p.lookaheads[state].append(a)
+
+    def add_lalr_lookaheads(self, C):
+        nullable = self.compute_nullable_nonterminals()
+        trans = self.find_nonterminal_transitions(C)
+        readsets = self.compute_read_sets(C, trans, nullable)
+        lookd, included = self.compute_lookback_includes(C, trans, nullable)
+        followsets = self.compute_follow_sets(trans, readsets, included)
+        self.add_lookaheads(lookd, followsets)
+
+    def lr_parse_table(self):
+        Productions = self.grammar.Productions
+        Precedence = self.grammar.Precedence
+
+        C = self.lr0_items()
+        self.add_lalr_lookaheads(C)
+
+        st = 0
+        for I in C:
+            st_action = {}
+            st_actionp = {}
+            st_goto = {}
+
+            for p in I:
+                if p.len == p.lr_index + 1:
+                    if p.name == "S'":
+                        st_action['$end'] = 0
+                        st_actionp['$end'] = p
+                    else:
+                        for a in p.lookaheads[st]:
+                            r = st_action.get(a)
+                            if r is not None:
+                                if r > 0:
+                                    sprec, slevel = Precedence.get(a, ('right', 0))
+                                    rprec, rlevel = Productions[p.number].prec
+
+                                    if (slevel < rlevel) or ((slevel == rlevel) and (rprec == 'left')):
+                                        st_action[a] = -p.number
+                                        st_actionp[a] = p
+                                        if not slevel and not rlevel:
+                                            self.sr_conflicts.append((st, a, 'reduce'))
+                                        Productions[p.number].reduced += 1
+                                    elif (slevel == rlevel) and (rprec == 'nonassoc'):
+                                        st_action[a] = None
+                                    else:
+                                        if not rlevel:
+                                            self.sr_conflicts.append((st, a, 'shift'))
+                                elif r < 0:
+                                    oldp = Productions[-r]
+                                    pp = Productions[p.number]
+                                    if oldp.line > pp.line:
+                                        st_action[a] = -p.number
+                                        st_actionp[a] = p
+                                        chosenp, rejectp = pp, oldp
+                                        Productions[p.number].reduced += 1
+                                        Productions[oldp.number].reduced -= 1
+                                    else:
+                                        chosenp, rejectp = oldp, pp
+                                    self.rr_conflicts.append((st, chosenp, rejectp))
+                                else:
+                                    raise yacc.LALRError('Unknown conflict in state %d (r=%d)' % (st, r))
+                            else:
+                                st_action[a] = -p.number
+                                st_actionp[a] = p
+                                Productions[p.number].reduced += 1
+                else:
+                    a = p.prod[p.lr_index+1]
+                    if a in self.grammar.Terminals:
+                        g = self.lr0_goto(I, a)
+                        j = self.lr0_cidhash.get(id(g), -1)
+                        if j >= 0:
+                            r = st_action.get(a)
+                            if r is not None:
+                                if r > 0:
+                                    if r != j:
+                                        raise yacc.LALRError('Shift/shift conflict in state %d' % st)
+                                elif r < 0:
+                                    sprec, slevel = Precedence.get(a, ('right', 0))
+                                    rprec, rlevel = Productions[st_actionp[a].number].prec
+
+                                    if (slevel > rlevel) or ((slevel == rlevel) and (rprec == 'right')):
+                                        Productions[st_actionp[a].number].reduced -= 1
+                                        st_action[a] = j
+                                        st_actionp[a] = p
+                                        if not rlevel:
+                                            self.sr_conflicts.append((st, a, 'shift'))
+                                    elif (slevel == rlevel) and (rprec == 'nonassoc'):
+                                        st_action[a] = None
+                                    else:
+                                        if not slevel and not rlevel:
+                                            self.sr_conflicts.append((st, a, 'reduce'))
+                                else:
+                                    raise yacc.LALRError('Unknown conflict in state %d' % st)
+                            else:
+                                st_action[a] = j
+                                st_actionp[a] = p
+
+            nkeys = {}
+            for ii in I:
+                for s in ii.usyms:
+                    if s in self.grammar.Nonterminals:
+                        nkeys[s] = None
+            for n in nkeys:
+                g = self.lr0_goto(I, n)
+                j = self.lr0_cidhash.get(id(g), -1)
+                if j >= 0:
+                    st_goto[n] = j
+
+            self.lr_action[st] = st_action
+            self.lr_goto[st] = st_goto
+            st += 1
+
+
+def mew_grammar():
+    """
+    Grammar of Mew, built the way yacc() builds it
+    """
+    return grammar_report.build_grammar()[0]
+
+
+def make_grammar(tokens, rules, precedence=()):
+    """
+    Grammar of rules like "expr : expr PLUS term | term" (first rule is the start)
+    """
+    grammar = yacc.Grammar(tokens)
+    for level, (assoc, *terms) in enumerate(precedence, 1):
+        for term in terms:
+            grammar.set_precedence(term, assoc, level)
+
+    line = 0
+    for rule in rules:
+        name, alternatives = rule.split(":")
+        for alternative in alternatives.split("|"):
+            line += 1
+            grammar.add_production(name.strip(), alternative.split(), None, "<benchmark>", line)
+    grammar.set_start()
+    return grammar
+
+
+def expressions():
+    # Ambiguous grammar resolved by precedence (and a nonassoc operator)
+    return make_grammar(
+        ["NUM", "PLUS", "MINUS", "TIMES", "DIVIDE", "POWER", "LESS", "LPAREN", "RPAREN"],
+        ["expr : expr PLUS expr | expr MINUS expr | expr TIMES expr | expr DIVIDE expr"
+         " | expr POWER expr | expr LESS expr | MINUS expr | LPAREN expr RPAREN | NUM"],
+        [("nonassoc", "LESS"), ("left", "PLUS", "MINUS"), ("left", "TIMES", "DIVIDE"), ("right", "POWER")])
+
+
+def not_slr():
+    # LALR(1), but not SLR(1) (the Dragon book example)
+    return make_grammar(
+        ["ID", "STAR", "ASSIGN"],
+        ["s : l ASSIGN r | r",
+         "l : STAR r | ID",
+         "r : l"])
+
+
+def nullable():
+    # Lookaheads flow through nullable suffixes (includes relation) and
+    # there are unresolved shift/reduce and reduce/reduce conflicts
+    return make_grammar(
+        ["ID", "NUM", "SEMI", "COMMA", "LBRACE", "RBRACE", "ATTR"],
+        ["program : decls stmts opt_semi",
+         "decls : decls decl | empty",
+         "decl : attrs ID opt_semi",
+         "attrs : attrs ATTR | empty",
+         "stmts : stmts stmt | empty",
+         "stmt : ID args opt_semi | LBRACE stmts RBRACE | NUM | ID",
+         "args : args COMMA arg | arg | empty",
+         "arg : ID | NUM",
+         "opt_semi : SEMI | empty",
+         "empty : "])
+
+
+def layered(levels):
+    """
+    Generated grammar of a language with `levels` binary operator levels
+    """
+    tokens = ["NUM", "ID", "LPAREN", "RPAREN", "SEMI", "ASSIGN", "COMMA", "IF", "LBRACE", "RBRACE"]
+    rules = [
+        "program : program stmt | empty",
+        "stmt : ID ASSIGN e0 end | IF e0 block | block | e0 end",
+        "block : LBRACE program RBRACE",
+        "end : SEMI | empty",
+        "empty : ",
+    ]
+    for i in range(levels):
+        tokens.append(f"OP{i}")
+        rules.append(f"e{i} : e{i} OP{i} e{i + 1} | e{i + 1}")
+    rules.append(f"e{levels} : NUM | ID | ID LPAREN args RPAREN | LPAREN e0 RPAREN")
+    rules.append("args : args COMMA e0 | e0 | empty")
+    return make_grammar(tokens, rules)
+
+
+def build(table_class, make):
+    """
+    Builds tables of a fresh grammar (best time of a few runs)
+    """
+    best = None
+    for _ in range(REPEAT):
+        grammar = make()
+        start = time.perf_counter()
+        lr = table_class(grammar)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return lr, best
+
+
+def differences(ref, new):
+    result = []
+    if ref.lr_action != new.lr_action:
+        result.append("action table")
+    if ref.lr_goto != new.lr_goto:
+        result.append("goto table")
+    if sorted(ref.sr_conflicts) != sorted(new.sr_conflicts):
+        result.append("shift/reduce conflicts")
+
+    def rr(lr):
+        return sorted((state, chosen.number, rejected.number) for state, chosen, rejected in lr.rr_conflicts)
+    if rr(ref) != rr(new):
+        result.append("reduce/reduce conflicts")
+
+    if [p.reduced for p in ref.lr_productions[1:]] != [p.reduced for p in new.lr_productions[1:]]:
+        result.append("reduce counts")
+    return result
+
+
+def main():
+    levels = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+
+    grammars = [
+        ("mew", mew_grammar),
+        ("expressions", expressions),
+        ("not SLR", not_slr),
+        ("nullable", nullable),
+        (f"layered({levels // 4})", lambda: layered(levels // 4)),
+        (f"layered({levels})", lambda: layered(levels)),
+    ]
+
+    failed = False
+    print(f"{'grammar':<14} {'states':>7} {'conflicts':>10} {'reference (ms)':>15} {'PLY (ms)':>9} {'speedup':>8}")
+
+    for name, make in grammars:
+        ref, ref_time = build(ReferenceLRTable, make)
+        new, new_time = build(yacc.LRTable, make)
+
+        conflicts = f"{len(new.sr_conflicts)}/{len(new.rr_conflicts)}"
+        print(f"{name:<14} {len(new.lr_action):7} {conflicts:>10} {ref_time * 1000:15.1f} "
+              f"{new_time * 1000:9.1f} {ref_time / new_time:7.1f}x")
+
+        diff = differences(ref, new)
+        if diff:
+            print(f"FAILED: {name}: {', '.join(diff)} differ")
+            failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Lexer benchmark on adversarial inputs
+
+Every input (about a megabyte each) must be lexed, or rejected with a
+diagnostic, within its time limit by both the PLY lexer and the columnar
+tokenizer. Rules that backtrack or rescan the rest of the input take
+minutes on these. Fails (exit code 1) if any limit is exceeded.
+
+Usage: python3 benchmarks/lexer_adversarial.py [scale]
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mew_pl import compiler
+from mew_pl.errors import CompileError
+from mew_pl.tokens import tokenize
+
+N = 1000000
+
+# (name, source, time limit in seconds)
+CORPUS = [
+    ("unterminated comment openers", "/* " * (N // 3), 1.0),
+    ("unterminated comment", "/*" + "x\n" * (N // 2), 1.0),
+    ("comment full of stars", "/*" + "*" * N + "*/", 1.0),
+    ("many short comments", "/**/" * (N // 4), 2.0),
+    ("line comment of openers", "//" + "/*" * (N // 2), 1.0),
+    ("unterminated string", '"' + '\\"' * (N // 2), 1.0),
+    ("long string", '"' + "x" * N + '"', 1.0),
+    ("many empty strings", '"" ' * (N // 3), 2.0),
+    ("long identifier", "a" * N, 1.0),
+    ("long line of tokens", "a+" * (N // 2), 4.0),
+    ("huge integer literal", "9" * N, 1.0),
+    ("blank lines", "\n" * N, 4.0),
+    ("whitespace", " " * N, 2.0),
+]
+
+
+def lex_ply(lexer, text):
+    lexer.input(text)
+    lexer.lineno = 1
+    count = 0
+    for _ in lexer:
+        count += 1
+    return count
+
+
+def lex_columnar(lexer, text):
+    return len(tokenize(lexer, text, lexer.token_types))
+
+
+def run(func, lexer, text):
+    start = time.perf_counter()
+    try:
+        outcome = f"{func(lexer, text)} tokens"
+    except CompileError as e:
+        outcome = f"error: {e.diagnostic.message}"
+    return time.perf_counter() - start, outcome
+
+
+def main():
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+
+    lexer = compiler.get_lexer().clone()
+    lexer.filename = "<adversarial>"
+    failed = False
+
+    print(f"{'input':<30} {'PLY (s)':>8} {'columnar':>9} {'limit':>6}  outcome")
+
+    for name, text, limit in CORPUS:
+        if scale != 1.0:
+            text = text[:int(len(text) * scale)]
+            limit *= scale
+
+        ply_time, outcome = run(lex_ply, lexer, text)
+        columnar_time, _ = run(lex_columnar, lexer, text)
+
+        ok = max(ply_time, columnar_time) <= limit
+        failed = failed or not ok
+
+        print(f"{name:<30} {ply_time:8.3f} {columnar_time:9.3f} {limit:6.1f}  "
+              f"{outcome}{'' if ok else '  <- TOO SLOW'}")
+
+    if failed:
+        print("FAILED: time limit exceeded")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
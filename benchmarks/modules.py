@@ -0,0 +1,89 @@
+"""
+Module check: `mew build` of a module calling functions of a module it uses
+
+Builds a project with `lib/math.mew` and `main.mew` in a temporary directory,
+also again after an edit of `main.mew` only (so `lib/math.mew` is reused from
+the previous build), and checks which calls are resolved.
+
+Usage: python3 benchmarks/modules.py
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess as sp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LIB = """struct vec {
+    i32 x
+}
+
+func add(i32 a, b) i32 -> a + b
+
+func sub(i32 a, b) i32 -> a - b
+
+func length(vec v) i32 -> v.x
+"""
+
+MAIN = """use lib.math{imports}
+
+func main() {{
+    i32 x = {call}
+}}
+"""
+
+# use, call, whether the call is found
+CASES = [
+    (".{add}", "add(1, 2)", True),
+    (".{add}", "add(1, 2) + 1", True),  # Only main.mew is rebuilt
+    (".{add, length}", "length(new vec)", True),
+    ("", "sub(1, 2)", True),
+    (".{sub}", "add(1, 2)", False),
+    (".{add}", "add(1, true)", False),
+]
+
+
+def build(project, env):
+    result = sp.run([sys.executable, "-m", "mew_pl", "build", "main.mew"], cwd=project, env=env,
+                    stdout=sp.PIPE, stderr=sp.STDOUT, text=True)
+    return result.stdout
+
+
+def main():
+    tmpdir = tempfile.mkdtemp(prefix="mew-modules-")
+    project = os.path.join(tmpdir, "project")
+    env = dict(os.environ, MEW_CACHE_DIR=os.path.join(tmpdir, "cache"),
+               PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    failed = 0
+
+    try:
+        os.makedirs(os.path.join(project, "lib"))
+        with open(os.path.join(project, "lib", "math.mew"), "w") as f:
+            f.write(LIB)
+
+        for imports, call, found in CASES:
+            with open(os.path.join(project, "main.mew"), "w") as f:
+                f.write(MAIN.format(imports=imports, call=call))
+
+            output = build(project, env)
+            rebuilt = output.splitlines()[0] if output else ""
+
+            if ("No matching function found for call" not in output) != found:
+                print(f"FAILED: `use lib.math{imports}`, `{call}`: "
+                      f"{'not found' if found else 'found'} ({rebuilt})")
+                print(output)
+                failed += 1
+
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print(f"{len(CASES)} builds, {failed} failed")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Overload resolution benchmark
+
+Resolves CALLS call sites of functions with n/8 to n overloads (every name
+has overloads of 0 to 3 arguments of all combinations of 4 types) with
+the analyzer's overload index (ASTAnalyzer.func_find_by_args, with types
+of arguments annotated by the types pass beforehand) and with a scan
+of all functions that finds types of arguments of every candidate again
+for every call (like the analyzer did before). Fails (exit code 1) if
+time per call at n is more than LIMIT times the time per call at n/8
+with the index, or if the two ways find different functions.
+
+Usage: python3 benchmarks/overloads.py [n]
+"""
+
+import gc
+import os
+import sys
+import time
+import random
+import itertools
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mew_pl import Compiler
+from mew_pl import utils
+from mew_pl import abstract_syntax_tree as AST
+from mew_pl.new_analyzer import ASTAnalyzer
+
+REPEAT = 3
+LIMIT = 1.5
+CALLS = 2000
+ROUNDS = 10  # Of resolving all calls with the index, which is fast
+
+# (type, literal of it)
+TYPES = [("u32", "{i}"), ("string", '"s{i}"'), ("float", "{i}.5"), ("bool", "true")]
+
+SIGNATURES = [j for arity in range(4) for j in itertools.product(TYPES, repeat=arity)]
+
+
+def program(n):
+    names = max(1, n // len(SIGNATURES))
+    random.seed(n)
+
+    funcs = "".join(
+        f"func print{name}(" + ", ".join(f"{t} a{k}" for k, (t, _) in enumerate(signature)) + ") {}\n"
+        for name in range(names) for signature in SIGNATURES
+    )
+
+    calls = []
+    for i in range(CALLS):
+        signature = random.choice(SIGNATURES)
+        args = ", ".join(literal.format(i=i) for _, literal in signature)
+        calls.append(f"    print{random.randrange(names)}({args})\n")
+
+    return funcs + "func main() {\n" + "".join(calls) + "}\n", names * len(SIGNATURES)
+
+
+def linear_resolve(analyzer, funcs, call):
+    candidates = [i for i in funcs if i.name.value == call.name.value]
+    argtypes = [AST.NODES[i.kind] for i in call.arguments.value]
+
+    for func in candidates:
+        types = [analyzer.get_type(j) for j in utils.unpack_func_args(func.args.value)]
+        if len(types) == len(argtypes) and all(j is k for j, k in zip(types, argtypes)):
+            return func
+
+
+def best_time(func, *args):
+    best = None
+    for _ in range(REPEAT):
+        gc.collect()
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def indexed(comp, ast, text, calls):
+    """
+    (analyzer, time of calls) with functions added to the index and types
+    of arguments annotated beforehand
+    """
+    best = None
+
+    for _ in range(REPEAT):
+        analyzer = ASTAnalyzer("<overloads>", ast, text, symbols=comp.symbols)
+        analyzer.declare([i.op for i in ast.operations])
+        for i in calls:
+            analyzer.infer_types(i.arguments)
+        find = analyzer.func_find_by_args
+        gc.collect()
+
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            for i in calls:
+                i.origin = find(i.name.symbol, i.arguments)
+        elapsed = (time.perf_counter() - start) / ROUNDS
+
+        best = elapsed if best is None else min(best, elapsed)
+
+    return analyzer, best
+
+
+def linear(analyzer, funcs, calls):
+    return [linear_resolve(analyzer, funcs, i) for i in calls]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    sizes = [n // 8, n // 4, n // 2, n]
+
+    comp = Compiler(build_cache=None)
+    failed = False
+    index_times = []
+    linear_times = []
+
+    print(f"time per call of {CALLS} calls of functions with")
+    print(f"{'overloads':>10} {'index (us)':>12} {'scan (us)':>12} {'speedup':>9}")
+
+    for size in sizes:
+        text, count = program(size)
+        ast = comp.parse(text, "<overloads>")
+
+        funcs = [i.op for i in ast.operations[:-1]]
+        calls = [i.op for i in ast.operations[-1].op.code.operations]
+        analyzer, index_time = indexed(comp, ast, text, calls)
+
+        found, linear_time = best_time(linear, analyzer, funcs, calls)
+
+        if any(i is not j.origin for i, j in zip(found, calls)):
+            print(f"FAILED: {count} overloads: index and scan found different functions")
+            failed = True
+
+        index_times.append(index_time)
+        linear_times.append(linear_time)
+
+        print(f"{count:>10} {index_time / CALLS * 1e6:12.2f} {linear_time / CALLS * 1e6:12.1f} "
+              f"{linear_time / index_time:8.0f}x")
+
+    growth = index_times[-1] / index_times[0]
+    ok = growth <= LIMIT
+    failed = failed or not ok
+
+    print(f"time per call at n / at n/8: index {growth:.2f}x{'' if ok else '  <- NOT O(1)'}, "
+          f"scan {linear_times[-1] / linear_times[0]:.2f}x")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
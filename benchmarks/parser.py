@@ -0,0 +1,128 @@
+"""
+Parser loop benchmark
+
+Parses a large synthetic Mew program with the generic PLY loop
+(LRParser.parse) and with the production loop (LRParser.parseopt_notrack)
+and reports tokens/sec. Tokens are lexed once beforehand, so only the
+parser and grammar rules are measured. The loops are also run with rules
+replaced by no-ops, which shows the cost of the loops themselves. Each run
+is repeated a few times and the best time is taken. Fails (exit code 1) if the two loops build different
+ASTs.
+
+Usage: python3 benchmarks/parser.py [lines]
+"""
+
+import os
+import sys
+import gc
+import copy
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mew_pl import Compiler
+from mew_pl.compiler import TokenReplay
+from mew_pl.tokens import TerminatorFilter
+
+REPEAT = 5
+
+TEMPLATE = [
+    "func f{i}(u32 a, b) u32 {{",
+    "    u32 x = a + b * {i} - (a / 2);",
+    "    string s = \"function {i}\";",
+    "    u32[] items = new u32[{i}];",
+    "",
+    "    if x > {i} {{",
+    "        x = x - 1;",
+    "    }} else if a != b {{",
+    "        x = g{i}(x, a, items[0]);",
+    "    }}",
+    "",
+    "    while x < 10 {{",
+    "        x = x + 1;",
+    "    }}",
+    "    return x",
+    "}}",
+    "",
+]
+
+
+def synthetic(lines):
+    result = []
+    i = 0
+    while len(result) < lines:
+        result.extend(j.format(i=i) for j in TEMPLATE)
+        i += 1
+    return "\n".join(result) + "\n"
+
+
+def run(comp, tokens, loop):
+    best = None
+    for _ in range(REPEAT):
+        lexer = TerminatorFilter(TokenReplay(tokens, comp.lexer))
+        ast = None  # Free the previous one before collecting
+        gc.collect()
+
+        start = time.perf_counter()
+        ast = loop(lexer=lexer)
+        elapsed = time.perf_counter() - start
+
+        best = elapsed if best is None else min(best, elapsed)
+    return ast, best
+
+
+def without_rules(parser):
+    """
+    Clone of the parser whose rules do nothing
+    """
+    def noop(p):
+        pass
+
+    parser = parser.clone()
+    parser.productions = [copy.copy(p) for p in parser.productions]
+    for p in parser.productions:
+        p.callable = noop
+    parser.set_dense_tables()
+    return parser
+
+
+def report(title, tokens, generic_time, fast_time):
+    print(title)
+    print(f"  {'parse':18} {generic_time:9.3f} s {len(tokens) / generic_time:12.0f} tokens/sec")
+    print(f"  {'parseopt_notrack':18} {fast_time:9.3f} s {len(tokens) / fast_time:12.0f} tokens/sec")
+    print(f"  speedup: {generic_time / fast_time:.2f}x")
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    comp = Compiler(build_cache=None)
+    text = synthetic(lines)
+
+    comp.lexer.input(text)
+    comp.lexer.lineno = 1
+    tokens = list(comp.lexer)
+
+    # Only the text of ASTs is kept, a big live AST slows down the garbage
+    # collector in the next run
+    generic, generic_time = run(comp, tokens, comp.parser.parse)
+    generic = repr(generic) if generic is not None else None
+    fast, fast_time = run(comp, tokens, comp.parser.parseopt_notrack)
+    fast = repr(fast)
+
+    empty = without_rules(comp.parser)
+    _, generic_loop = run(comp, tokens, empty.parse)
+    _, fast_loop = run(comp, tokens, empty.parseopt_notrack)
+
+    print(f"{lines} lines, {len(tokens)} tokens")
+    report("with grammar rules:", tokens, generic_time, fast_time)
+    report("with no-op rules:", tokens, generic_loop, fast_loop)
+
+    if generic is None or generic != fast:
+        print("FAILED: ASTs differ")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Parser scaling on long chains and lists
+
+Parses dotted paths, `use` paths, import groups and call arguments of n/8
+to n elements and checks that parse time grows linearly. Fails (exit code
+1) if time per element at n is more than LIMIT times the time per element
+at n/8 (it's about the same if parsing is linear), or if the AST doesn't
+have all the elements.
+
+Usage: python3 benchmarks/parser_scaling.py [n]
+"""
+
+import gc
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mew_pl import Compiler
+
+REPEAT = 3
+LIMIT = 1.5
+
+# (name, source of n elements, elements of the AST)
+CASES = [
+    ("dotted path", lambda n: "x = " + ".".join(f"a{i}" for i in range(n)),
+     lambda ast: ast.operations[0].op.value.elements),
+    ("use path", lambda n: "use " + ".".join(f"a{i}" for i in range(n)),
+     lambda ast: ast.operations[0].op.path.elements),
+    ("import group", lambda n: "use m.{" + ", ".join(f"a{i}" for i in range(n)) + "}",
+     lambda ast: ast.operations[0].op.path.elements[1].value),
+    ("call arguments", lambda n: "f(" + ", ".join(f"a{i}" for i in range(n)) + ")",
+     lambda ast: ast.operations[0].op.arguments.value),
+]
+
+
+def parse_time(comp, text):
+    best = None
+    for _ in range(REPEAT):
+        gc.collect()
+        start = time.perf_counter()
+        ast = comp.parse(text, "<scaling>")
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, ast
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    sizes = [n // 8, n // 4, n // 2, n]
+
+    comp = Compiler(build_cache=None)
+    failed = False
+
+    print(f"{'case':<16}" + "".join(f"{f'{i} (ms)':>14}" for i in sizes) + f"{'per element':>13}")
+
+    for name, make, elements in CASES:
+        times = []
+        for size in sizes:
+            elapsed, ast = parse_time(comp, make(size))
+            times.append(elapsed)
+
+            if len(elements(ast)) != size:
+                print(f"FAILED: {name}: {len(elements(ast))} elements instead of {size}")
+                failed = True
+
+        growth = (times[-1] / sizes[-1]) / (times[0] / sizes[0])
+        ok = growth <= LIMIT
+        failed = failed or not ok
+
+        print(f"{name:<16}" + "".join(f"{i * 1000:14.1f}" for i in times) +
+              f"{growth:12.2f}x{'' if ok else '  <- NOT LINEAR'}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Output check for debug tracing
+
+Compiles the examples/ corpus through the API and fails (exit code 1) if
+anything is written to stdout, or to stderr while tracing is disabled.
+Then enables all trace categories and checks that trace goes to stderr
+only.
+
+Usage: python3 benchmarks/quiet.py
+"""
+
+import io
+import os
+import sys
+import glob
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.pop("MEW_TRACE", None)
+
+from mew_pl import Compiler
+from mew_pl import tracing
+
+
+def compile_corpus(comp):
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        for path in sorted(glob.glob(os.path.join(ROOT, "examples", "*.mew"))):
+            comp.compile_file(path)
+
+    return stdout.getvalue(), stderr.getvalue()
+
+
+def main():
+    comp = Compiler(build_cache=None)
+    failed = False
+
+    stdout, stderr = compile_corpus(comp)
+    print(f"tracing off: {len(stdout)} bytes on stdout, {len(stderr)} bytes on stderr")
+    if stdout or stderr:
+        failed = True
+
+    tracing.configure("all")
+    stdout, stderr = compile_corpus(comp)
+    tracing.configure("")
+    print(f"tracing on:  {len(stdout)} bytes on stdout, {len(stderr)} bytes on stderr")
+    if stdout or not stderr:
+        failed = True
+
+    if failed:
+        print("FAILED: unexpected output")
+        sys.exit(1)
+
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Scaling of variable scopes in the analyzer
+
+Runs the analyzer's variable pass (ASTAnalyzer.scan_variables) on programs
+of n/8 to n functions (with n/4 global variables) and of n/8 to n nested
+blocks, with scopes.Scopes and with a table copied for every scope (like
+the old analyzer did). Fails (exit code 1) if median time per element at
+n is more than LIMIT times the one at n/8 with Scopes, or if the pass
+reports errors or leaves variables of closed scopes.
+
+Usage: python3 benchmarks/scopes.py [n]
+"""
+
+import gc
+import os
+import sys
+import time
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mew_pl import Compiler
+from mew_pl.errors import CompileError
+from mew_pl.new_analyzer import ASTAnalyzer
+from mew_pl.scopes import Scopes
+
+REPEAT = 15
+LIMIT = 2.0  # Per element, quadratic time grows 8 times from n/8 to n
+
+
+class CopyingScopes(Scopes):
+    """
+    Scopes that copy the whole table when a scope is entered
+    """
+    def __init__(self):
+        super().__init__()
+        self.saved = []
+
+    def push(self):
+        self.saved.append(self.table)
+        self.table = dict(self.table)
+        self.marks.append(0)
+
+    def pop(self):
+        self.table = self.saved.pop()
+        self.marks.pop()
+
+    def define(self, symbol, definition):
+        entry = self.table.get(symbol)
+        depth = len(self.marks)
+
+        if entry is not None and entry[0] == depth:
+            return entry[1]
+
+        self.table[symbol] = (depth, definition)
+
+
+def functions(n):
+    count = (n + 3) // 4
+    globals_ = "".join(f"u32 g{i} = {i}\n" for i in range(count))
+    return globals_ + "".join(
+        f"func f{i}(u32 a, b) u32 {{\n"
+        f"    u32 x = a + b * g{i // 4}\n"
+        f"    if x > {i} {{\n"
+        f"        u32 y = x - 1\n"
+        f"        x = y\n"
+        f"    }}\n"
+        f"    return x\n"
+        f"}}\n"
+        for i in range(n)
+    ), count
+
+
+def nesting(n):
+    body = "".join(f"u32 v{i + 1} = v{i} + 1\nif v{i + 1} > 0 {{\n" for i in range(n))
+    return "u32 v0 = 0\nfunc main() {\n" + body + "}\n" * n + "}\n", 1
+
+
+CASES = [
+    ("functions", functions),
+    ("nested blocks", nesting),
+]
+
+
+def scan_time(comp, ast, text, scopes, repeat):
+    times = []
+    for _ in range(repeat):
+        analyzer = ASTAnalyzer("<scopes>", ast, text, symbols=comp.symbols)
+        analyzer.variables = scopes()
+        gc.collect()
+        gc.disable()  # Collections of the large AST would be timed too, like timeit
+
+        try:
+            start = time.perf_counter()
+            analyzer.scan_variables(ast)
+            times.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    return statistics.median(times), analyzer.variables
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 16000
+    sizes = [n // 8, n // 4, n // 2, n]
+
+    comp = Compiler(build_cache=None)
+    failed = False
+
+    print(f"{'case':<28}" + "".join(f"{f'{i} (ms)':>14}" for i in sizes) + f"{'per element':>13}")
+
+    for name, make in CASES:
+        times = {Scopes: [], CopyingScopes: []}
+
+        for size in sizes:
+            text, visible = make(size)
+            ast = comp.parse(text, "<scopes>")
+
+            for scopes in times:
+                try:
+                    # Copied tables are only for comparison, and slow
+                    repeat = REPEAT if scopes is Scopes else 1
+                    elapsed, variables = scan_time(comp, ast, text, scopes, repeat)
+                except CompileError as e:
+                    print(f"FAILED: {name}: {e.diagnostic.message}")
+                    sys.exit(1)
+
+                times[scopes].append(elapsed)
+
+                if variables.depth or len(variables.table) != visible:
+                    print(f"FAILED: {name}: {len(variables.table)} variables left instead of {visible}")
+                    failed = True
+
+        for scopes, label in ((Scopes, "undo log"), (CopyingScopes, "copied tables")):
+            growth = (times[scopes][-1] / sizes[-1]) / (times[scopes][0] / sizes[0])
+            ok = growth <= LIMIT or scopes is CopyingScopes
+            failed = failed or not ok
+
+            print(f"{f'{name}, {label}':<28}" + "".join(f"{i * 1000:14.1f}" for i in times[scopes]) +
+                  f"{growth:12.2f}x{'' if ok else '  <- NOT LINEAR'}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Diagnostics location benchmark
+
+Locates many diagnostics (line, column and line text) in a large generated
+source, with a shared SourceMap and with the old per-diagnostic approach
+(split the whole source, sum lengths of previous lines).
+
+Usage: python3 benchmarks/source_map.py [lines] [diagnostics]
+"""
+
+import os
+import sys
+import time
+import random
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mew_pl.source_map import SourceMap
+
+
+def old_locate(text, offset):
+    lines = text.split("\n")
+    lentable = [len(i) + 1 for i in lines]
+    lineno = text.count("\n", 0, offset) + 1
+    column = offset - sum(lentable[:lineno - 1])
+    return lineno, column, lines[lineno - 1]
+
+
+def new_locate(source_map, offset):
+    lineno, column = source_map.location(offset)
+    return lineno, column, source_map.line(lineno)
+
+
+def main():
+    nlines = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    text = "".join(f"    u32 var{i} = {i} + {i * 3};\n" for i in range(nlines))
+    offsets = [random.randrange(len(text)) for _ in range(count)]
+
+    start = time.perf_counter()
+    old = [old_locate(text, i) for i in offsets]
+    old_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    source_map = SourceMap(text)
+    new = [new_locate(source_map, i) for i in offsets]
+    new_time = time.perf_counter() - start
+
+    print(f"{nlines} lines, {count} diagnostics")
+    print(f"split per diagnostic: {old_time * 1000:9.1f} ms")
+    print(f"shared SourceMap:     {new_time * 1000:9.1f} ms (including building)")
+
+    if old != new:
+        print("FAILED: locations differ")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
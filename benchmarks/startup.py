@@ -0,0 +1,60 @@
+"""
+Startup benchmark: compares `mew` runs with a cold and a warm parser table cache
+
+Usage: python3 benchmarks/startup.py [runs]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import statistics
+import subprocess as sp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE = os.path.join(ROOT, "examples", "nothing.mew")
+
+
+def run_once(env):
+    start = time.perf_counter()
+    sp.run([sys.executable, "-m", "mew_pl", SOURCE], cwd=ROOT, env=env,
+           stdout=sp.DEVNULL, stderr=sp.DEVNULL)
+    return time.perf_counter() - start
+
+
+def measure(runs, cachedir, cold):
+    env = dict(os.environ, MEW_CACHE_DIR=cachedir)
+    times = []
+
+    for _ in range(runs):
+        if cold:
+            shutil.rmtree(cachedir, ignore_errors=True)
+        times.append(run_once(env))
+
+    return times
+
+
+def report(name, times):
+    print(f"{name:<6} min {min(times) * 1000:8.1f} ms   "
+          f"median {statistics.median(times) * 1000:8.1f} ms")
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    cachedir = tempfile.mkdtemp(prefix="mew-bench-")
+
+    try:
+        cold = measure(runs, cachedir, cold=True)
+        measure(1, cachedir, cold=False)  # Populate the cache
+        warm = measure(runs, cachedir, cold=False)
+    finally:
+        shutil.rmtree(cachedir, ignore_errors=True)
+
+    report("cold", cold)
+    report("warm", warm)
+    print(f"speedup: {statistics.median(cold) / statistics.median(warm):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
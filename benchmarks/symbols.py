@@ -0,0 +1,133 @@
+"""
+Identifier interning benchmark
+
+Parses a large synthetic Mew program and reports memory of identifier
+strings held by the AST (interned, and with one string per name, like the
+lexer made them before), and time of the analyzer's type and function
+lookups keyed by symbols and by names (a dict keyed by type names and a
+scan of all functions comparing names, like the analyzer did before).
+Fails (exit code 1) if a symbol doesn't match its name, or if lookups by
+symbols and by names find different things.
+
+Usage: python3 benchmarks/symbols.py [lines]
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mew_pl import Compiler
+from mew_pl import ast_arena
+from mew_pl import abstract_syntax_tree as AST
+from mew_pl.new_analyzer import ASTAnalyzer, TYPES
+
+import parser as parser_benchmark
+
+REPEAT = 5
+
+
+def nodes_of(ast, *classes):
+    kinds = {cls.kind for cls in classes}
+    layouts = ast_arena.LAYOUTS
+    nodes = []
+    stack = [ast]
+
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif node is not None:
+            if node.kind in kinds:
+                nodes.append(node)
+            stack.extend(getattr(node, i) for i in layouts[node.kind].children)
+
+    return nodes
+
+
+def best_time(func, *args):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def types_by_name(typed):
+    typetable = TYPES
+    return [typetable.get(i.type.value) for i in typed]
+
+
+def types_by_symbol(analyzer, typed):
+    typetable = analyzer.typetable
+    return [typetable.get(i.type.symbol) for i in typed]
+
+
+def funcs_by_name(funcs, names):
+    return [[i for i in funcs if i.name.value == name.value] for name in names]
+
+
+def funcs_by_symbol(analyzer, names):
+    return [analyzer.find_funcs(name.symbol) for name in names]
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+    text = parser_benchmark.synthetic(lines)
+    failed = False
+
+    comp = Compiler(build_cache=None)
+    ast = comp.parse(text)
+    symbols = comp.symbols
+
+    names = [i for i in nodes_of(ast, AST.Name) if i.symbol >= 0]
+    if any(symbols.names[i.symbol] is not i.value for i in names):
+        print("FAILED: symbols don't match names")
+        failed = True
+
+    # Strings of one character are shared by Python anyway
+    interned = sum(sys.getsizeof(i) for i in symbols.names)
+    separate = sum(sys.getsizeof(i.value) for i in names if len(i.value) > 1)
+    table = sys.getsizeof(symbols.names) + sys.getsizeof(symbols.ids)
+
+    print(f"{lines} lines, {len(names)} names, {len(symbols)} symbols")
+    print(f"name strings: one per name {separate / 1024:.0f} KiB, interned {interned / 1024:.0f} KiB "
+          f"+ table {table / 1024:.0f} KiB (saved {1 - (interned + table) / separate:.1%})")
+
+    analyzer = ASTAnalyzer("<symbols>", ast, text, symbols=symbols)
+    funcs = nodes_of(ast, AST.Func)
+    for i in funcs:
+        analyzer.funcs.setdefault(i.name.symbol, []).append(i)
+
+    typed = nodes_of(ast, AST.TypedVarDefinition)
+    by_name, name_time = best_time(types_by_name, typed)
+    by_symbol, symbol_time = best_time(types_by_symbol, analyzer, typed)
+
+    if by_name != by_symbol:
+        print("FAILED: type lookups differ")
+        failed = True
+
+    print(f"{len(typed)} type lookups: by name {name_time * 1000:.2f} ms, "
+          f"by symbol {symbol_time * 1000:.2f} ms ({name_time / symbol_time:.2f}x)")
+
+    called = [i.name for i in nodes_of(ast, AST.FunctionCall)] + [i.name for i in funcs]
+    by_name, name_time = best_time(funcs_by_name, funcs, called)
+    by_symbol, symbol_time = best_time(funcs_by_symbol, analyzer, called)
+
+    if by_name != by_symbol:
+        print("FAILED: function lookups differ")
+        failed = True
+
+    print(f"{len(called)} function lookups in {len(funcs)} functions: by name {name_time * 1000:.1f} ms, "
+          f"by symbol {symbol_time * 1000:.2f} ms ({name_time / symbol_time:.0f}x)")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Terminator filter statistics
+
+Parses every example with and without the terminator filter (see
+tokens.TerminatorFilter) and counts parser shifts, reductions and AST
+nodes. Fails (exit code 1) if the filtered AST differs from the unfiltered
+one in anything but End operations.
+
+Usage: python3 benchmarks/terminators.py
+"""
+
+import os
+import sys
+import glob
+import dataclasses
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mew_pl import Compiler
+from mew_pl import abstract_syntax_tree as AST
+from mew_pl.tokens import TerminatorFilter
+
+
+class StepCounter:
+    """
+    Logger for PLY parser debug mode that counts actions
+    """
+    def __init__(self):
+        self.shifts = 0
+        self.reductions = 0
+
+    def debug(self, message, *args):
+        if message.startswith("Action : Shift"):
+            self.shifts += 1
+
+    def info(self, message, *args):
+        if message.startswith("Action : Reduce"):
+            self.reductions += 1
+
+    def warning(self, message, *args):
+        pass
+
+    error = critical = warning
+
+
+def count_nodes(node):
+    if dataclasses.is_dataclass(node):
+        return 1 + sum(count_nodes(getattr(node, i.name)) for i in dataclasses.fields(node))
+    if isinstance(node, list):
+        return sum(count_nodes(i) for i in node)
+    return 0
+
+
+def strip_ends(node):
+    if type(node) is AST.Program:
+        node.operations = [i for i in node.operations if type(i.op) is not AST.End]
+    if dataclasses.is_dataclass(node):
+        for i in dataclasses.fields(node):
+            strip_ends(getattr(node, i.name))
+    elif isinstance(node, list):
+        for i in node:
+            strip_ends(i)
+    return node
+
+
+def parse(comp, text, filtered):
+    comp.lexer.input(text)
+    comp.lexer.lineno = 1
+
+    counter = StepCounter()
+    lexer = TerminatorFilter(comp.lexer) if filtered else comp.lexer
+    ast = comp.parser.parse(lexer=lexer, debug=counter)
+
+    return ast, counter
+
+
+def main():
+    comp = Compiler(build_cache=None)
+    failed = False
+    totals = [0] * 6
+
+    print(f"{'file':<32} {'shifts':>13} {'reductions':>13} {'AST nodes':>13}")
+
+    for path in sorted(glob.glob(os.path.join(ROOT, "examples", "*.mew"))):
+        with open(path, "r") as f:
+            text = f.read()
+
+        before, steps_before = parse(comp, text, False)
+        after, steps_after = parse(comp, text, True)
+
+        row = [steps_before.shifts, steps_after.shifts,
+               steps_before.reductions, steps_after.reductions,
+               count_nodes(before), count_nodes(after)]
+        totals = [i + j for i, j in zip(totals, row)]
+
+        if repr(strip_ends(before)) != repr(after):
+            print(f"FAILED: {path}: AST differs")
+            failed = True
+
+        name = os.path.relpath(path, ROOT)
+        print(f"{name:<32} {row[0]:>6}->{row[1]:<6} {row[2]:>6}->{row[3]:<6} {row[4]:>6}->{row[5]:<6}")
+
+    print(f"{'total':<32} {totals[0]:>6}->{totals[1]:<6} {totals[2]:>6}->{totals[3]:<6} "
+          f"{totals[4]:>6}->{totals[5]:<6}")
+    print(f"saved: {1 - totals[1] / totals[0]:.1%} shifts, {1 - totals[3] / totals[2]:.1%} reductions, "
+          f"{1 - totals[5] / totals[4]:.1%} AST nodes")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Thread-safety stress check
+
+Compiles the examples/ corpus serially, then from N threads (each thread
+with its own Compiler) for several rounds, and fails (exit code 1) if any
+result differs from the serial run.
+
+Usage: python3 benchmarks/threads.py [threads] [rounds]
+"""
+
+import io
+import os
+import sys
+import glob
+import time
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mew_pl import Compiler
+
+
+def load_corpus():
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "examples", "*.mew"))):
+        with open(path, "r") as f:
+            corpus.append((os.path.relpath(path, ROOT), f.read()))
+    return corpus
+
+
+def render(result):
+    return repr(result).encode()
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    corpus = load_corpus()
+    local = threading.local()
+
+    def compile_one(item):
+        if not hasattr(local, "compiler"):
+            local.compiler = Compiler()
+        filename, text = item
+        return filename, render(local.compiler.compile(text, filename))
+
+    # Compiler still prints debug output, keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        serial = dict(compile_one(item) for item in corpus)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            results = list(pool.map(compile_one, corpus * rounds))
+        elapsed = time.perf_counter() - start
+
+    mismatches = [name for name, out in results if out != serial[name]]
+
+    print(f"{len(results)} compilations on {threads} threads in {elapsed:.2f} s")
+
+    if mismatches:
+        print(f"error: {len(mismatches)} results differ from the serial run:",
+              ", ".join(sorted(set(mismatches))))
+        exit(1)
+
+    print("all results are identical to the serial run")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Token stream benchmark
+
+Lexes a synthetic Mew source with the PLY lexer (one LexToken per token)
+and to a columnar TokenBuffer, and reports tokens/sec and bytes per token.
+Memory of LexTokens is measured on a prefix of the source (keeping all of
+them for a big file takes gigabytes). Numbers are of lexing only: the
+parser is still fed one LexToken per token (see tokens.BufferLexer). Fails (exit code 1) if the two token
+streams differ on that prefix.
+
+Usage: python3 benchmarks/tokens.py [lines]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mew_pl import compiler
+from mew_pl.tokens import tokenize
+
+SAMPLE_LINES = 50000
+
+TEMPLATE = [
+    "// Function number {i}",
+    "func f{i}(u32 a, b) u32 {{",
+    "    u32 x = a + b * {i};",
+    "",
+    "    if x > 0x{i:x} {{",
+    "        x = x - 1;",
+    "    }}",
+    "    /* Returns",
+    "       the result */",
+    "    return x",
+    "}}",
+    "",
+]
+
+
+def synthetic(lines):
+    """
+    Source of at least `lines` lines (made of whole functions)
+    """
+    result = []
+    i = 0
+    while len(result) < lines:
+        result.extend(j.format(i=i) for j in TEMPLATE)
+        i += 1
+    return "\n".join(result) + "\n"
+
+
+def ply_tokens(lexer, text):
+    lexer.input(text)
+    lexer.lineno = 1
+    return list(lexer)
+
+
+def ply_count(lexer, text):
+    lexer.input(text)
+    lexer.lineno = 1
+    count = 0
+    for _ in lexer:
+        count += 1
+    return count
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    result = func(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    lexer = compiler.get_lexer().clone()
+    types = lexer.token_types
+
+    text = synthetic(lines)
+    sample = synthetic(min(lines, SAMPLE_LINES))
+
+    # Check that both streams are the same
+    expected = [(t.type, t.value, t.lexpos) for t in ply_tokens(lexer, sample)]
+    buffer = tokenize(lexer, sample, types)
+    got = [(buffer.type(i), buffer.value(i), buffer.offsets[i]) for i in range(len(buffer))]
+
+    if expected != got:
+        print("FAILED: token streams differ")
+        sys.exit(1)
+
+    # Bytes per token (on the sample)
+    ply_list, ply_size = measure(ply_tokens, lexer, sample)
+    ply_per_token = ply_size / len(ply_list)
+    del ply_list
+
+    buffer, buffer_size = measure(tokenize, lexer, sample, types)
+    buffer_per_token = buffer_size / len(buffer)
+    del buffer
+
+    # Speed (on the whole source)
+    start = time.perf_counter()
+    count = ply_count(lexer, text)
+    ply_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    buffer = tokenize(lexer, text, types)
+    buffer_time = time.perf_counter() - start
+
+    print(f"{lines} lines, {len(text) / 1024 / 1024:.1f} MiB, {count} tokens")
+    print(f"{'':12} {'tokens/sec':>12} {'bytes/token':>12}")
+    print(f"{'LexToken':12} {count / ply_time:12.0f} {ply_per_token:12.1f}")
+    print(f"{'TokenBuffer':12} {len(buffer) / buffer_time:12.0f} {buffer_per_token:12.1f}")
+    print(f"token columns of the whole source: {buffer.nbytes() / 1024 / 1024:.1f} MiB")
+    print("(lexing only: the parser still gets one LexToken per token)")
+
+
+if __name__ == "__main__":
+    main()
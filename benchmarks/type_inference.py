@@ -0,0 +1,187 @@
+"""
+Type inference benchmark
+
+Infers types of statements with nested calls and binary operations of
+depth n/4 to n with the analyzer's types pass (ASTAnalyzer.infer_types,
+every expression annotated once) and with a recursive resolution that
+annotates nothing, so a call resolves types of its arguments again when
+it looks for the return type and when it looks for the function (like the
+old analyzer did). Fails (exit code 1) if time per expression at n is
+more than LIMIT times the time per expression at n/4 with the types pass,
+if an expression is inferred more than once, or if the two ways find
+different types.
+
+Usage: python3 benchmarks/type_inference.py [n]
+"""
+
+import gc
+import os
+import sys
+import time
+import collections
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mew_pl import Compiler
+from mew_pl import ast_arena
+from mew_pl import abstract_syntax_tree as AST
+from mew_pl.new_analyzer import ASTAnalyzer, COMPARISONS
+
+REPEAT = 3
+LIMIT = 1.5
+STATEMENTS = 10
+
+
+def expression(depth):
+    text = "1"
+    for _ in range(depth):
+        text = f"f({text} + 1)"
+    return text
+
+
+def program(depth):
+    return "func f(u32 a) u32 -> a\nfunc main() {\n" + "".join(
+        f"    u32 v{i} = {expression(depth)}\n" for i in range(STATEMENTS)
+    ) + "}\n"
+
+
+def expressions(root):
+    layouts = ast_arena.LAYOUTS
+    nodes = []
+    stack = [root]
+
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif node is not None:
+            if node.kind in (AST.BinOp.kind, AST.FunctionCall.kind, AST.Integer.kind):
+                nodes.append(node)
+            stack.extend(getattr(node, i) for i in layouts[node.kind].children)
+
+    return nodes
+
+
+def recursive_type(analyzer, node):
+    kind = node.kind
+
+    if kind == AST.BinOp.kind:
+        left = recursive_type(analyzer, node.left)
+        right = recursive_type(analyzer, node.right)
+        return AST.Bool if node.op in COMPARISONS else left if left is right else None
+
+    if kind == AST.FunctionCall.kind:
+        # For the return type, and to match the call
+        for _ in range(2):
+            argtypes = tuple(recursive_type(analyzer, i) for i in node.arguments.value)
+
+        func = analyzer.signatures[(node.name.symbol, argtypes)]
+        return analyzer.get_type(func.ret)
+
+    return AST.NODES[kind]
+
+
+def analyzer_for(comp, ast, text):
+    analyzer = ASTAnalyzer("<type_inference>", ast, text, symbols=comp.symbols)
+    analyzer.declare([i.op for i in ast.operations])  # Adds `f`
+    return analyzer
+
+
+def count_inferences(analyzer, main):
+    """
+    Number of times the types pass inferred every node, by id
+    """
+    counts = collections.Counter()
+
+    def counted(handler):
+        def infer(self, node):
+            counts[id(node)] += 1
+            return handler(self, node)
+        return infer
+
+    analyzer.type_inferers = [counted(i) for i in ASTAnalyzer.type_inferers]
+    analyzer.infer_types(main)
+    return counts
+
+
+def annotated(comp, ast, text, main, values):
+    best = None
+    for _ in range(REPEAT):
+        analyzer = analyzer_for(comp, ast, text)
+        gc.collect()
+
+        start = time.perf_counter()
+        analyzer.infer_types(main)
+        types = [i.value_type for i in values]
+        elapsed = time.perf_counter() - start
+
+        best = elapsed if best is None else min(best, elapsed)
+    return types, best
+
+
+def recursive(comp, ast, text, values):
+    analyzer = analyzer_for(comp, ast, text)
+    best = None
+    for _ in range(REPEAT):
+        gc.collect()
+
+        start = time.perf_counter()
+        types = [recursive_type(analyzer, i) for i in values]
+        elapsed = time.perf_counter() - start
+
+        best = elapsed if best is None else min(best, elapsed)
+    return types, best
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    sizes = [n // 4, n // 2, n * 3 // 4, n]
+
+    comp = Compiler(build_cache=None)
+    failed = False
+    annotated_times = []
+    recursive_times = []
+
+    print(f"time per expression of {STATEMENTS} statements with")
+    print(f"{'depth':>6} {'expressions':>12} {'annotated (us)':>15} {'recursive (us)':>15} {'speedup':>9}")
+
+    for depth in sizes:
+        text = program(depth)
+        ast = comp.parse(text, "<type_inference>")
+
+        main = ast.operations[1].op
+        values = [i.op.value for i in main.code.operations]
+        count = len(expressions(main))
+
+        counts = count_inferences(analyzer_for(comp, ast, text), main)
+        if any(counts[id(i)] != 1 for i in expressions(main)):
+            print(f"FAILED: depth {depth}: expressions inferred more than once")
+            failed = True
+
+        by_pass, annotated_time = annotated(comp, ast, text, main, values)
+        by_recursion, recursive_time = recursive(comp, ast, text, values)
+
+        if by_pass != by_recursion:
+            print(f"FAILED: depth {depth}: types pass and recursion found different types")
+            failed = True
+
+        annotated_times.append(annotated_time / count)
+        recursive_times.append(recursive_time / count)
+
+        print(f"{depth:>6} {count:>12} {annotated_time / count * 1e6:15.2f} "
+              f"{recursive_time / count * 1e6:15.2f} {recursive_time / annotated_time:8.0f}x")
+
+    growth = annotated_times[-1] / annotated_times[0]
+    ok = growth <= LIMIT
+    failed = failed or not ok
+
+    print(f"time per expression at n / at n/4: annotated {growth:.2f}x{'' if ok else '  <- NOT LINEAR'}, "
+          f"recursive {recursive_times[-1] / recursive_times[0]:.0f}x")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,3 @@
 from .version import __version__
+from .errors import CompileError, Diagnostic
+from .compiler import Compiler, compile_source, Result
@@ -1,72 +1,286 @@
 try:
-    import lex_and_parse
-    from code_builder import CodeBuilder
-    from new_analyzer import ASTAnalyzer
-    from targetmgr import TargetManager
+    import compiler
+    from cache import BuildCache
+    from log import Log
+    from errors import CompileError
 except (ImportError, ModuleNotFoundError):
-    from . import lex_and_parse
-    from .code_builder import CodeBuilder
-    from .new_analyzer import ASTAnalyzer
-    from .targetmgr import TargetManager
+    from . import compiler
+    from .cache import BuildCache
+    from .log import Log
+    from .errors import CompileError
 
-from pprint import pprint
-from colorama import Fore
 import argparse
-
-lexer = lex_and_parse.lex(module=lex_and_parse)
-lexer.filename = ""
-parser = lex_and_parse.yacc(debug=True, module=lex_and_parse)
+import glob
+import sys
+import time
 
 target = "linux"
 
-def main():
-    argparser = argparse.ArgumentParser(prog='mew')
-    argparser.add_argument("file", nargs='?', help="File to compile")
-    args = argparser.parse_args()
+# Compiler of a worker process (see compile_parallel)
+_worker = None
+
+def expand_files(patterns):
+    """
+    Expands globs in the file list, keeping order and dropping duplicates
+    """
+    files = []
+    seen = set()
+
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                Log.warning(f"`{pattern}` matches no files")
+        else:
+            matches = [pattern]
+
+        for i in matches:
+            if i not in seen:
+                seen.add(i)
+                files.append(i)
+
+    return files
+
+def timed_compile(comp, path, time_passes=False):
+    start = time.perf_counter()
+    result = comp.compile_file(path, time_passes)
+    return result, time.perf_counter() - start
+
+def _init_worker(target, build_cache):
+    global _worker
+    _worker = compiler.Compiler(target, build_cache=build_cache)
+
+def _compile_in_worker(path, time_passes):
+    return timed_compile(_worker, path, time_passes)
+
+def compile_parallel(files, jobs, target, build_cache, time_passes=False):
+    """
+    Compiles files on a pool of processes, each with its own warm compiler
+
+    Results are returned in the order of files
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(target, build_cache)) as pool:
+        return list(pool.map(_compile_in_worker, files, [time_passes] * len(files)))
+
+def print_passes(results, fmt):
+    """
+    Prints time and memory of compilation phases to stderr
+    """
+    try:
+        import timing
+    except (ImportError, ModuleNotFoundError):
+        from . import timing
+
+    if fmt == "json":
+        print(timing.format_json(results), file=sys.stderr)
+        return
+
+    for result in results:
+        print(f"{result.filename}:", file=sys.stderr)
+        print(timing.format_table(result.passes), file=sys.stderr)
+
+def print_summary(results, wall):
+    print()
+    print(f"{'time (ms)':>10}  {'status':<6}  file")
 
-    if not args.file:
-        print(Fore.LIGHTRED_EX+"error:"+Fore.RESET,
-              "files are not specified")
+    for result, elapsed in results:
+        status = "ok" if result.ok else "error"
+        print(f"{elapsed * 1000:10.1f}  {status:<6}  {result.filename}")
+
+    ok = sum(1 for result, _ in results if result.ok)
+    total = sum(elapsed for _, elapsed in results)
+
+    print(f"{len(results)} files: {ok} ok, {len(results) - ok} failed; "
+          f"{total * 1000:.1f} ms compile time, {wall * 1000:.1f} ms wall time")
+
+def report(results, wall):
+    for result, _ in results:
+        for diag in result.diagnostics:
+            diag.render()
+
+        if result.ok:
+            print("\n", "*"*35 + " CODE " + "*"*35 + "\n")
+            print(result.code)
+
+    if len(results) > 1:
+        print_summary(results, wall)
+
+    if not all(result.ok for result, _ in results):
         exit(1)
 
-    lexer.filename = args.file
+def compile_on_server(files, jobs, target, path=None):
+    """
+    Sends files to a running `mew serve`
+    """
+    try:
+        import server
+    except (ImportError, ModuleNotFoundError):
+        from . import server
+
+    from concurrent.futures import ThreadPoolExecutor
 
-    target_mgr = TargetManager(target)
+    path = path or server.default_socket_path()
 
-    # print("Configuration:")
-    # pprint(target_mgr.config)
+    def compile_one(filename):
+        start = time.perf_counter()
+        result = server.compile_remote(path, filename, target)
+        return result, time.perf_counter() - start
 
-    code = ""
-    with open(args.file, "r") as f:
-        code = f.read()
-        f.close()
+    try:
+        with ThreadPoolExecutor(max(jobs, 1)) as pool:
+            return list(pool.map(compile_one, files))
+    except OSError as e:
+        Log.error(f"can't compile on server ({path}): {e}")
+        exit(1)
 
+def build_modules(argv):
     """
-    lexer.input(code)
-    while True:
-        t = lexer.token()
-        if not t: break
-        print(t)
-    exit(1)
+    `mew build`: builds files with all modules they use, reusing results of
+    previous builds for modules that are not affected by changes
     """
+    try:
+        import modules
+    except (ImportError, ModuleNotFoundError):
+        from . import modules
+
+    argparser = argparse.ArgumentParser(prog='mew build',
+                                        description="Incrementally builds files and modules they use")
+    argparser.add_argument("files", nargs='+', help="Entry files (globs are allowed)")
+    argparser.add_argument("--rebuild", action="store_true",
+                           help="Ignore results of previous builds")
+    args = argparser.parse_args(argv)
+
+    files = expand_files(args.files)
+    start = time.perf_counter()
+
+    try:
+        comp = compiler.Compiler(target)
+    except CompileError as e:
+        e.diagnostic.render()
+        exit(1)
+
+    graph = modules.graph_path(files)
+    builder = modules.ModuleBuilder(comp, graph)
+    if args.rebuild:
+        builder.old = {}
+
+    results = builder.build(files)
+    wall = time.perf_counter() - start
+
+    print(f"mew: {len(builder.rebuilt)} of {len(results)} modules rebuilt")
+    report([(i, builder.timings[i.filename]) for i in results], wall)
+
+def main():
+    if sys.argv[1:2] == ["build"]:
+        build_modules(sys.argv[2:])
+        return
+
+    if sys.argv[1:2] == ["serve"]:
+        try:
+            import server
+        except (ImportError, ModuleNotFoundError):
+            from . import server
+
+        server.main(sys.argv[2:])
+        return
+
+    if sys.argv[1:2] == ["cache"]:
+        try:
+            import cache
+        except (ImportError, ModuleNotFoundError):
+            from . import cache
 
-    ast = parser.parse(code)
+        cache.main(sys.argv[2:])
+        return
 
-    analyzer = ASTAnalyzer(args.file, ast, code)
-    ast = analyzer.analyze()
+    if sys.argv[1:2] == ["grammar-report"]:
+        try:
+            import grammar_report
+        except (ImportError, ModuleNotFoundError):
+            from . import grammar_report
+
+        grammar_report.main(sys.argv[2:])
+        return
+
+    argparser = argparse.ArgumentParser(
+        prog='mew',
+        epilog="Run `mew build --help` to see incremental builds of modules, "
+               "`mew serve --help` to see compile server options, "
+               "`mew cache stats|clear` to manage build cache, "
+               "`mew grammar-report` to see size and conflicts of the parser tables"
+    )
+    argparser.add_argument("files", nargs='*', help="Files to compile (globs are allowed)")
+    argparser.add_argument("-j", "--jobs", type=int, default=1,
+                           help="Number of files to compile in parallel")
+    argparser.add_argument("--server", action="store_true",
+                           help="Compile on a running compile server (see `mew serve`)")
+    argparser.add_argument("--socket", default=None,
+                           help="Path of the Unix socket of the server (like `mew serve --socket`)")
+    argparser.add_argument("--no-cache", action="store_true",
+                           help="Don't use build cache")
+    argparser.add_argument("--time-passes", action="store_true",
+                           help="Print time and memory of every compilation phase to stderr")
+    argparser.add_argument("--time-passes-format", choices=["table", "json"], default="table",
+                           help="Format of --time-passes report")
+    argparser.add_argument("--trace", metavar="CATEGORIES",
+                           help="Comma-separated categories of debug trace to print to stderr "
+                                "(overrides MEW_TRACE)")
+    args = argparser.parse_args()
+
+    if args.time_passes and args.server:
+        argparser.error("--time-passes can't be used with --server")
+    if args.socket and not args.server:
+        argparser.error("--socket can only be used with --server")
+
+    if args.trace is not None:
+        try:
+            import tracing
+        except (ImportError, ModuleNotFoundError):
+            from . import tracing
+
+        unknown = tracing.configure(args.trace)
+        if unknown:
+            argparser.error(f"unknown trace categories: {', '.join(unknown)} "
+                            f"(available: {', '.join(tracing.CATEGORIES)}, all)")
+
+    files = expand_files(args.files)
+
+    if not files:
+        Log.error("files are not specified")
+        exit(1)
+
+    start = time.perf_counter()
+
+    if args.server:
+        results = compile_on_server(files, args.jobs, target, args.socket)
+        report(results, time.perf_counter() - start)
+        return
+
+    # Build the compiler before starting workers: it checks the target,
+    # and forked workers inherit already built lexer and parser
+    build_cache = None if args.no_cache else BuildCache.default()
+
+    try:
+        comp = compiler.Compiler(target, build_cache=build_cache)
+    except CompileError as e:
+        e.diagnostic.render()
+        exit(1)
 
-    builder = CodeBuilder(args.file, ast, target_mgr, code)
-    builder.start()
+    time_passes = args.time_passes
 
-    print("\n", "*"*35 + " CODE " + "*"*35 + "\n")
+    if args.jobs > 1 and len(files) > 1:
+        results = compile_parallel(files, args.jobs, target, build_cache, time_passes)
+    else:
+        results = [timed_compile(comp, i, time_passes) for i in files]
 
-    print(builder.code)
+    wall = time.perf_counter() - start
 
-    exit()
+    if time_passes:
+        print_passes([result for result, _ in results], args.time_passes_format)
 
-    with open("out.c", "w") as f:
-        f.write(builder.code)
-        f.close()
+    report(results, wall)
 
 if __name__=="__main__":
     main()
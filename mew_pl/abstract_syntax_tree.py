@@ -1,78 +1,110 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any
 
-@dataclass
+NODES = []  # Node classes, by kind
+
+def node(cls):
+    """
+    Makes a node class: a slotted dataclass with an integer `kind` tag
+    """
+    cls = dataclass(slots=True)(cls)
+    cls.kind = len(NODES)
+    NODES.append(cls)
+    return cls
+
+def dispatch_table(handlers, default=None):
+    """
+    List of handlers indexed by node kind, made of {node class: handler}
+    """
+    table = [default] * len(NODES)
+    for cls, handler in handlers.items():
+        table[cls.kind] = handler
+    return table
+
+def type_annotation():
+    """
+    Field of expressions for the type of their value, set by the analyzer
+    (see ASTAnalyzer.infer_types). Not shown and not compared.
+    """
+    return field(default=None, repr=False, compare=False)
+
+@node
 class Operation:
     op: Any
     lineno: int
 
-@dataclass
+@node
 class Definition:
     type: str
     name: str
     value: Any
 
-@dataclass
+@node
 class BinOp:
     left: str
     op: str
     right: str
     lineno: int
+    value_type: Any = type_annotation()
 
-@dataclass
+@node
 class Assignment:
     name: str
     value: str
     lineno: int
 
-@dataclass
+@node
 class Name:
     value: str
     lineno: int
     pos: int
+    symbol: int = field(default=-1, repr=False)  # In tokens.Symbols, -1 if value is not an identifier
+    value_type: Any = type_annotation()
 
-@dataclass
+@node
 class Integer:
     value: int
     lineno: int
     pos: int
+    value_type: Any = type_annotation()
 
-@dataclass
+@node
 class String:
     value: str
     lineno: int
     pos: int
+    value_type: Any = type_annotation()
 
-@dataclass
+@node
 class ParameterList:
     value: list
     lineno: int
 
-@dataclass
+@node
 class FunctionDefinition:
     return_type: str
     name: str
     arguments: ParameterList
     body: Any
 
-@dataclass
+@node
 class Program:
     operations: list[Operation]
 
-@dataclass
+@node
 class IfElse:
     comparison: Any
     code: Program
     else_: Program
     lineno: int
 
-@dataclass
+@node
 class While:
     comparison: Any
     code: Program
     lineno: int
 
-@dataclass
+@node
 class Func:
     name: str
     args: ParameterList
@@ -81,109 +113,115 @@ class Func:
     lineno: int
     need_dealloc: bool
 
-@dataclass
+@node
 class FunctionCall:
     name: str
     arguments: ParameterList
     origin: Func
     lineno: int
+    value_type: Any = type_annotation()
     
-@dataclass
+@node
 class Return:
     value: Any
     lineno: int
 
-@dataclass
+@node
 class TypedVarDefinition:
     type: str
     array: Any
     var: Any
     lineno: int
 
-@dataclass
+@node
 class New:
     obj: FunctionCall
     lineno: int
+    value_type: Any = type_annotation()
 
-@dataclass
+@node
 class StructFieldArray:
     value: list
 
-@dataclass
+@node
 class Struct:
     name: str
     value: StructFieldArray
     lineno: int
 
-@dataclass
+@node
 class Path:
     elements: str
     lineno: int
+    value_type: Any = type_annotation()
 
-@dataclass
+@node
 class Warning:
     message: str
     refer: Any
     lineno: int
 
-@dataclass
+@node
 class ExternC:
     code: str
     lineno: int
 
-@dataclass
+@node
 class Loop:
     code: Program
     lineno: int
 
-@dataclass
+@node
 class Break:
     lineno: int
 
-@dataclass
+@node
 class Continue:
     lineno: int
 
-@dataclass
+@node
 class Float:
     value: float
     lineno: int
     pos: int
+    value_type: Any = type_annotation()
 
-@dataclass
+@node
 class Bool:
     value: bool
     lineno: int
     pos: int
+    value_type: Any = type_annotation()
 
-@dataclass
+@node
 class Use:
     path: Path
     as_name: str
     lineno: int
 
-@dataclass
+@node
 class Array:
     elements: ParameterList
     lineno: int
 
-@dataclass
+@node
 class Indexed:
     var: Any
     index: Array
     lineno: int
+    value_type: Any = type_annotation()
 
-@dataclass
+@node
 class Increment:
     what: Any
     lineno: int
 
-@dataclass
+@node
 class Decrement:
     what: Any
     lineno: int
 
-@dataclass
+@node
 class End:
     char: str
     lineno: int
@@ -0,0 +1,361 @@
+"""
+Flat AST for very large programs
+
+Nodes of an Arena live in parallel arrays (kind, first child, next sibling,
+line, position and payload index) instead of being objects. They are used
+through views: small objects made on access, with the same attributes as
+the nodes of abstract_syntax_tree, so code that walks the AST by node kind
+works with both.
+
+Children of a node are its fields that hold nodes, in order of the fields.
+A list of nodes is a LIST node with the elements as children, and a field
+set to None is a NONE node. Other values (names, numbers, operators, ...)
+are payloads, kept in a list. Lists of views are ChildLists, which write
+changes back to the arena.
+
+Arrays only grow: nodes that are replaced stay in them, unreachable, until
+the arena is dropped.
+"""
+
+from array import array
+import dataclasses
+
+try:
+    import abstract_syntax_tree as AST
+except (ImportError, ModuleNotFoundError):
+    from . import abstract_syntax_tree as AST
+
+# Kinds of arena nodes that are not AST nodes
+LIST = len(AST.NODES)
+NONE = LIST + 1
+
+# Fields that don't hold nodes. FunctionCall.origin refers to a function
+# defined elsewhere, so it's a payload too.
+PAYLOADS = {
+    AST.BinOp: ("op",),
+    AST.Name: ("value",),
+    AST.Integer: ("value",),
+    AST.String: ("value",),
+    AST.Float: ("value",),
+    AST.Bool: ("value",),
+    AST.Func: ("need_dealloc",),
+    AST.FunctionCall: ("origin",),
+    AST.Warning: ("message",),
+    AST.ExternC: ("code",),
+    AST.End: ("char",),
+}
+
+# Fields filled in after parsing (by the lexer and the analyzer), payloads
+# of every node that has them
+ANNOTATIONS = ("symbol", "value_type")
+
+class Layout:
+    """
+    Where fields of a node class are kept in the arena
+    """
+    def __init__(self, cls):
+        names = [i.name for i in dataclasses.fields(cls)]
+
+        self.payloads = PAYLOADS.get(cls, ()) + tuple(i for i in names if i in ANNOTATIONS)
+        self.children = tuple(i for i in names if i not in self.payloads and i not in ("lineno", "pos"))
+        self.lineno = "lineno" in names
+        self.pos = "pos" in names
+
+LAYOUTS = [Layout(cls) for cls in AST.NODES]
+
+class View:
+    """
+    Node of an arena, looks like the AST node of the same kind
+    """
+    __slots__ = ("_arena", "_index")  # Not to clash with fields (like Indexed.index)
+
+    def __init__(self, arena, index):
+        self._arena = arena
+        self._index = index
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other._arena is self._arena and other._index == self._index
+
+    def __hash__(self):
+        return hash((id(self._arena), self._index))
+
+    def __repr__(self):
+        fields = ", ".join(f"{i}={getattr(self, i)!r}" for i in self._fields)
+        return f"{type(self).__qualname__}({fields})"
+
+class ChildList(list):
+    """
+    Elements of a LIST node of an arena
+
+    A list (so code that checks for lists works with it) which writes every
+    change back to the arena: the node gets the elements as its children
+    again, elements that were already there are linked as they are.
+    """
+    __slots__ = ("_arena", "_index")
+
+    def __init__(self, arena, index, elements=()):
+        super().__init__(elements)
+        self._arena = arena
+        self._index = index
+
+def write_back(name):
+    method = getattr(list, name)
+
+    def change(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._arena.set_children(self._index, self)
+        return result
+
+    change.__name__ = name
+    return change
+
+for name in ("append", "extend", "insert", "pop", "remove", "clear", "sort", "reverse",
+             "__setitem__", "__delitem__", "__iadd__", "__imul__"):
+    setattr(ChildList, name, write_back(name))
+
+def child_field(number):
+    def get(self):
+        arena = self._arena
+        index = arena.first_child[self._index]
+        for _ in range(number):
+            index = arena.next_sibling[index]
+        return arena.view(index)
+
+    def set(self, value):
+        self._arena.replace_child(self._index, number, value)
+
+    return property(get, set)
+
+def payload_field(number):
+    def get(self):
+        arena = self._arena
+        return arena.values[arena.payload[self._index] + number]
+
+    def set(self, value):
+        arena = self._arena
+        arena.values[arena.payload[self._index] + number] = value
+
+    return property(get, set)
+
+def array_field(name):
+    def get(self):
+        return getattr(self._arena, name)[self._index]
+
+    def set(self, value):
+        getattr(self._arena, name)[self._index] = value
+
+    return property(get, set)
+
+def view_class(cls):
+    """
+    View class of AST node class `cls`
+
+    It has the name of `cls`, so messages that show types of nodes are the
+    same for both.
+    """
+    layout = LAYOUTS[cls.kind]
+    namespace = {
+        "__slots__": (),
+        "__module__": cls.__module__,
+        "__qualname__": cls.__qualname__,
+        "kind": cls.kind,
+        "_fields": tuple(i.name for i in dataclasses.fields(cls) if i.repr),
+    }
+
+    for number, name in enumerate(layout.children):
+        namespace[name] = child_field(number)
+    for number, name in enumerate(layout.payloads):
+        namespace[name] = payload_field(number)
+    if layout.lineno:
+        namespace["lineno"] = array_field("linenos")
+    if layout.pos:
+        namespace["pos"] = array_field("spans")
+
+    return type(cls.__name__, (View,), namespace)
+
+VIEWS = [view_class(cls) for cls in AST.NODES]
+
+class Arena:
+    """
+    Nodes of one AST in parallel arrays
+
+    Indexes of nodes are positions in the arrays, -1 is no node (or no
+    position or payload).
+    """
+    def __init__(self):
+        self.kinds = array("B")
+        self.first_child = array("i")
+        self.next_sibling = array("i")
+        self.linenos = array("i")
+        self.spans = array("i")
+        self.payload = array("i")
+        self.values = []
+        self.linked = bytearray()  # 1 for nodes that have a parent
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def nbytes(self):
+        """
+        Size of the arrays and of the payload list (not of payloads)
+        """
+        arrays = (self.kinds, self.first_child, self.next_sibling, self.linenos, self.spans, self.payload)
+        return sum(len(i) * i.itemsize for i in arrays) + len(self.values) * 8
+
+    def add(self, node):
+        """
+        Moves node and nodes under it to the arena, returns its view
+
+        Views of nodes of this arena that have no parent yet are linked as
+        they are, so a tree can be moved in parts, starting from the bottom.
+        Other views are copied, like nodes.
+        """
+        return self.view(self.store(node))
+
+    def store(self, node):
+        """
+        Same as add(), returns index of the node
+        """
+        kinds = self.kinds
+        next_sibling = self.next_sibling
+        linked = self.linked
+
+        ids = []      # Indexes of stored values, children of a value are at the end
+        stack = [node]
+
+        # Iterative, because chains of binary operations can be very deep
+        while stack:
+            value = stack.pop()
+
+            if type(value) is tuple:
+                # All children of the value are stored
+                value, count = value
+                children = ids[len(ids) - count:]
+                del ids[len(ids) - count:]
+
+                for i in range(count - 1):
+                    next_sibling[children[i]] = children[i + 1]
+                if children:
+                    next_sibling[children[-1]] = -1
+                for i in children:
+                    linked[i] = 1
+
+                ids.append(len(kinds))
+                self.first_child.append(children[0] if children else -1)
+                next_sibling.append(-1)
+                linked.append(0)
+
+                if value is None:
+                    kinds.append(LIST)
+                    self.linenos.append(0)
+                    self.spans.append(-1)
+                    self.payload.append(-1)
+                    continue
+
+                layout = LAYOUTS[value.kind]
+                kinds.append(value.kind)
+                self.linenos.append(value.lineno if layout.lineno else 0)
+                self.spans.append(value.pos if layout.pos else -1)
+
+                if layout.payloads:
+                    self.payload.append(len(self.values))
+                    self.values.extend(getattr(value, i) for i in layout.payloads)
+                else:
+                    self.payload.append(-1)
+            elif value is None:
+                ids.append(self.new(NONE))
+            elif type(value) is ChildList and value._arena is self and not linked[value._index]:
+                linked[value._index] = 1
+                ids.append(value._index)
+            elif isinstance(value, list):
+                stack.append((None, len(value)))
+                stack.extend(reversed(value))
+            elif isinstance(value, View) and value._arena is self and not linked[value._index]:
+                linked[value._index] = 1  # Now, in case it's used twice
+                ids.append(value._index)
+            else:
+                children = [getattr(value, i) for i in LAYOUTS[value.kind].children]
+                stack.append((value, len(children)))
+                stack.extend(reversed(children))
+
+        return ids[0]
+
+    def new(self, kind):
+        """
+        Adds node without children and payload, returns its index
+        """
+        self.kinds.append(kind)
+        self.first_child.append(-1)
+        self.next_sibling.append(-1)
+        self.linenos.append(0)
+        self.spans.append(-1)
+        self.payload.append(-1)
+        self.linked.append(0)
+        return len(self.kinds) - 1
+
+    def children(self, index):
+        """
+        Indexes of children of node
+        """
+        child = self.first_child[index]
+        while child >= 0:
+            yield child
+            child = self.next_sibling[child]
+
+    def view(self, index):
+        """
+        View of node: a View, a ChildList (of LIST node) or None (of NONE
+        node)
+        """
+        kind = self.kinds[index]
+
+        if kind < LIST:
+            return VIEWS[kind](self, index)
+        if kind == LIST:
+            return ChildList(self, index, [self.view(i) for i in self.children(index)])
+        return None
+
+    def set_children(self, index, values):
+        """
+        Makes values (nodes, lists or None) the children of node
+
+        Views of its children among values are linked as they are, others
+        are stored like by add(). Children left out stay in the arrays.
+        """
+        linked = self.linked
+        next_sibling = self.next_sibling
+
+        for i in self.children(index):
+            linked[i] = 0
+
+        ids = [self.store(i) for i in values]
+        for i in ids:
+            linked[i] = 1
+
+        for i in range(len(ids) - 1):
+            next_sibling[ids[i]] = ids[i + 1]
+        if ids:
+            next_sibling[ids[-1]] = -1
+
+        self.first_child[index] = ids[0] if ids else -1
+
+    def replace_child(self, index, number, value):
+        """
+        Replaces child `number` of node with value (a node, list or None)
+
+        The replaced child stays in the arrays (so do its children, unless
+        value has views of them, they are copied then).
+        """
+        new = self.store(value)
+        previous = -1
+        child = self.first_child[index]
+        for _ in range(number):
+            previous, child = child, self.next_sibling[child]
+
+        self.next_sibling[new] = self.next_sibling[child]
+        self.linked[child] = 0
+        self.linked[new] = 1
+        if previous < 0:
+            self.first_child[index] = new
+        else:
+            self.next_sibling[previous] = new
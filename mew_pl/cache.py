@@ -0,0 +1,175 @@
+import os
+import json
+import hashlib
+
+
+def cache_dir(*parts):
+    """
+    Returns a per-user cache directory for Mew (creates it if needed)
+
+    Location can be overriden with `MEW_CACHE_DIR` environment variable,
+    otherwise `$XDG_CACHE_HOME/mew` or `~/.cache/mew` is used.
+
+    Returns None if directory can't be created (caching is disabled then)
+    """
+    root = os.environ.get("MEW_CACHE_DIR")
+
+    if not root:
+        xdg = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        root = os.path.join(xdg, "mew")
+
+    path = os.path.join(root, *parts)
+
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        return None
+
+    return path
+
+
+class BuildCache:
+    """
+    Content-addressed cache of compilation results
+
+    Entries are keyed by a hash of the source and everything else that
+    affects the output (target fingerprint, compiler version, options).
+    When the cache grows over `max_size` bytes, least recently used entries
+    are evicted.
+    """
+    DEFAULT_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, path, max_size=DEFAULT_SIZE):
+        self.path = path
+        self.max_size = max_size
+
+    @classmethod
+    def default(cls):
+        """
+        Build cache in the user cache directory, or None if it's not available
+        """
+        path = cache_dir("build")
+        if path is None:
+            return None
+
+        size = os.environ.get("MEW_BUILD_CACHE_SIZE")
+        return cls(path, int(size) if size else cls.DEFAULT_SIZE)
+
+    @staticmethod
+    def key(source, *context):
+        h = hashlib.sha256()
+        for i in context:
+            h.update(str(i).encode() + b"\0")
+        h.update(source.encode())
+        return h.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key + ".json")
+
+    def get(self, key):
+        """
+        Returns cached data of entry (code and diagnostics) or None
+        """
+        path = self.entry_path(key)
+
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            os.utime(path)  # Mark entry as recently used
+        except (OSError, ValueError):
+            return None
+
+        return data
+
+    def put(self, key, data):
+        path = self.entry_path(key)
+        tmpname = f"{path}.{os.getpid()}.tmp"
+
+        try:
+            with open(tmpname, "w") as f:
+                json.dump(data, f)
+            os.replace(tmpname, path)
+        except OSError:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+            return
+
+        self.evict()
+
+    def entries(self):
+        """
+        Returns list of (path, size, last_used) of all entries
+        """
+        result = []
+
+        try:
+            with os.scandir(self.path) as it:
+                for i in it:
+                    if i.name.endswith(".json"):
+                        st = i.stat()
+                        result.append((i.path, st.st_size, st.st_mtime))
+        except OSError:
+            pass
+
+        return result
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+
+        if total <= self.max_size:
+            return
+
+        # Oldest first
+        entries.sort(key=lambda i: i[2])
+
+        for path, size, _ in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            "path": self.path,
+            "entries": len(entries),
+            "size": sum(size for _, size, _ in entries),
+            "max_size": self.max_size,
+        }
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def main(argv):
+    import argparse
+
+    try:
+        from log import Log
+    except (ImportError, ModuleNotFoundError):
+        from .log import Log
+
+    argparser = argparse.ArgumentParser(prog='mew cache', description="Manage build cache")
+    argparser.add_argument("action", choices=["stats", "clear"])
+    args = argparser.parse_args(argv)
+
+    cache = BuildCache.default()
+    if cache is None:
+        Log.error("build cache directory is not available")
+        exit(1)
+
+    if args.action == "stats":
+        stats = cache.stats()
+        print(f"path:    {stats['path']}")
+        print(f"entries: {stats['entries']}")
+        print(f"size:    {stats['size'] / 1024:.1f} KiB of {stats['max_size'] / 1024:.1f} KiB")
+    else:
+        cache.clear()
@@ -1,22 +1,34 @@
 try:
+    import tracing
     import abstract_syntax_tree as AST
+    from errors import CompileError, Diagnostic
+    from source_map import SourceMap
 except:
+    from . import tracing
     from . import abstract_syntax_tree as AST
-
-from pprint import pprint
+    from .errors import CompileError, Diagnostic
+    from .source_map import SourceMap
 
 class CodeBuilder:
-    def __init__(self, filename, ast, target, src_code):
+    def __init__(self, filename, ast, target, src_code, source_map=None):
         self.filename = filename
         self.ast = ast
         self.target = target
         self.src_code = src_code
+        self.source_map = source_map or SourceMap(src_code, filename)
 
         self.code = ""
 
+    def fatal_error(self, op, message):
+        lineno, column = self.source_map.locate(op)
+        raise CompileError(
+            Diagnostic("error", message, self.filename, lineno, column,
+                       line=self.source_map.line(lineno) if lineno else None)
+        )
+
     def build_func(self, func):
-        print("Func")
-        pprint(func)
+        if tracing.codegen:
+            tracing.dump("codegen", func)
 
         fn_ret_type = func.ret
 
@@ -25,20 +37,32 @@ class CodeBuilder:
         else:
             fn_ret_type = "void"
 
-        exit(1)
+        self.fatal_error(func, "TODO: Code generation for functions")
+
+    def build_extern(self, op):
+        return op.code + "\n"
+
+    def build_end(self, op):
+        return op.char
+
+    def build_use(self, op):
+        return ""  # Used modules are built on their own (see modules.py)
+
+    def build_unsupported(self, op):
+        self.fatal_error(op, f"TODO: Support for {type(op)}")
+
+    # Builders of operations, by node kind
+    operation_builders = AST.dispatch_table({
+        AST.ExternC: build_extern,
+        AST.End: build_end,
+        AST.Use: build_use,
+        AST.Func: build_func,
+    }, build_unsupported)
 
     def build_operation(self, op: AST.Operation):
         op = op.op  # op op op op op op
 
-        if type(op) is AST.ExternC:
-            return op.code + "\n"
-        elif type(op) is AST.End:
-            return op.char
-        elif type(op) is AST.Func:
-            return self.build_func(op)
-        else:
-            print("TODO: Support for", type(op))
-            exit(1)
+        return self.operation_builders[op.kind](self, op)
 
     def build_program(self, inp: AST.Program):
         code = inp.operations
@@ -47,7 +71,7 @@ class CodeBuilder:
             self.code += self.build_operation(i)
 
     def build_code(self):
-        if type(self.ast) is AST.Program:
+        if self.ast.kind == AST.Program.kind:
             return self.build_program(self.ast)
 
     def start(self):
@@ -0,0 +1,369 @@
+from dataclasses import dataclass, field, asdict
+from functools import partial
+import threading
+
+try:
+    from errors import CompileError, Diagnostic
+except ImportError:
+    from .errors import CompileError, Diagnostic
+
+# Lexer and parser templates.  They are built once (on first use) and never
+# used directly: every Compiler works on its own clones of them.
+_lexer = None
+_parser = None
+_build_lock = threading.Lock()
+
+# Default compilers used by compile_source(), one per thread and target
+_local = threading.local()
+
+@dataclass
+class Result:
+    """
+    Result of compiling one source file
+    """
+    filename: str
+    code: str = None
+    diagnostics: list[Diagnostic] = field(default_factory=list)
+    passes: list = field(default_factory=list)  # PassStats of phases, if they were timed
+
+    @property
+    def ok(self):
+        return self.code is not None and \
+               not any(d.severity == "error" for d in self.diagnostics)
+
+    @property
+    def errors(self):
+        return [d for d in self.diagnostics if d.severity == "error"]
+
+    def attach_source(self, source_map):
+        """
+        Fills filenames and source lines of diagnostics, so they can be
+        shown without the source
+        """
+        for diag in self.diagnostics:
+            diag.filename = diag.filename or self.filename
+
+            if diag.line is None and diag.lineno:
+                diag.line = source_map.line(diag.lineno)
+
+def get_lexer():
+    """
+    Builds the lexer template on first use
+    """
+    global _lexer
+
+    with _build_lock:
+        if _lexer is None:
+            try:
+                import lex_and_parse
+                from tokens import Symbols
+            except (ImportError, ModuleNotFoundError):
+                from . import lex_and_parse
+                from .tokens import Symbols
+
+            _lexer = lex_and_parse.lex(module=lex_and_parse)
+            _lexer.filename = ""
+            _lexer.symbols = Symbols()  # Shared by clones, Compiler gives its lexer its own
+
+            # Type ids of columnar tokens (see tokens.TokenBuffer)
+            _lexer.token_types = ["$end", *lex_and_parse.tokens]
+
+    return _lexer
+
+def get_parser():
+    """
+    Builds the parser template (or loads its tables from cache) on first use
+    """
+    global _parser
+
+    with _build_lock:
+        if _parser is None:
+            try:
+                import lex_and_parse
+                from cache import cache_dir
+            except (ImportError, ModuleNotFoundError):
+                from . import lex_and_parse
+                from .cache import cache_dir
+
+            _parser = lex_and_parse.yacc(module=lex_and_parse, tabdir=cache_dir("parsetab"))
+
+    return _parser
+
+class Compiler:
+    """
+    Mew compiler instance
+
+    Owns its lexer, parser and options, so different instances can be
+    used from different threads at the same time. One instance can compile
+    any number of files, but only one at a time.
+
+    With `columnar`, source is lexed to a compact TokenBuffer before parsing
+    (the parser still gets a token object for every token of it).
+    With `pratt`, plain binary expressions are parsed by precedence climbing
+    (see expressions.ExpressionFilter) instead of the LALR parser.
+    With `arena`, the AST is kept in an ast_arena.Arena, which takes less
+    memory for very large programs, and is used through its views.
+    """
+    def __init__(self, target="linux", optimize_binops=False, build_cache=None, columnar=False,
+                 pratt=False, arena=False):
+        try:
+            from targetmgr import TargetManager
+            from tokens import Symbols
+        except (ImportError, ModuleNotFoundError):
+            from .targetmgr import TargetManager
+            from .tokens import Symbols
+
+        self.target = TargetManager(target)
+        self.optimize_binops = optimize_binops
+        self.build_cache = build_cache
+        self.columnar = columnar
+        self.pratt = pratt
+        self.arena = arena
+
+        self.lexer = get_lexer().clone()
+        self.parser = get_parser().clone()
+        self.symbols = self.lexer.symbols = Symbols()  # Of all compiled files
+        self.source_map = None  # Of the last compiled text
+        self.parser.optimize_binops = optimize_binops
+
+    def compile(self, text, filename="<string>", time_passes=False):
+        """
+        Compiles Mew source code to C
+
+        Never exits: all errors are returned as diagnostics in the Result.
+        With `time_passes`, time and memory of every phase are recorded in
+        `Result.passes` (the build cache is not used then).
+        """
+        if time_passes:
+            return self.compile_timed(text, filename)
+
+        if self.build_cache is None:
+            return self.compile_uncached(text, filename)
+
+        try:
+            key = self.cache_key(text)
+        except OSError:
+            # Target files can't be read, compiling reports what's wrong
+            return self.compile_uncached(text, filename)
+
+        cached = self.build_cache.get(key)
+
+        if cached is not None:
+            return Result(filename, cached["code"], [
+                Diagnostic(**dict(i, filename=filename)) for i in cached["diagnostics"]
+            ])
+
+        result = self.compile_uncached(text, filename)
+
+        # Failed compilations are cheap to repeat, and their diagnostics
+        # may depend on things outside the source (like missing files)
+        if result.ok:
+            self.build_cache.put(key, {
+                "code": result.code,
+                "diagnostics": [asdict(i) for i in result.diagnostics],
+            })
+
+        return result
+
+    def cache_key(self, text):
+        try:
+            from version import __version__
+        except (ImportError, ModuleNotFoundError):
+            from .version import __version__
+
+        return self.build_cache.key(
+            text, self.target.fingerprint(), __version__, self.optimize_binops
+        )
+
+    def get_source_map(self, text, filename="<string>"):
+        """
+        Source map of the text being compiled, shared by all stages
+        """
+        try:
+            from source_map import SourceMap
+        except (ImportError, ModuleNotFoundError):
+            from .source_map import SourceMap
+
+        if self.source_map is None or self.source_map.text is not text:
+            self.source_map = SourceMap(text, filename)
+
+        return self.source_map
+
+    def filter_tokens(self, lexer):
+        """
+        Wraps lexer into filters the parser reads tokens through
+        """
+        try:
+            from tokens import TerminatorFilter
+        except (ImportError, ModuleNotFoundError):
+            from .tokens import TerminatorFilter
+
+        lexer = TerminatorFilter(lexer)
+
+        if self.pratt:
+            try:
+                from expressions import ExpressionFilter
+            except (ImportError, ModuleNotFoundError):
+                from .expressions import ExpressionFilter
+
+            lexer = ExpressionFilter(lexer, self.optimize_binops)
+
+        return lexer
+
+    def parse(self, text, filename="<string>", timer=None):
+        """
+        Parses source code to AST (raises CompileError)
+        """
+        self.lexer.filename = filename
+        self.lexer.lineno = 1
+        self.lexer.source_map = self.get_source_map(text, filename)
+
+        if not self.arena:
+            return self.parse_text(text, timer)
+
+        try:
+            from ast_arena import Arena
+        except (ImportError, ModuleNotFoundError):
+            from .ast_arena import Arena
+
+        arena = self.parser.arena = Arena()
+        try:
+            return arena.add(self.parse_text(text, timer))
+        finally:
+            self.parser.arena = None
+
+    def parse_text(self, text, timer=None):
+        if self.columnar:
+            return self.parse_columnar(text, timer)
+
+        if timer is None:
+            return self.parser.parseopt_notrack(text, lexer=self.filter_tokens(self.lexer))
+
+        # Lexer is driven by the parser, so to time them separately all
+        # tokens are read first
+        with timer.phase("lex"):
+            self.lexer.input(text)
+            tokens = list(self.lexer)
+
+        with timer.phase("parse"):
+            return self.parser.parseopt_notrack(lexer=self.filter_tokens(TokenReplay(tokens, self.lexer)))
+
+    def parse_columnar(self, text, timer=None):
+        try:
+            from tokens import tokenize, BufferLexer
+            from timing import NullTimer
+        except (ImportError, ModuleNotFoundError):
+            from .tokens import tokenize, BufferLexer
+            from .timing import NullTimer
+
+        timer = timer or NullTimer()
+
+        with timer.phase("lex"):
+            buffer = tokenize(self.lexer, text, self.lexer.token_types)
+
+        with timer.phase("parse"):
+            tokens = BufferLexer(buffer, self.lexer, self.lexer.source_map)
+            return self.parser.parseopt_notrack(lexer=self.filter_tokens(tokens))
+
+    def generate(self, ast, text, filename="<string>", timer=None, imports=()):
+        """
+        Analyzes AST and builds C code of it (raises CompileError)
+
+        `imports` are functions and structs of used modules.
+        """
+        try:
+            from new_analyzer import ASTAnalyzer
+            from code_builder import CodeBuilder
+            from timing import NullTimer
+        except (ImportError, ModuleNotFoundError):
+            from .new_analyzer import ASTAnalyzer
+            from .code_builder import CodeBuilder
+            from .timing import NullTimer
+
+        timer = timer or NullTimer()
+        source_map = self.get_source_map(text, filename)
+
+        with timer.phase("analyze"):
+            analyzer = ASTAnalyzer(filename, ast, text, timer, source_map, self.symbols, imports)
+            ast = analyzer.analyze()
+
+        with timer.phase("codegen"):
+            builder = CodeBuilder(filename, ast, self.target, text, source_map)
+            builder.start()
+
+        return builder.code
+
+    def compile_uncached(self, text, filename="<string>", timer=None):
+        result = Result(filename)
+
+        try:
+            ast = self.parse(text, filename, timer)
+            result.code = self.generate(ast, text, filename, timer)
+        except CompileError as e:
+            result.diagnostics.append(e.diagnostic)
+        except Exception as e:
+            # A bug of the compiler, still reported and not raised
+            result.diagnostics.append(
+                Diagnostic("error", f"Internal compiler error: {type(e).__name__}: {e}", filename)
+            )
+
+        result.attach_source(self.get_source_map(text, filename))
+        return result
+
+    def compile_timed(self, text, filename="<string>"):
+        try:
+            from timing import PassTimer
+        except (ImportError, ModuleNotFoundError):
+            from .timing import PassTimer
+
+        timer = PassTimer()
+        timer.start()
+
+        try:
+            result = self.compile_uncached(text, filename, timer)
+        finally:
+            timer.stop()
+
+        result.passes = timer.passes
+        return result
+
+    def compile_file(self, path, time_passes=False):
+        """
+        Reads and compiles a source file
+        """
+        try:
+            with open(path, "r") as f:
+                text = f.read()
+        except OSError as e:
+            return Result(path, diagnostics=[
+                Diagnostic("error", f"Can't read file: {e.strerror}", path)
+            ])
+
+        return self.compile(text, path, time_passes)
+
+class TokenReplay:
+    """
+    Feeds already read tokens to the parser
+    """
+    def __init__(self, tokens, lexer):
+        self.token = partial(next, iter(tokens), None)
+        self.lexer = lexer
+
+    def __getattr__(self, name):
+        return getattr(self.lexer, name)
+
+def compile_source(text, filename="<string>", target="linux", time_passes=False):
+    """
+    Compiles Mew source code to C using a warm compiler of the current thread
+    """
+    compilers = getattr(_local, "compilers", None)
+    if compilers is None:
+        compilers = _local.compilers = {}
+
+    if target not in compilers:
+        try:
+            compilers[target] = Compiler(target)
+        except CompileError as e:
+            return Result(filename, diagnostics=[e.diagnostic])
+
+    return compilers[target].compile(text, filename, time_passes)
@@ -1,25 +1,69 @@
+from dataclasses import dataclass
+
 try:
     from log import Log
 except ImportError:
     from .log import Log
 
+@dataclass
+class Diagnostic:
+    """
+    Error or warning produced by any stage of compilation
+    """
+    severity: str  # "error" or "warning"
+    message: str
+    filename: str = None
+    lineno: int = None
+    column: int = None
+    note: str = None
+    line: str = None  # Source line the diagnostic refers to
+
+    def render(self):
+        """
+        Prints diagnostic to the terminal
+        """
+        where = ""
+        if self.lineno:
+            where = f"(at {self.filename or ''}:{self.lineno}): "
+        elif self.filename:
+            where = f"(at {self.filename}): "
+
+        if self.severity == "error":
+            Log.error(where + self.message)
+        else:
+            Log.warning(where + self.message)
+
+        if self.line is not None and self.lineno:
+            offset = Log.codeline(self.line, self.lineno)
+
+            if self.column is not None:
+                print(" "*(offset + self.column), "^", sep='')
+
+        if self.note:
+            Log.note(self.note)
+
+class CompileError(Exception):
+    """
+    Raised by any stage of compilation when it can't go further
+    """
+    def __init__(self, diagnostic):
+        super().__init__(diagnostic.message)
+        self.diagnostic = diagnostic
+
 class LexerError:
     def __init__(self, lexer):
-        self.lex = lexer
-        self.code = lexer.lexdata
-
-        self.lines = self.code.split("\n")
-        self.lentable = list(map(lambda i: (len(i) + 1), self.lines))
+        try:
+            from source_map import source_map_of
+        except ImportError:
+            from .source_map import source_map_of
 
-    def error(self, filename, message, token):
-        ln = token.lineno
-        abspos = token.lexpos
-        
-        filemsg = f"(at {filename}:L{ln}:C{abspos})"
-        Log.error(filemsg + " " + message)
+        self.lex = lexer
+        self.source_map = source_map_of(lexer)
 
-        offset = Log.codeline(self.lines[ln-1], ln)
+    def diagnostic(self, filename, message, token):
+        ln, column = self.source_map.location(token.lexpos)
 
-        relpos = abspos - sum(self.lentable[:ln-1])
+        return Diagnostic("error", message, filename, ln, column, line=self.source_map.line(ln))
 
-        print(" "*(offset + relpos), "^", sep='')
+    def error(self, filename, message, token):
+        self.diagnostic(filename, message, token).render()
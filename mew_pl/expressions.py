@@ -0,0 +1,241 @@
+"""
+Precedence climbing parser of binary expressions
+
+An optional stage between the lexer and the LALR parser. Binary
+expressions of plain operands (names, literals, dotted paths, negative
+values and parentheses) are parsed here and passed to the parser as one
+EXPRESSION token, whose value is the finished tree. Expressions with
+anything else (calls, indexing, ...) are passed on as they are, so the
+parser builds the same trees from both.
+"""
+
+try:
+    from ply.lex import LexToken
+    import abstract_syntax_tree as AST
+    import lex_and_parse
+except (ImportError, ModuleNotFoundError):
+    from .ply.lex import LexToken
+    from . import abstract_syntax_tree as AST
+    from . import lex_and_parse
+
+# Levels of binary operators (all of them are left associative)
+LEVELS = {
+    name: level
+    for level, (assoc, *names) in enumerate(lex_and_parse.precedence, 1) if assoc == "left"
+    for name in names
+}
+
+ARITHMETIC = frozenset(("PLUS", "MINUS", "MUL", "DIV"))
+
+# Tokens an expression may come after (None is the start of input) ...
+STARTS_AFTER = frozenset((
+    None, "ASSIGN", "RETURN", "IF", "WHILE", "ARROW_RIGHT", "PAREN_OPEN", "COMMA",
+    "BRACKET_OPEN", "SEMICOLON", "NEWLINE", "CURLY_OPEN", "CURLY_CLOSE",
+))
+
+# ... and tokens that may follow it (None is the end of input)
+ENDS_BEFORE = frozenset((
+    None, "ASSIGN", "PAREN_CLOSE", "COMMA", "BRACKET_CLOSE", "SEMICOLON", "NEWLINE",
+    "CURLY_OPEN", "CURLY_CLOSE",
+))
+
+OPERAND_STARTS = frozenset(("ID", "INTEGER", "FLOAT", "STRING", "TRUE", "FALSE", "MINUS", "PAREN_OPEN"))
+
+class ExpressionFilter:
+    """
+    Replaces plain binary expressions in the token stream with EXPRESSION
+    tokens
+
+    An expression is parsed only if it has at least one operator and is
+    followed by a token that may end it. Otherwise tokens up to the one
+    that stopped it are passed on unchanged, and the search goes on from
+    that token.
+    """
+    def __init__(self, lexer, optimize_binops=False):
+        self.lexer = lexer
+        self.next_token = lexer.token
+        self.optimize_binops = optimize_binops
+
+        self.pending = []    # Tokens to pass on as they are, in reverse order
+        self.lookahead = []  # Tokens to search again, in reverse order
+        self.previous = None  # Type of the last passed token
+
+        self.buffer = []    # Tokens read by the current attempt
+        self.pos = 0
+        self.operators = 0
+
+        self.expressions = 0  # Number of made EXPRESSION tokens
+
+    def __getattr__(self, name):
+        # Parser passes the lexer it was given to p_error
+        return getattr(self.lexer, name)
+
+    def input(self, text):
+        self.lexer.input(text)
+
+    def token(self):
+        if self.pending:
+            tok = self.pending.pop()
+        else:
+            tok = self.lookahead.pop() if self.lookahead else self.next_token()
+
+            if tok is not None and tok.type in OPERAND_STARTS and self.previous in STARTS_AFTER:
+                tok = self.parse(tok)
+
+        if tok is not None:
+            self.previous = tok.type
+        return tok
+
+    def parse(self, first):
+        """
+        Parses the expression starting with `first`, returns the token to
+        pass on
+        """
+        buffer = [first]     # Tokens read (None is the end of input)
+        i = 0                # Index of the current token
+        lookahead = self.lookahead
+        next_token = self.next_token
+
+        operands = []
+        operators = []       # Operator tokens and `(` (as None)
+        count = 0            # Number of operators
+
+        while True:
+            # Operand: `(`s, then a path of values
+            tok = buffer[i]
+            while tok is not None and tok.type == "PAREN_OPEN":
+                operators.append(None)
+                i += 1
+                if i == len(buffer):
+                    buffer.append(lookahead.pop() if lookahead else next_token())
+                tok = buffer[i]
+
+            node = None
+            while True:
+                value, i = self.value(buffer, i)
+                if value is None:
+                    break
+
+                if node is None:
+                    node = value
+                elif type(node) is AST.Path:
+                    node.elements.append(value)
+                else:
+                    node = AST.Path([node, value], node.lineno)
+
+                if i == len(buffer):
+                    buffer.append(lookahead.pop() if lookahead else next_token())
+                tok = buffer[i]
+
+                if tok is None or tok.type != "DOT":
+                    break
+                i += 1
+
+            if value is None:
+                break
+            operands.append(node)
+
+            # Operator or `)`s
+            while tok is not None and tok.type == "PAREN_CLOSE" and None in operators:
+                while operators[-1] is not None:
+                    self.reduce(operands, operators.pop())
+                operators.pop()
+
+                i += 1
+                if i == len(buffer):
+                    buffer.append(lookahead.pop() if lookahead else next_token())
+                tok = buffer[i]
+
+            level = LEVELS.get(tok.type) if tok is not None else None
+            if level is None:
+                # End of the expression
+                if (count and None not in operators and (tok is None or tok.type in ENDS_BEFORE)):
+                    while operators:
+                        self.reduce(operands, operators.pop())
+
+                    lookahead.extend(reversed(buffer[i:]))
+
+                    tok = LexToken()
+                    tok.type = "EXPRESSION"
+                    tok.value = operands[0]
+                    tok.lineno = first.lineno
+                    tok.lexpos = first.lexpos
+                    tok.first = first  # For syntax errors
+
+                    self.expressions += 1
+                    return tok
+                break
+
+            while operators and operators[-1] is not None and LEVELS[operators[-1].type] >= level:
+                self.reduce(operands, operators.pop())
+
+            operators.append(tok)
+            count += 1
+
+            i += 1
+            if i == len(buffer):
+                buffer.append(lookahead.pop() if lookahead else next_token())
+
+        # Tokens from the one that stopped the expression are searched again
+        stop = max(i, 1)
+        lookahead.extend(reversed(buffer[stop:]))
+        self.pending.extend(reversed(buffer[1:stop]))
+        return first
+
+    def reduce(self, operands, tok):
+        right = operands.pop()
+        left = operands.pop()
+
+        if tok.type in ARITHMETIC:
+            operands.append(lex_and_parse.arith_binop(left, tok.value, right, self.optimize_binops))
+        else:
+            operands.append(AST.BinOp(left, tok.value, right, left.lineno))
+
+    def value(self, buffer, i):
+        """
+        Value at buffer[i] and index of the token after it (None and i if
+        there's no plain value)
+        """
+        start = i
+        minuses = []
+
+        while True:
+            if i == len(buffer):
+                buffer.append(self.lookahead.pop() if self.lookahead else self.next_token())
+
+            tok = buffer[i]
+            if tok is None:
+                return None, start
+
+            kind = tok.type
+            i += 1
+            if kind != "MINUS":
+                break
+
+            minuses.append(tok)
+
+        if kind == "ID":
+            value = AST.Name(tok.value, tok.lineno, tok.lexpos, tok.symbol)
+        elif kind == "INTEGER":
+            value = AST.Integer(tok.value, tok.lineno, tok.lexpos)
+        elif kind == "FLOAT":
+            value = AST.Float(tok.value, tok.lineno, tok.lexpos)
+        elif kind == "STRING":
+            value = AST.String(tok.value, tok.lineno, tok.lexpos)
+        elif kind == "TRUE" or kind == "FALSE":
+            value = AST.Bool(kind == "TRUE", tok.lineno, tok.lexpos)
+        else:
+            return None, start
+
+        # Same nodes as the `value : MINUS value` rule, located at the minus
+        for minus in reversed(minuses):
+            if type(value) is AST.Integer:
+                value = AST.Integer(-value.value, minus.lineno, minus.lexpos)
+            elif type(value) is AST.Float:
+                value = AST.Float(-value.value, minus.lineno, minus.lexpos)
+            elif type(value) in (AST.Name, AST.String):
+                value = AST.Name("-" + value.value, minus.lineno, minus.lexpos)
+            else:
+                return None, start
+
+        return value, i
@@ -0,0 +1,114 @@
+"""
+`mew grammar-report`: size and conflicts of the parser tables
+
+Tables are always generated from the grammar in lex_and_parse (the table
+cache is not used), so the report shows the grammar as it is now.
+"""
+
+import pickle
+
+try:
+    import lex_and_parse
+    from ply import yacc
+except (ImportError, ModuleNotFoundError):
+    from . import lex_and_parse
+    from .ply import yacc
+
+class StateLog:
+    """
+    Logger for LRTable that keeps items of every state
+    """
+    def __init__(self):
+        self.items = {}
+        self.state = None
+
+    def info(self, message, *args):
+        if message == 'state %d':
+            self.state = args[0]
+            self.items[self.state] = []
+        elif message == '    (%d) %s':
+            self.items[self.state].append(f"({args[0]}) {args[1]}")
+
+    def debug(self, message, *args):
+        pass
+
+    warning = error = critical = debug
+
+def build_grammar():
+    """
+    Grammar of Mew, built the way yacc() builds it
+    """
+    pdict = {name: getattr(lex_and_parse, name) for name in dir(lex_and_parse)}
+    pinfo = yacc.ParserReflect(pdict, log=yacc.NullLogger())
+    pinfo.get_all()
+    if pinfo.error or pinfo.validate_all():
+        raise yacc.YaccError('Unable to build parser')
+
+    grammar = yacc.Grammar(pinfo.tokens)
+    for term, assoc, level in pinfo.preclist:
+        grammar.set_precedence(term, assoc, level)
+    for funcname, (file, line, prodname, syms) in pinfo.grammar:
+        grammar.add_production(prodname, syms, funcname, file, line)
+    grammar.set_start(pinfo.start)
+
+    return grammar, pinfo
+
+def report(grammar, pinfo, log):
+    """
+    Numbers of the grammar and its tables (dict of name -> value)
+    """
+    lr = yacc.LRTable(grammar, log)
+    lr.bind_callables(pinfo.pdict)
+    parser = yacc.LRParser(lr, pinfo.error_func)
+
+    tables = {
+        'action': lr.lr_action,
+        'goto': lr.lr_goto,
+        'productions': [(p.str, p.name, p.len, p.func) for p in lr.lr_productions],
+    }
+
+    return {
+        'terminals': len(grammar.Terminals),
+        'nonterminals': len(grammar.Nonterminals),
+        'productions': len(grammar.Productions),
+        'states': len(lr.lr_action),
+        'shift/reduce conflicts': len(lr.sr_conflicts),
+        'reduce/reduce conflicts': len(lr.rr_conflicts),
+        'action entries': sum(len(i) for i in lr.lr_action.values()),
+        'goto entries': sum(len(i) for i in lr.lr_goto.values()),
+        'dense table cells': len(parser.dense_table) * len(parser.symbol_ids),
+        'pickled tables (bytes)': len(pickle.dumps(tables, pickle.HIGHEST_PROTOCOL)),
+    }, lr
+
+def main(argv):
+    import argparse
+
+    argparser = argparse.ArgumentParser(prog='mew grammar-report',
+                                        description="Print size and conflicts of the parser tables")
+    argparser.add_argument("--conflicts", action="store_true",
+                           help="List conflicts with items of their states")
+    argparser.add_argument("--check", action="store_true",
+                           help="Exit with code 1 if the grammar has conflicts")
+    args = argparser.parse_args(argv)
+
+    grammar, pinfo = build_grammar()
+    log = StateLog()
+    numbers, lr = report(grammar, pinfo, log)
+
+    for name, value in numbers.items():
+        print(f"{name + ':':<26}{value}")
+
+    if args.conflicts:
+        for state, tok, resolution in lr.sr_conflicts:
+            print(f"\nshift/reduce conflict for {tok} in state {state} resolved as {resolution}")
+            for item in log.items[state]:
+                print(f"    {item}")
+
+        for state, rule, rejected in lr.rr_conflicts:
+            print(f"\nreduce/reduce conflict in state {state} resolved using rule ({rule}), "
+                  f"rejected rule ({rejected})")
+            for item in log.items[state]:
+                print(f"    {item}")
+
+    if args.check and (lr.sr_conflicts or lr.rr_conflicts):
+        exit(1)
@@ -2,12 +2,16 @@ try:
     from ply.yacc import yacc
     from ply.lex import lex
     import abstract_syntax_tree as AST
-    from errors import LexerError
+    from errors import LexerError, CompileError, Diagnostic
+    from source_map import source_map_of
+    from tokens import Symbols
 except ImportError:
     from .ply.lex import lex
     from .ply.yacc import yacc
     from . import abstract_syntax_tree as AST
-    from .errors import LexerError
+    from .errors import LexerError, CompileError, Diagnostic
+    from .source_map import source_map_of
+    from .tokens import Symbols
 
 # TODO: Make deatiled error when lexing and parsing
 
@@ -43,25 +47,12 @@ reserved = (
     "USE"
 )
 
-optimize_binops = False
-
 reserved_map = {}
 for r in reserved:
     reserved_map[r.lower()] = r
 
-# r'[A-Za-z_][\w_]*'
-# r'\b(?!0(x|b|o))[a-zA-Z0-9]+'
-
-def t_ID(t):
-    r'[A-Za-z_][\w_]*'
-    t.type = reserved_map.get(t.value, "ID")
-    return t
-
-# t_STRING = r'"(.|\n)*?"'
-t_STRING = r'"[^"\\]*(?:\\.[^"\\]*)*"'
-
 tokens = ["STRING",
-          "INTEGER",
+          "INTEGER", "FLOAT",
           "PLUS", "MINUS", "MUL", "DIV",
           "ASSIGN", "EQUAL", "NOT_EQUAL",
           "GREATER", "LESS", "GREATER_EQ", "LESS_EQ",
@@ -69,50 +60,114 @@ tokens = ["STRING",
           "PAREN_OPEN", "PAREN_CLOSE",
           "CURLY_OPEN", "CURLY_CLOSE", "ID",
           "ARROW_RIGHT",
-          "BRACKET_OPEN", "BRACKET_CLOSE"
+          "BRACKET_OPEN", "BRACKET_CLOSE",
+          "EXPRESSION",  # Made by expressions.ExpressionFilter, not by the lexer
           ] + list(reserved)
 
+# Every rule must match in linear time, whatever the input is.
+#
+# PLY tries function rules in order of definition and only then the string
+# rules above (longest regex first), so the most frequent tokens are defined
+# first.  Comments and strings are not matched by one big regex: a rule
+# finds their start, and the end is searched with str.find() or an
+# unrolled regex, so unterminated ones are reported instead of rescanned.
+
+def lex_error(t, message):
+    le = LexerError(t.lexer)
+    raise CompileError(
+        le.diagnostic(getattr(t.lexer, "filename", None), message, t)
+    )
+
+def t_NEWLINE(token):
+    r'\n'
+    token.lexer.lineno += 1
+    return token
+
+def t_ID(t):
+    r'[A-Za-z_]\w*'
+    t.type = reserved_map.get(t.value, "ID")
+
+    if t.type == "ID":
+        # symbols (tokens.Symbols) are set by the owner of the lexer
+        symbols = getattr(t.lexer, "symbols", None)
+        if symbols is None:
+            # Not built by compiler.get_lexer(), so it gets a table of its own
+            symbols = t.lexer.symbols = Symbols()
+
+        t.symbol = symbols.intern(t.value)
+        t.value = symbols.names[t.symbol]
+
+    return t
+
 # r'\d+'
 # r'\b0((x[0-9a-fA-F_])|(b[01_])|(o[0-7_])).*'
-# r"(0x[\dA-Fa-f]+|0o[0-7]+|0b[10]+|\d+)"
 
-def t_INTEGER(token):
-    r"(0x[\dA-Fa-f]+|0o[0-7]+|0b[10]+|\d+)"
+def integer_value(text):
+    if len(text) == 1:
+        return int(text)
 
-    if len(token.value) == 1:
-        token.value = int(token.value)
-    else:
-        token.value = int(token.value, base=(
-            16 if token.value[1]=="x" else (
-                8 if token.value[1]=="o" else (
-                    2 if token.value[1]=="b" else (
-                        10
-                    )
+    return int(text, base=(
+        16 if text[1]=="x" else (
+            8 if text[1]=="o" else (
+                2 if text[1]=="b" else (
+                    10
                 )
             )
-        ))
+        )
+    ))
+
+# Lexed as one token, so `1.5` and `path.1` don't need two tokens of
+# lookahead in the parser
+def t_FLOAT(token):
+    r"(?:0x[\dA-Fa-f]+|0o[0-7]+|0b[10]+|\d+)\.(?:0x[\dA-Fa-f]+|0o[0-7]+|0b[10]+|\d+)"
+
+    whole, fraction = token.value.split(".")
+    try:
+        if whole.isdigit() and fraction.isdigit():
+            token.value = float(token.value)
+        else:
+            # Parts with prefixes (`0x10.5`) are numbers of their own, digits
+            # of a decimal fraction are kept as they are (`.05` is not `.5`)
+            if not fraction.isdigit():
+                fraction = str(integer_value(fraction))
+            token.value = float(str(integer_value(whole)) + "." + fraction)
+    except ValueError:
+        lex_error(token, "Float literal is too long")
     return token
 
-def t_NEWLINE(token):
-    r'\n'
-    token.lexer.lineno += 1
+def t_INTEGER(token):
+    r"(0x[\dA-Fa-f]+|0o[0-7]+|0b[10]+|\d+)"
+
+    try:
+        token.value = integer_value(token.value)
+    except ValueError:
+        lex_error(token, "Integer literal is too long")
     return token
 
+def t_comment(t):
+    r'//.*'
+
 def t_comment_multi(t):
-    r'/\*(.|\n)*?\*/'
-    t.lexer.lineno += t.value.count('\n')
+    r'/\*'
+    data = t.lexer.lexdata
+    end = data.find("*/", t.lexpos + 2)
 
-def t_comment(t):
-    r'\/\/\/?.*'
-    # t.lexer.lineno += 1
+    if end == -1:
+        lex_error(t, "Unterminated comment")
+
+    t.lexer.lineno += data.count("\n", t.lexpos, end)
+    t.lexer.lexpos = end + 2
+
+def t_STRING(t):
+    r'"[^"\\]*(?:\\.[^"\\]*)*"'
+    return t
+
+def t_unterminated_string(t):
+    r'"'
+    lex_error(t, "Unterminated string")
 
 def t_error(t):
-    # print(t.lexer.lexdata)  # Use this to indicate where error occured
-    le = LexerError(t.lexer)
-    le.error(t.lexer.filename, f"Illegal character {t.value[0]!r}", t)
-    # print(dir(t.lexer))
-    exit(1)
-    # t.lexer.skip(1)
+    lex_error(t, f"Illegal character {t.value[0]!r}")
 
 # Parser ================================================================
 
@@ -126,59 +181,127 @@ def eval_partial(a, op, b):
     elif op == "*":
         return a * b
 
+def arith_binop(left, op, right, optimize=False):
+    """
+    BinOp of + - * / (with `optimize`, folded if both sides are integers)
+    """
+    if optimize and type(left) is AST.Integer and type(right) is AST.Integer and op != "/":
+        return AST.Integer(eval_partial(left.value, op, right.value), left.lineno, left.pos)
+
+    return AST.BinOp(left, op, right, left.lineno)
+
 precedence = (
     ('left', 'EQUAL', 'NOT_EQUAL'),
-    ('left', 'GREATER', 'LESS'),
-    ('left', 'GREATER_EQ', 'LESS_EQ'),
+    ('left', 'GREATER', 'LESS', 'GREATER_EQ', 'LESS_EQ'),
     ('left', 'PLUS', 'MINUS'),
     ('left', 'MUL', 'DIV'),
     ('right', 'UMINUS'),
 )
 
+def parse_error(lexer, message, lexpos):
+    ln, column = source_map_of(lexer).location(lexpos)
+    filename = getattr(lexer, "filename", None)
+    raise CompileError(Diagnostic("error", message, filename, ln, column))
+
+def syntax_error(lexer, value, tokentype, lexpos):
+    parse_error(lexer, f"Syntax error at `{value}` ({tokentype})", lexpos)
+
 def p_error(p):
-    errtoken = "`"+p.value+"`" if p else "`unknown`"
-    tokentype = p.type if p else "`null`"
-    ln = p.lineno if p else 0
-    print(f'Syntax error at {errtoken} ({tokentype}) (:{ln})')
-    exit(1)
+    if not p:
+        raise CompileError(Diagnostic("error", "Syntax error at `unknown` (`null`)", None, 0, None))
+    if p.type == "EXPRESSION":
+        # Reported at the first token of the expression
+        p.first.lexer = p.lexer
+        p = p.first
+    syntax_error(p.lexer, p.value, p.type, p.lexpos)
+
+def split_ends(terminators):
+    """
+    Splits a run of terminators to End nodes (`;` and a newline right after
+    it are one End)
+    """
+    ends = []
+    semicolon = False
+
+    for char, lineno in terminators:
+        if semicolon and char == "\n":
+            semicolon = False
+            continue
+
+        ends.append(AST.End(char, lineno))
+        semicolon = char == ";"
+
+    return ends
+
+# Statements are separated by runs of terminators, the last statement of a
+# program or code block doesn't need one. The first End of a run belongs to
+# the statement before it, the rest become End operations.
 
 def p_program(p):
     '''
-    program : operation
-            | program operation
-            | empty
+    program : operations
+            | operations operation
+    '''
+    if len(p) == 3:
+        p[1].operations.append(p[2])
+    p[0] = p[1]
+
+def p_operations(p):
+    '''
+    operations : empty
+               | terminators
+               | operations operation terminators
     '''
     if len(p) == 2:
-        if p[1] and not ((type(p[1]) is AST.Operation) and p[1].op == "\n"):
-            p[0] = AST.Program([p[1]])
-        else:
-            p[0] = AST.Program([])
+        ends = split_ends(p[1]) if p[1] else []
+        p[0] = AST.Program([AST.Operation(i, i.lineno) for i in ends])
     else:
-        p[1].operations.append(p[2])
+        operations = p[1].operations
+        operations.append(p[2])
+        operations.extend(AST.Operation(i, i.lineno) for i in split_ends(p[3])[1:])
+        p[0] = p[1]
+
+def p_terminators(p):
+    '''
+    terminators : SEMICOLON
+                | NEWLINE
+                | terminators SEMICOLON
+                | terminators NEWLINE
+    '''
+    if len(p) == 2:
+        p[0] = [(p[1], p.lineno(1))]
+    else:
+        p[1].append((p[2], p.lineno(2)))
         p[0] = p[1]
 
 def p_operation(p):
     '''
-    operation : assign o_end
-              | expr o_end
-              | if o_end
-              | while o_end
-              | infinite_loop o_end
-              | func o_end
-              | return o_end
-              | typed_var o_end
-              | code_block o_end
-              | struct o_end
-              | warn o_end
-              | extern o_end
-              | break_or_continue o_end
-              | use o_end
-              | lambda o_end
-              | op_short o_end
-              | incdec o_end
-              | end
-    '''
-    p[0] = AST.Operation(p[1], p[1].lineno if hasattr(p[1], 'lineno') else p.lineno(1))
+    operation : assign
+              | expr
+              | if
+              | while
+              | infinite_loop
+              | func
+              | return
+              | typed_var
+              | code_block
+              | struct
+              | warn
+              | extern
+              | break_or_continue
+              | use
+              | lambda
+              | op_short
+              | incdec
+    '''
+    p[0] = AST.Operation(p[1], p[1].lineno)
+
+    # arena is set by the owner of the parser (see compiler.Compiler). Every
+    # operation is moved to it when parsed, so the whole AST is never made
+    # of objects.
+    arena = getattr(p.parser, "arena", None)
+    if arena is not None:
+        p[0] = arena.add(p[0])
 
 def p_array(p):
     '''
@@ -214,11 +337,12 @@ def p_use_path(p):
     '''
     if len(p) == 2:
         p[0] = p[1]
+    elif type(p[1]) is AST.Path:
+        # Paths are only made by this rule, so they can be extended in place
+        p[1].elements.append(p[3])
+        p[0] = p[1]
     else:
-        if type(p[1]) is AST.Path:
-            p[0] = AST.Path([*p[1].elements, p[3]], p[1].lineno)
-        else:
-            p[0] = AST.Path([p[1], p[3]], p[1].lineno)
+        p[0] = AST.Path([p[1], p[3]], p[1].lineno)
 
 def p_group(p):
     '''
@@ -232,12 +356,10 @@ def p_group_params(p):
                         | import_group_params COMMA path
     '''
     if len(p) == 2:
-        p[0] = AST.ParameterList([p[1]])
+        p[0] = AST.ParameterList([p[1]], p[1].lineno)
     else:
-        if type(p[1]) is AST.ParameterList:
-            p[0] = AST.ParameterList([*p[1].value, p[3]])
-        else:
-            p[0] = AST.ParameterList([p[1], p[3]])
+        p[1].value.append(p[3])
+        p[0] = p[1]
 
 def p_break_or_continue(p):
     '''
@@ -269,14 +391,14 @@ def p_struct(p):
 
 def p_struct_fields(p):
     '''
-    struct_fields : CURLY_OPEN o_newline struct_field_array o_newline CURLY_CLOSE
+    struct_fields : CURLY_OPEN o_newline struct_field_array CURLY_CLOSE
     '''
     p[0] = p[3]
 
 def p_struct_field_array(p):
     '''
-    struct_field_array : typeargs end
-                       | struct_field_array typeargs end
+    struct_field_array : typeargs terminators
+                       | struct_field_array typeargs terminators
     '''
     if len(p) == 3:
         p[0] = AST.StructFieldArray([p[1]])
@@ -341,9 +463,15 @@ def p_while(p):
 
 def p_codeblock(p):
     '''
-    code_block : CURLY_OPEN o_newline program CURLY_CLOSE
+    code_block : CURLY_OPEN program CURLY_CLOSE
     '''
-    p[0] = p[3]
+    operations = p[2].operations
+
+    # A newline right after `{` is not an End operation
+    if operations and operations[0].op.kind == AST.End.kind and operations[0].op.char == "\n":
+        del operations[0]
+
+    p[0] = p[2]
 
 def p_func_call(p):
     '''
@@ -363,10 +491,8 @@ def p_warn(p):
 
 def p_assign(p):
     '''
-    assign : id ASSIGN expr
+    assign : binop ASSIGN expr
            | onetype_args ASSIGN expr
-           | binop ASSIGN expr
-           | indexed ASSIGN expr
     '''
     p[0] = AST.Assignment(p[1], p[3], p[1].lineno)
 
@@ -414,12 +540,15 @@ def p_typeargs(p):
 def p_typearg(p):
     '''
     typed_var : id id
-              | id array id
+              | indexed id
     '''
-    if len(p) == 3:
+    if type(p[1]) is AST.Name:
         p[0] = AST.TypedVarDefinition(p[1], None, p[2], p[1].lineno)
+    elif type(p[1].var) is AST.Name:
+        # `u32[4] a` is parsed as indexing until the name after it is seen
+        p[0] = AST.TypedVarDefinition(p[1].var, p[1].index, p[2], p[1].lineno)
     else:
-        p[0] = AST.TypedVarDefinition(p[1], p[2], p[3], p[1].lineno)
+        syntax_error(p.lexer, p[2].value, "ID", p[2].pos)
 
 def p_expr(p):
     '''
@@ -439,7 +568,6 @@ def p_new_instance(p):
 def p_indexed(p):
     '''
     indexed : path array
-            | id array
     '''
     p[0] = AST.Indexed(p[1], p[2], p[1].lineno)
 
@@ -479,6 +607,7 @@ def p_binop(p):
     binop : path
           | func_call
           | indexed
+          | EXPRESSION
           | binop PLUS binop
           | binop MINUS binop
           | binop MUL binop
@@ -487,11 +616,8 @@ def p_binop(p):
     if len(p) == 2:
         p[0] = p[1]
     else:
-        p[0] = AST.BinOp(p[1], p[2], p[3], p[1].lineno)
-
-        if optimize_binops:
-            if type(p[1])==AST.Integer and type(p[3])==AST.Integer and p[2] != "/":
-                p[0] = AST.Integer(eval_partial(p[1].value, p[2], p[3].value))
+        # optimize_binops is set by the owner of the parser (see compiler.Compiler)
+        p[0] = arith_binop(p[1], p[2], p[3], getattr(p.parser, "optimize_binops", False))
 
 def p_arith(p):
     '''
@@ -515,21 +641,27 @@ def p_path(p):
     '''
     if len(p) == 2:
         p[0] = p[1]
+    elif type(p[1]) is AST.Path:
+        # Values are never paths, so a path here was made by this rule
+        p[1].elements.append(p[3])
+        p[0] = p[1]
     else:
-        if type(p[1]) is AST.Path:
-            p[0] = AST.Path([*p[1].elements, p[3]], p[1].lineno)
-        else:
-            p[0] = AST.Path([p[1], p[3]], p[1].lineno)
+        p[0] = AST.Path([p[1], p[3]], p[1].lineno)
 
 
 def p_negative_value(p):
     '''
     value : MINUS value %prec UMINUS
     '''
+    # Located at the minus, value is a nonterminal without a position
     if isinstance(p[2], AST.Integer):
-        p[0] = AST.Integer(-p[2].value, p.lineno(2), p.lexpos(2))
+        p[0] = AST.Integer(-p[2].value, p.lineno(1), p.lexpos(1))
+    elif isinstance(p[2], AST.Float):
+        p[0] = AST.Float(-p[2].value, p.lineno(1), p.lexpos(1))
+    elif isinstance(p[2], AST.Bool):
+        parse_error(p.lexer, "A bool value can't be negated", p.lexpos(1))
     else:
-        p[0] = AST.Name("-" + p[2].value, p.lineno(2), p.lexpos(2))
+        p[0] = AST.Name("-" + p[2].value, p.lineno(1), p.lexpos(1))
 
 def p_value_string(p):
     '''
@@ -560,7 +692,7 @@ def p_id(p):
     '''
     id : ID
     '''
-    p[0] = AST.Name(p[1], p.lineno(1), p.lexpos(1))
+    p[0] = AST.Name(p[1], p.lineno(1), p.lexpos(1), p.slice[1].symbol)
 
 def p_bool(p):
     '''
@@ -587,9 +719,9 @@ def p_number(p):
 
 def p_float(p):
     '''
-    float : INTEGER DOT INTEGER
+    float : FLOAT
     '''
-    p[0] = AST.Float(float(str(p[1])+"."+str(p[3])), p.lineno(1), p.lexpos(1))
+    p[0] = AST.Float(p[1], p.lineno(1), p.lexpos(1))
 
 def p_optional_nl(p):
     '''
@@ -598,21 +730,6 @@ def p_optional_nl(p):
     '''
     p[0] = p[1]
 
-def p_oend(p):
-    '''
-    o_end : end
-          | empty
-    '''
-    p[0] = p[1]
-
-def p_end(p):
-    '''
-    end : SEMICOLON
-        | NEWLINE
-        | SEMICOLON NEWLINE
-    '''
-    p[0] = AST.End(p[1], p.lineno(1))
-
 def p_empty(p):
     "empty : "
     p[0] = None
@@ -1,19 +1,38 @@
-import colorama
+_colorama = None
 
-colorama.init()
+def _colors():
+    """
+    Imports and initializes colorama on first use
+    """
+    global _colorama
+
+    if _colorama is None:
+        import colorama
+        colorama.init()
+        _colorama = colorama
+
+    return _colorama
 
 class Log:
     @staticmethod
     def error(message):
-        print(colorama.Fore.LIGHTRED_EX + "error:" + colorama.Style.RESET_ALL, message)
+        c = _colors()
+        print(c.Fore.LIGHTRED_EX + "error:" + c.Style.RESET_ALL, message)
 
     @staticmethod
     def warning(message):
-        print(colorama.Fore.LIGHTYELLOW_EX + "warning:" + colorama.Style.RESET_ALL, message)
+        c = _colors()
+        print(c.Fore.LIGHTYELLOW_EX + "warning:" + c.Style.RESET_ALL, message)
+
+    @staticmethod
+    def note(message):
+        c = _colors()
+        print(c.Fore.LIGHTCYAN_EX + "note:" + c.Style.RESET_ALL, message)
 
     @staticmethod
     def codeline(line, lineno, offset=8):
+        c = _colors()
         print(" "*offset,
-              colorama.Fore.MAGENTA + str(lineno) + colorama.Style.RESET_ALL,
+              c.Fore.MAGENTA + str(lineno) + c.Style.RESET_ALL,
               "|", line)
         return len(" "*offset) + 1 + len(str(lineno)) + 3
@@ -0,0 +1,414 @@
+import os
+import json
+import time
+import hashlib
+from dataclasses import asdict
+
+try:
+    import utils
+    import abstract_syntax_tree as AST
+    from compiler import Result
+    from cache import cache_dir
+    from errors import CompileError, Diagnostic
+except (ImportError, ModuleNotFoundError):
+    from . import utils
+    from . import abstract_syntax_tree as AST
+    from .compiler import Result
+    from .cache import cache_dir
+    from .errors import CompileError, Diagnostic
+
+# Modules are files: `use a.b` loads `a/b.mew`, searched next to the file
+# that uses it and then next to the entry file.  If only a prefix of the path
+# names a file, the last element is a symbol of it: `use a.b.{f, g}` loads
+# `a/b.mew` (unless `a/b/f.mew` exists) and imports `f` and `g` from it.
+#
+# The dependency graph is saved between builds.  A module is compiled again
+# only if its source changed or the interface (exported function signatures,
+# structs and top-level externs) of a module it uses changed.  So changing a
+# function body rebuilds only the module itself.  Names a module uses are
+# saved with files they resolved to (or None), and resolved again before the
+# module is reused, so adding or removing a file rebuilds modules it affects.
+
+GRAPH_VERSION = 2
+
+def expand_use_path(path):
+    """
+    Expands import groups: `a.{b, c.d}` -> [["a", "b"], ["a", "c", "d"]]
+    """
+    if path.kind == AST.Name.kind:
+        return [[path.value]]
+
+    if path.kind == AST.ParameterList.kind:
+        return [j for i in path.value for j in expand_use_path(i)]
+
+    result = [[]]
+    for element in path.elements:
+        result = [i + j for i in result for j in expand_use_path(element)]
+
+    return result
+
+def collect_uses(ast):
+    """
+    Returns list of (dotted name, Use) of all top-level `use` statements
+    """
+    uses = []
+
+    for i in ast.operations:
+        if i.op.kind == AST.Use.kind:
+            uses.extend((name, i.op) for name in expand_use_path(i.op.path))
+
+    return uses
+
+def type_string(typed):
+    text = typed.type.value
+    if typed.array is not None:
+        text += "[]"
+    return text
+
+def interface(ast):
+    """
+    Returns (fingerprint, exported names) of module
+
+    Fingerprint depends only on things other modules can see, so it doesn't
+    change when function bodies change.
+    """
+    signatures = []
+    symbols = []
+
+    for i in ast.operations:
+        op = i.op
+        prefix = ""
+
+        if op.kind == AST.Warning.kind:
+            prefix = f"warning {op.message} "
+            op = op.refer
+
+        if op.kind == AST.Func.kind:
+            args = ", ".join(
+                f"{type_string(j)} {j.var.value}" for j in utils.unpack_func_args(op.args.value)
+            )
+            ret = op.ret.value if op.ret else "void"
+
+            signatures.append(f"{prefix}func {op.name.value}({args}) {ret}")
+            symbols.append(op.name.value)
+        elif op.kind == AST.Struct.kind:
+            fields = "; ".join(
+                f"{type_string(j)} {j.var.value}"
+                for group in op.value.value for j in utils.unpack_func_args(group.value)
+            )
+
+            signatures.append(f"struct {op.name.value} {{{fields}}}")
+            symbols.append(op.name.value)
+        elif op.kind == AST.ExternC.kind:
+            signatures.append(f"extern {op.code}")
+
+    fingerprint = hashlib.sha256("\n".join(signatures).encode()).hexdigest()
+    return fingerprint, symbols
+
+def declarations(ast):
+    """
+    Returns {name: [nodes]} of top-level functions and structs of module
+    """
+    result = {}
+
+    for i in ast.operations:
+        op = i.op
+
+        if op.kind == AST.Warning.kind:
+            op = op.refer
+
+        if op.kind in (AST.Func.kind, AST.Struct.kind):
+            result.setdefault(op.name.value, []).append(op)
+
+    return result
+
+def source_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def graph_path(entries):
+    """
+    Path of the saved dependency graph for a set of entry files, or None
+    if cache directory is not available
+
+    Graph keeps filenames as they were given, so it depends on the current
+    directory too.
+    """
+    path = cache_dir("modules")
+    if path is None:
+        return None
+
+    key = "\0".join([os.getcwd(), *sorted(os.path.abspath(i) for i in entries)])
+    return os.path.join(path, hashlib.sha256(key.encode()).hexdigest()[:24] + ".json")
+
+class ModuleBuilder:
+    """
+    Builds modules together with all modules they use, incrementally
+
+    `graph_file` keeps the dependency graph between builds (None disables
+    incremental builds).
+    """
+    def __init__(self, compiler, graph_file=None):
+        self.compiler = compiler
+        self.graph_file = graph_file
+
+        self.context = self.context_hash()
+        self.old = self.load_graph()
+        self.graph = {}
+
+        self.results = []
+        self.timings = {}   # filename -> seconds spent on the module itself
+        self.rebuilt = []   # filenames of modules compiled during this build
+
+        self.interfaces = {}  # path -> fingerprint of modules visited in this build
+        self.declarations = {}  # path -> declarations() of modules parsed in this build
+        self.stack = []       # paths of modules being visited
+        self.nested = []      # time spent on used modules, for every module in stack
+
+    def context_hash(self):
+        """
+        Hash of everything besides sources that affects results
+        """
+        try:
+            from version import __version__
+        except (ImportError, ModuleNotFoundError):
+            from .version import __version__
+
+        try:
+            fingerprint = self.compiler.target.fingerprint()
+        except OSError:
+            return None  # Not incremental then
+
+        context = (GRAPH_VERSION, __version__, fingerprint, self.compiler.optimize_binops)
+        return hashlib.sha256(repr(context).encode()).hexdigest()
+
+    def load_graph(self):
+        if self.graph_file is None or self.context is None:
+            return {}
+
+        try:
+            with open(self.graph_file, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if data.get("context") != self.context:
+            return {}
+
+        return data.get("modules", {})
+
+    def save_graph(self):
+        if self.graph_file is None or self.context is None:
+            return
+
+        tmpname = f"{self.graph_file}.{os.getpid()}.tmp"
+
+        try:
+            with open(tmpname, "w") as f:
+                json.dump({"context": self.context, "modules": self.graph}, f)
+            os.replace(tmpname, self.graph_file)
+        except OSError:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+
+    def build(self, entries):
+        """
+        Builds entry files and modules they use
+
+        Returns list of Results, every module comes after modules it uses
+        """
+        for filename in entries:
+            self.root = os.path.dirname(filename)
+            self.visit(filename)
+
+        self.save_graph()
+        return self.results
+
+    def resolve(self, name, importer):
+        """
+        Resolves dotted name used in `importer` to (filename, symbol or None)
+        """
+        dirs = [os.path.dirname(importer)]
+        if self.root != dirs[0]:
+            dirs.append(self.root)
+
+        for directory in dirs:
+            # Longest prefix of the name which is a file wins
+            for n in range(len(name), max(len(name) - 2, 0), -1):
+                filename = os.path.normpath(os.path.join(directory, *name[:n]) + ".mew")
+
+                if os.path.isfile(filename):
+                    return filename, (name[n] if n < len(name) else None)
+
+        raise CompileError(Diagnostic(
+            "error", f"Module `{'.'.join(name)}` is not found", importer,
+            note="Searched in: " + ", ".join(i or "." for i in dirs)
+        ))
+
+    def visit(self, filename):
+        """
+        Brings module up to date and returns its interface fingerprint
+        """
+        path = os.path.abspath(filename)
+
+        if path in self.interfaces:
+            return self.interfaces[path]
+
+        start = time.perf_counter()
+        self.stack.append(path)
+        self.nested.append(0.0)
+
+        try:
+            entry, result = self.update_module(filename, path)
+        finally:
+            self.stack.pop()
+            nested = self.nested.pop()
+
+        elapsed = time.perf_counter() - start
+        if self.nested:
+            self.nested[-1] += elapsed
+
+        if entry is not None:
+            self.graph[path] = entry
+
+        self.interfaces[path] = entry and entry["interface"]
+        self.results.append(result)
+        self.timings[filename] = elapsed - nested
+
+        return self.interfaces[path]
+
+    def update_module(self, filename, path):
+        try:
+            with open(filename, "r") as f:
+                text = f.read()
+        except OSError as e:
+            return None, Result(filename, diagnostics=[
+                Diagnostic("error", f"Can't read file: {e.strerror}", filename)
+            ])
+
+        old = self.old.get(path)
+
+        if old is not None and old["source"] == source_hash(text) and \
+           self.uses_unchanged(filename, old) and self.deps_unchanged(old):
+            return old, Result(filename, old["code"], [
+                Diagnostic(**dict(i, filename=filename)) for i in old["diagnostics"]
+            ])
+
+        self.rebuilt.append(filename)
+        return self.compile_module(filename, text)
+
+    def uses_unchanged(self, filename, old):
+        """
+        True if names used by a module resolve to the same files as when the
+        module was built (also if they still aren't found)
+        """
+        for name, depname in old["uses"]:
+            try:
+                resolved, _ = self.resolve(name, filename)
+            except CompileError:
+                resolved = None
+
+            if resolved != depname:
+                return False
+
+        return True
+
+    def deps_unchanged(self, old):
+        """
+        Visits dependencies of a module, True if their interfaces are the same
+        as when the module was built
+        """
+        unchanged = True
+
+        for dep, (depname, fingerprint) in old["deps"].items():
+            if dep in self.stack or not os.path.isfile(dep):
+                return False
+
+            if self.visit(depname) != fingerprint:
+                unchanged = False
+
+        return unchanged
+
+    def compile_module(self, filename, text):
+        result = Result(filename)
+        entry = {"source": source_hash(text), "uses": [], "deps": {}, "interface": None, "symbols": []}
+
+        imports = {}  # path -> names used from module, None for all of them
+
+        try:
+            ast = self.compiler.parse(text, filename)
+            entry["interface"], entry["symbols"] = interface(ast)
+            self.declarations[os.path.abspath(filename)] = declarations(ast)
+
+            for name, use in collect_uses(ast):
+                self.use_module(filename, name, use, entry, imports)
+
+            result.code = self.compiler.generate(ast, text, filename,
+                                                 imports=self.imported(imports))
+        except CompileError as e:
+            result.diagnostics.append(e.diagnostic)
+
+        result.attach_source(self.compiler.get_source_map(text, filename))
+
+        entry["code"] = result.code
+        entry["diagnostics"] = [
+            dict(asdict(i), filename=None) for i in result.diagnostics
+        ]
+
+        return entry, result
+
+    def imported(self, imports):
+        """
+        Returns functions and structs used modules give to a module
+
+        All structs of a module are given, types in signatures need them.
+        """
+        nodes = []
+
+        for dep, names in imports.items():
+            for name, decls in self.declarations_of(dep).items():
+                if None in names or name in names or decls[0].kind == AST.Struct.kind:
+                    nodes.extend(decls)
+
+        return nodes
+
+    def declarations_of(self, dep):
+        """
+        declarations() of a module, parsed again if it was not compiled in
+        this build (errors in it are reported for the module itself)
+        """
+        if dep not in self.declarations:
+            try:
+                with open(dep, "r") as f:
+                    text = f.read()
+                self.declarations[dep] = declarations(self.compiler.parse(text, dep))
+            except (OSError, CompileError):
+                self.declarations[dep] = {}
+
+        return self.declarations[dep]
+
+    def use_module(self, filename, name, use, entry, imports):
+        try:
+            depname, symbol = self.resolve(name, filename)
+        except CompileError as e:
+            entry["uses"].append((name, None))
+            e.diagnostic.lineno = use.lineno
+            raise
+
+        entry["uses"].append((name, depname))
+        dep = os.path.abspath(depname)
+
+        if dep in self.stack:
+            raise CompileError(Diagnostic(
+                "error", f"Circular use of module `{'.'.join(name)}`", filename, use.lineno
+            ))
+
+        fingerprint = self.visit(depname)
+        entry["deps"][dep] = (depname, fingerprint)
+        imports.setdefault(dep, set()).add(symbol)
+
+        if symbol is not None and fingerprint is not None and \
+           symbol not in self.graph[dep]["symbols"]:
+            raise CompileError(Diagnostic(
+                "error", f"`{symbol}` is not found in module `{'.'.join(name[:-1])}`",
+                filename, use.lineno
+            ))
@@ -1,113 +1,579 @@
-from pprint import pprint
-
 try:
     import log
     import utils
+    import timing
+    import tracing
     import abstract_syntax_tree as AST
+    from source_map import SourceMap
+    from scopes import Scopes
+    from tokens import Symbols
+    from errors import CompileError, Diagnostic
 except ImportError:
     from . import log
     from . import utils
+    from . import timing
+    from . import tracing
     from . import abstract_syntax_tree as AST
+    from .source_map import SourceMap
+    from .scopes import Scopes
+    from .tokens import Symbols
+    from .errors import CompileError, Diagnostic
+
+# Node classes of values of built-in types
+TYPES = {
+    "isize": AST.Integer,
+    "usize": AST.Integer,
+    "i32": AST.Integer,
+    "u32": AST.Integer,
+    "i16": AST.Integer,
+    "u16": AST.Integer,
+    "i8": AST.Integer,
+    "u8": AST.Integer,
+    "float": AST.Float,
+    "double": AST.Float,
+    "bool": AST.Bool,
+    "string": AST.String,
+}
+
+# Operators of binary operations that give a bool
+COMPARISONS = {"==", "!=", "<", ">", "<=", ">="}
+
+class StructType:
+    """
+    Type of values of a struct: types of its fields, by symbols
+    """
+    def __init__(self, struct, fields):
+        self.struct = struct
+        self.fields = fields
+
+    @property
+    def __name__(self):
+        # Like classes of built-in types, for messages
+        return self.struct.name.value
+
+def type_name(typ):
+    return typ.__name__ if typ is not None else "nothing"
+
+# Scheduled around blocks (see ASTAnalyzer.later())
+def enter_scope(analyzer, scopes):
+    scopes.push()
+
+def leave_scope(analyzer, scopes):
+    scopes.pop()
+
+def block(scopes, code):
+    return (enter_scope, scopes), code, (leave_scope, scopes)
 
 class ASTAnalyzer:
-    def __init__(self, filename, ast, string=""):
+    def __init__(self, filename, ast, string="", timer=None, source_map=None, symbols=None, imports=()):
+        self.filename = filename
+        self.timer = timer or timing.NullTimer()
+        self.source_map = source_map or SourceMap(string, filename)
         self.ast = ast
-        self.funcs = []
-        self.variables = {}
+        self.imports = imports  # Functions and structs of used modules
+
+        # Tables are keyed by symbols of names, `symbols` must be the table
+        # the AST was lexed with
+        self.symbols = symbols if symbols is not None else Symbols()
+        self.typetable = {self.symbols.intern(name): cls for name, cls in TYPES.items()}
+        self.funcs = {}  # symbol -> functions of that name
+        self.overloads = {}  # (symbol, number of arguments) -> [(types of arguments, function)]
+        self.signatures = {}  # (symbol, types of arguments) -> function
+        self.variables = Scopes()
+        self.variable_types = Scopes()  # Of the types pass, symbol -> type
+        self.pending = []  # (handler, node) to visit, next one last
+
+    def fatal_error(self, op, message, note=None):
+        lineno, column = self.source_map.locate(op)
+        raise CompileError(
+            Diagnostic("error", message, self.filename, lineno, column, note=note,
+                       line=self.source_map.line(lineno) if lineno else None)
+        )
+
+    def visit(self, handlers, ast):
+        """
+        Calls handler of a node, then handlers it scheduled (see later())
+
+        Blocks schedule their statements instead of visiting them, so deeply
+        nested blocks don't need deep recursion. Returns result of the handler.
+        """
+        pending = self.pending
+        base = len(pending)
+
+        try:
+            result = handlers[ast.kind](self, ast)
+
+            while len(pending) > base:
+                handler, node = pending.pop()
+                handler(self, node)
+        finally:
+            del pending[base:]
 
-    def find_funcs(self, name: str):
-        return [i for i in self.funcs if i.name.value == name]
+        return result
+
+    def later(self, handlers, *items):
+        """
+        Schedules nodes and (handler, argument) pairs to be visited in order
+        after the current handler
+        """
+        self.pending.extend(
+            i if type(i) is tuple else (handlers[i.kind], i) for i in reversed(items)
+        )
+
+    def find_funcs(self, symbol: int):
+        return self.funcs.get(symbol, [])
 
     def get_type(self, typename):
-        realtypename = None
+        if typename.kind == AST.TypedVarDefinition.kind:
+            typename = typename.type
+        elif typename.kind != AST.Name.kind:
+            self.fatal_error(typename, f"get_type(): {type(typename)} is not yet supported")
+
+        symbol = typename.symbol
+
+        if symbol not in self.typetable:
+            self.fatal_error(typename, f"Type `{typename.value}` not found")
+        return self.typetable[symbol]
+
+    def add_func(self, func: AST.Func):
+        """
+        Adds function to the overload index (its arguments must be unpacked)
+        """
+        symbol = func.name.symbol
+        argtypes = tuple(self.get_type(i) for i in func.args.value)
+        previous = self.signatures.get((symbol, argtypes))
+
+        # Calls couldn't choose between them (like `i32` and `u8` arguments,
+        # which are both integers)
+        if previous is not None:
+            self.fatal_error(func.name, f"Function `{func.name.value}` is already defined with this signature",
+                             f"Previous definition is at line {previous.lineno}.")
+
+        self.funcs.setdefault(symbol, []).append(func)
+        self.overloads.setdefault((symbol, len(argtypes)), []).append((argtypes, func))
+        self.signatures[(symbol, argtypes)] = func
+
+    def argument_types(self, args):
+        # Annotated by the types pass
+        return tuple(i.value_type for i in args.value)
+
+    def func_find_by_args(self, symbol: int, args: AST.ParameterList):
+        """
+        Function of name `symbol` with exactly the types of `args`
+        """
+        argtypes = self.argument_types(args)
+        func = self.signatures.get((symbol, argtypes))
+
+        if tracing.overloads:
+            tracing.log("overloads", "Arguments", [type_name(i) for i in argtypes],
+                        "match function at line", func and func.lineno)
+
+        if func is None:
+            note = None
+            candidates = self.overloads.get((symbol, len(argtypes)), ())
+
+            if candidates:
+                note = "Candidates with matching number of arguments: " + ", ".join(
+                    f"({', '.join(type_name(i) for i in types)})" for types, _ in candidates
+                )
+
+            self.fatal_error(args, "No matching function found for call", note)
+
+        return func
+
+    def scan_nothing(self, ast):
+        return
 
-        if type(typename) is AST.TypedVarDefinition:
-            realtypename = typename.type.value
+    def define_variable(self, typed):
+        previous = self.variables.define(typed.var.symbol, typed)
+
+        if previous is not None:
+            self.fatal_error(typed.var, f"Variable `{typed.var.value}` is already defined",
+                             f"Previous definition is at line {previous.lineno}.")
+
+    def use_variable(self, name):
+        symbol = name.symbol
+
+        if symbol < 0:
+            # Negated names (`-x`) are names of their own
+            symbol = self.symbols.intern(name.value.lstrip("-"))
+
+        if symbol not in self.variables:
+            self.fatal_error(name, f"Variable `{name.value}` is not found!",
+                             "Define and initialize it first.")
+
+    def vars_program(self, ast):
+        self.later(self.variable_scanners, *[i.op for i in ast.operations])
+
+    def vars_func(self, ast):
+        self.variables.push()
+
+        for i in utils.unpack_func_args(ast.args.value):
+            self.define_variable(i)
+
+        self.later(self.variable_scanners, ast.code, (leave_scope, self.variables))
+
+    def vars_if(self, ast):
+        self.scan_variables(ast.comparison)
+        blocks = block(self.variables, ast.code)
+
+        if ast.else_ is not None:
+            blocks += block(self.variables, ast.else_)
+
+        self.later(self.variable_scanners, *blocks)
+
+    def vars_while(self, ast):
+        self.scan_variables(ast.comparison)
+        self.later(self.variable_scanners, *block(self.variables, ast.code))
+
+    def vars_loop(self, ast):
+        self.later(self.variable_scanners, *block(self.variables, ast.code))
+
+    def vars_assignment(self, ast):
+        self.scan_variables(ast.value)
+
+        if ast.name.kind == AST.TypedVarDefinition.kind:
+            self.define_variable(ast.name)
         else:
-            print(f"get_type(): {type(typename)} is not yet supported")
-            exit(1)
-    
-        if realtypename not in self.typetable:
-            log.Log.error(f"Type `{typename}` not found")
-            exit(1)
-        return self.typetable[realtypename]
-
-    def func_find_by_args(self, fns: list[AST.Func], args: list):
-        argtypes = [type(i) for i in args.value]
-        fntypes = [[self.get_type(j) for j in i.args.value] for i in fns]
-
-        isok = []
-
-        for i in fntypes:
-            if len(i) == len(argtypes):
-                print("All len correct")
-
-                isok = [j is k for j, k in zip(i, argtypes)]
-                break
-
-        if not any(isok):
-            print("No matching function found for call `{}`")
-            exit(1)
-
-        return fns[isok.index(True)]
-
-    def type_check(self, ast):
-        t = type(ast)
-
-        log.Log.error("Implement type checking")
-        exit(1)
-
-        if t is AST.Program:
-            for i in ast.operations:
-                self.type_check(i.op)
-        elif t is AST.Assignment:
-            pprint(ast)
-            print("Assignment")
-            exit(1)
-        elif t is AST.Func:
-            self.type_check(ast.code)
-
-    def scan_origins(self, ast):
-        t = type(ast)
-        
-        if t is AST.Program:
-            for i in ast.operations:
-                self.scan_origins(i.op)
-        elif t is AST.Func:
-            # Also unpack functions
-            ast.args.value = utils.unpack_func_args(ast.args.value)
-            self.scan_origins(ast.code)
-
-            self.funcs.append(ast)
-        elif t is AST.ExternC:
-            return
-        elif t is AST.End:
-            return
-        elif t is AST.FunctionCall:
-            name = ast.name
-            args = ast.arguments
-
-            fns = self.find_funcs(name.value)
-            func = self.func_find_by_args(fns, args)
-
-            ast.origin = func
-        elif t is AST.Assignment:
-            val = ast.value
-
-            if type(val) is AST.FunctionCall:
-                # If we assign a function, scan it
-                self.scan_origins(val)
-        elif t is AST.IfElse:
-            self.scan_origins(ast.code)
-        elif t is AST.Return:
+            self.scan_variables(ast.name)
+
+    def vars_definition(self, ast):
+        self.define_variable(ast)
+
+    def vars_call(self, ast):
+        self.scan_variables(ast.arguments)
+
+    def vars_return(self, ast):
+        if ast.value is not None:
+            self.scan_variables(ast.value)
+
+    def vars_binop(self, ast):
+        self.scan_variables(ast.left)
+        self.scan_variables(ast.right)
+
+    def vars_name(self, ast):
+        self.use_variable(ast)
+
+    def vars_path(self, ast):
+        # Other elements are fields
+        self.scan_variables(ast.elements[0])
+
+    def vars_indexed(self, ast):
+        self.scan_variables(ast.var)
+        self.scan_variables(ast.index)
+
+    def vars_list(self, ast):
+        for i in ast.value:
+            self.scan_variables(i)
+
+    def vars_array(self, ast):
+        elements = ast.elements
+
+        # Elements of `[]` are an empty ParameterList
+        if not isinstance(elements, list):
+            elements = elements.value
+
+        for i in elements:
+            self.scan_variables(i)
+
+    def vars_new(self, ast):
+        # Only sizes of arrays can have variables, names are types
+        if ast.obj.kind == AST.Indexed.kind:
+            self.scan_variables(ast.obj.index)
+
+    def vars_step(self, ast):
+        self.scan_variables(ast.what)
+
+    def vars_warning(self, ast):
+        self.later(self.variable_scanners, ast.refer)
+
+    def vars_unsupported(self, ast):
+        self.fatal_error(ast, f"TODO: Support `{type(ast)}` to scan variables")
+
+    # Scanners of nodes for variables, by node kind
+    variable_scanners = AST.dispatch_table({
+        AST.Program: vars_program,
+        AST.Func: vars_func,
+        AST.IfElse: vars_if,
+        AST.While: vars_while,
+        AST.Loop: vars_loop,
+        AST.Assignment: vars_assignment,
+        AST.TypedVarDefinition: vars_definition,
+        AST.FunctionCall: vars_call,
+        AST.Return: vars_return,
+        AST.BinOp: vars_binop,
+        AST.Name: vars_name,
+        AST.Path: vars_path,
+        AST.Indexed: vars_indexed,
+        AST.ParameterList: vars_list,
+        AST.Array: vars_array,
+        AST.New: vars_new,
+        AST.Increment: vars_step,
+        AST.Decrement: vars_step,
+        AST.Warning: vars_warning,
+        AST.ExternC: scan_nothing,
+        AST.End: scan_nothing,
+        AST.Break: scan_nothing,
+        AST.Continue: scan_nothing,
+        AST.Use: scan_nothing,
+        AST.Struct: scan_nothing,
+        AST.Integer: scan_nothing,
+        AST.String: scan_nothing,
+        AST.Float: scan_nothing,
+        AST.Bool: scan_nothing,
+    }, vars_unsupported)
+
+    def scan_variables(self, ast):
+        """
+        Checks that variables are defined before use, in scopes of blocks
+        """
+        self.visit(self.variable_scanners, ast)
+
+    def declare(self, nodes):
+        """
+        Adds structs and functions among statements of a block to the tables
+        before its code is checked, so they can be used before their definitions
+        """
+        # Warned ones too
+        nodes = [i.refer if i.kind == AST.Warning.kind else i for i in nodes]
+        structs = [i for i in nodes if i.kind == AST.Struct.kind]
+        funcs = [i for i in nodes if i.kind == AST.Func.kind]
+
+        # Names first, fields can be of structs defined later
+        for i in structs:
+            self.typetable[i.name.symbol] = StructType(i, {})
+
+        for i in structs:
+            fields = self.typetable[i.name.symbol].fields
+
+            for j in i.value.value:
+                for k in utils.unpack_func_args(j.value):
+                    fields[k.var.symbol] = self.get_type(k)
+
+        for i in funcs:
+            # Also unpack arguments
+            i.args.value = utils.unpack_func_args(i.args.value)
+            self.add_func(i)
+
+    def types_program(self, ast):
+        nodes = [i.op for i in ast.operations]
+        self.declare(nodes)
+        self.later(self.type_inferers, *nodes)
+
+    def types_func(self, ast):
+        # Declared by the block with it
+        self.variable_types.push()
+
+        for i in ast.args.value:
+            self.variable_types.define(i.var.symbol, self.get_type(i))
+
+        self.later(self.type_inferers, ast.code, (leave_scope, self.variable_types))
+
+    def types_if(self, ast):
+        self.infer_types(ast.comparison)
+        blocks = block(self.variable_types, ast.code)
+
+        if ast.else_ is not None:
+            blocks += block(self.variable_types, ast.else_)
+
+        self.later(self.type_inferers, *blocks)
+
+    def types_while(self, ast):
+        self.infer_types(ast.comparison)
+        self.later(self.type_inferers, *block(self.variable_types, ast.code))
+
+    def types_loop(self, ast):
+        self.later(self.type_inferers, *block(self.variable_types, ast.code))
+
+    def types_assignment(self, ast):
+        value = self.infer_types(ast.value)
+        name = ast.name
+
+        if name.kind == AST.ParameterList.kind:
+            # Several variables at once are not checked yet
+            self.infer_types(name)
             return
+
+        if name.kind == AST.TypedVarDefinition.kind:
+            target = self.types_definition(name)
         else:
-            log.Log.error(f"TODO: Support `{t}` to scan origins of function")
-            exit(1)
+            target = self.infer_types(name)
+
+        if value is not target:
+            self.fatal_error(
+                ast.value,
+                "An attempt to assign value of another type than declared in variable! "
+                f"(`{type_name(value)}` vs `{type_name(target)}`)",
+                "Check and fix type."
+            )
+
+    def types_definition(self, ast):
+        typ = self.get_type(ast)
+        self.variable_types.define(ast.var.symbol, typ)
+        return typ
+
+    def types_return(self, ast):
+        if ast.value is not None:
+            self.infer_types(ast.value)
+
+    def types_list(self, ast):
+        for i in ast.value:
+            self.infer_types(i)
+
+    def types_array(self, ast):
+        elements = ast.elements
+
+        # Elements of `[]` are an empty ParameterList
+        if not isinstance(elements, list):
+            elements = elements.value
+
+        for i in elements:
+            self.infer_types(i)
+
+    def types_step(self, ast):
+        self.infer_types(ast.what)
+
+    def types_warning(self, ast):
+        self.later(self.type_inferers, ast.refer)
+
+    def types_literal(self, ast):
+        ast.value_type = typ = AST.NODES[ast.kind]
+        return typ
+
+    def types_name(self, ast):
+        symbol = ast.symbol
+
+        if symbol < 0:
+            # Negated names (`-x`) are names of their own
+            symbol = self.symbols.intern(ast.value.lstrip("-"))
+
+        ast.value_type = typ = self.variable_types.lookup(symbol)
+        return typ
+
+    def types_binop(self, ast):
+        left = self.infer_types(ast.left)
+        right = self.infer_types(ast.right)
+
+        # No type is a void function call
+        if left is not right or left is None:
+            self.fatal_error(
+                ast,
+                "An attempt to evaluate binary operation with two unsupported types: "
+                f"({type_name(left)} and {type_name(right)})"
+            )
+
+        typ = AST.Bool if ast.op in COMPARISONS else left
+
+        if tracing.types:
+            tracing.log("types", "Resolved:", type_name(left), ast.op, type_name(right), "=>", type_name(typ))
+
+        ast.value_type = typ
+        return typ
+
+    def types_call(self, ast):
+        self.infer_types(ast.arguments)
+
+        # Needed for the type of the result, so it's found here once
+        ast.origin = func = self.func_find_by_args(ast.name.symbol, ast.arguments)
+
+        ast.value_type = typ = self.get_type(func.ret) if func.ret else None
+        return typ
+
+    def types_path(self, ast):
+        elements = ast.elements
+        typ = self.infer_types(elements[0])
+
+        # Other elements are fields
+        for i in elements[1:]:
+            if type(typ) is not StructType:
+                self.fatal_error(i, f"Type `{type_name(typ)}` has no fields")
+            if i.symbol not in typ.fields:
+                self.fatal_error(i, f"Field `{i.value}` not found in struct `{type_name(typ)}`")
+
+            typ = typ.fields[i.symbol]
+
+        ast.value_type = typ
+        return typ
+
+    def types_indexed(self, ast):
+        self.infer_types(ast.index)
+
+        # Variables of arrays have the type of elements
+        ast.value_type = typ = self.infer_types(ast.var)
+        return typ
+
+    def types_new(self, ast):
+        obj = ast.obj
+
+        if obj.kind == AST.Indexed.kind:
+            self.infer_types(obj.index)
+            obj = obj.var
+
+        ast.value_type = typ = self.get_type(obj)
+        return typ
+
+    def types_unsupported(self, ast):
+        self.fatal_error(ast, f"TODO: Support `{type(ast)}` to infer types")
+
+    # Type inferers of nodes, by node kind. Ones of expressions return the
+    # type they set.
+    type_inferers = AST.dispatch_table({
+        AST.Program: types_program,
+        AST.Func: types_func,
+        AST.Struct: scan_nothing,
+        AST.IfElse: types_if,
+        AST.While: types_while,
+        AST.Loop: types_loop,
+        AST.Assignment: types_assignment,
+        AST.TypedVarDefinition: types_definition,
+        AST.Return: types_return,
+        AST.ParameterList: types_list,
+        AST.Array: types_array,
+        AST.Increment: types_step,
+        AST.Decrement: types_step,
+        AST.Warning: types_warning,
+        AST.Integer: types_literal,
+        AST.String: types_literal,
+        AST.Float: types_literal,
+        AST.Bool: types_literal,
+        AST.Name: types_name,
+        AST.BinOp: types_binop,
+        AST.FunctionCall: types_call,
+        AST.Path: types_path,
+        AST.Indexed: types_indexed,
+        AST.New: types_new,
+        AST.ExternC: scan_nothing,
+        AST.End: scan_nothing,
+        AST.Break: scan_nothing,
+        AST.Continue: scan_nothing,
+        AST.Use: scan_nothing,
+    }, types_unsupported)
+
+    def infer_types(self, ast):
+        """
+        Annotates expressions with types of their values (`value_type`)
+
+        Bottom-up: an expression gets its type from the annotated types of
+        its parts, so every expression is resolved once, and later passes
+        read the annotation instead of resolving it again. Calls get their
+        functions too (`origin`, found by types of arguments), because their
+        type is the return type.
+        """
+        return self.visit(self.type_inferers, ast)
 
     def analyze(self):
-        pprint(self.ast)
-        # self.type_check(self.ast)
-        # self.scan_origins(self.ast)
+        if tracing.parse:
+            tracing.dump("parse", self.ast)
+
+        # Sub-passes are timed separately (see --time-passes). Memory analysis
+        # has no phase until it exists, so the report shows only passes that run.
+        with self.timer.phase("variables"):
+            self.scan_variables(self.ast)
+
+        # Overloads are resolved in the types pass (calls need them for their
+        # types), so they have no phase of their own
+        with self.timer.phase("types"):
+            self.declare(self.imports)
+            self.infer_types(self.ast)
 
         return self.ast
@@ -64,7 +64,11 @@
 import re
 import types
 import sys
+import os
+import copy
 import inspect
+import pickle
+import hashlib
 
 #-----------------------------------------------------------------------------
 #                     === User configurable parameters ===
@@ -79,6 +83,8 @@ debug_file  = 'parser.out'     # Default name of the debugging file
 error_count = 3                # Number of symbols that must be shifted to leave recovery mode
 resultlimit = 40               # Size limit of results when running in debug mode.
 
+__tabversion__ = '1'           # Version of the cached table format (see LRTable.write_pickle)
+
 MAXINT = sys.maxsize
 
 # This object is a stand-in for a logging object created by the
@@ -218,6 +224,18 @@ class YaccProduction:
     def error(self):
         raise SyntaxError
 
+# Production object used by LRParser.parseopt_notrack().  Same as YaccProduction,
+# but index lookup checks for the common case (a non-negative index) first.
+
+class YaccFastProduction(YaccProduction):
+    def __getitem__(self, n):
+        try:
+            if n >= 0:
+                return self.slice[n].value
+        except TypeError:
+            return [s.value for s in self.slice[n]]
+        return self.stack[n].value
+
 # -----------------------------------------------------------------------------
 #                               == LRParser ==
 #
@@ -231,11 +249,21 @@ class LRParser:
         self.goto = lrtab.lr_goto
         self.errorfunc = errorf
         self.set_defaulted_states()
+        self.set_dense_tables()
         self.errorok = True
 
     def errok(self):
         self.errorok = True
 
+    # Create a new parser that shares the tables with this one.  The parsing
+    # engine keeps its stacks on the parser object, so parsers can't be shared
+    # between threads, but their clones can be used concurrently.
+    def clone(self):
+        c = copy.copy(self)
+        c.statestack = []
+        c.symstack = []
+        return c
+
     def restart(self):
         del self.statestack[:]
         del self.symstack[:]
@@ -261,6 +289,51 @@ class LRParser:
 
     def disable_defaulted_states(self):
         self.defaulted_states = {}
+        self.set_dense_tables()
+
+    # Dense tables for parseopt_notrack().
+    # Every grammar symbol gets a small integer id (terminals first, then one id
+    # for unknown token types, then nonterminals).  The action and goto tables
+    # are merged into one list per state, indexed by symbol id, so a parser
+    # step is two list lookups instead of two dict lookups on strings.  Rows of
+    # defaulted states have their reduction in every terminal column.
+    def set_dense_tables(self):
+        terminals = set()
+        for actions in self.action.values():
+            terminals.update(actions)
+        nonterminals = set()
+        for gotos in self.goto.values():
+            nonterminals.update(gotos)
+
+        terminals = sorted(terminals)
+        self.unknown_id = len(terminals)
+        symbols = terminals + [None] + sorted(nonterminals)
+        self.symbol_ids = ids = {name: i for i, name in enumerate(symbols) if name is not None}
+
+        nstates = max(list(self.action) + list(self.goto), default=-1) + 1
+        table = [[None] * len(symbols) for _ in range(nstates)]
+        for state, actions in self.action.items():
+            row = table[state]
+            for name, t in actions.items():
+                row[ids[name]] = t
+            if state in self.defaulted_states:
+                row[:self.unknown_id + 1] = [self.defaulted_states[state]] * (self.unknown_id + 1)
+        for state, gotos in self.goto.items():
+            row = table[state]
+            for name, j in gotos.items():
+                row[ids[name]] = j
+        self.dense_table = table
+
+        self.dense_defaulted = [self.defaulted_states.get(state) for state in range(nstates)]
+
+        # (callable, symbol class, length, symbol id) of every production.  The
+        # symbol class has the type (and a None value) set as class attributes,
+        # so making the symbol of a reduction is a single call.  Rules that are
+        # never reduced may have a name that is not in the goto table.
+        self.dense_productions = []
+        for p in self.productions:
+            symclass = type('YaccSymbol', (YaccSymbol,), {'type': p.name, 'value': None})
+            self.dense_productions.append((p.callable, symclass, p.len, ids.get(p.name)))
 
     # parse().
     #
@@ -580,6 +653,126 @@ class LRParser:
             # If we'r here, something really bad happened
             raise RuntimeError('yacc: internal parser error!!!\n')
 
+    # parseopt_notrack().
+    #
+    # Optimized version of parse() for production use.  There is no debugging
+    # and no position tracking, token types are looked up once per token and
+    # the tables are the dense lists made by set_dense_tables().  Symbols of
+    # reductions are made from per-production classes and rules get a
+    # YaccFastProduction.
+    #
+    # Error recovery is not supported: on a syntax error p_error() is called
+    # as in parse() and is expected to raise.  If it returns, parsing stops and
+    # None is returned.  SyntaxError raised by a rule is not caught.
+
+    def parseopt_notrack(self, input=None, lexer=None):
+        lookahead = None                         # Current lookahead symbol
+        table   = self.dense_table               # Merged action/goto table
+        prod    = self.dense_productions         # Production tuples
+        defaulted = self.dense_defaulted         # Defaulted reductions by state
+        get_id  = self.symbol_ids.get            # Symbol name -> id
+        unknown = self.unknown_id                # Id of token types not in the grammar
+        end_id  = get_id('$end', unknown)
+        pslice  = YaccFastProduction(None)       # Production object passed to grammar rules
+
+        # If no lexer was given, we will try to use the lex module
+        if not lexer:
+            from . import lex
+            lexer = lex.lexer
+
+        pslice.lexer = lexer
+        pslice.parser = self
+
+        if input is not None:
+            lexer.input(input)
+
+        get_token = self.token = lexer.token
+
+        statestack = self.statestack = [0]
+        sym = YaccSymbol()
+        sym.type = '$end'
+        symstack = self.symstack = [sym]
+        pslice.stack = symstack
+
+        push_state = statestack.append
+        push_symbol = symstack.append
+
+        state = 0
+        row = table[0]
+        ltype = unknown
+
+        while True:
+            if lookahead is None:
+                t = defaulted[state]
+                if t is None:
+                    lookahead = get_token()
+                    if lookahead:
+                        ltype = get_id(lookahead.type, unknown)
+                    else:
+                        lookahead = YaccSymbol()
+                        lookahead.type = '$end'
+                        ltype = end_id
+                    t = row[ltype]
+            else:
+                t = row[ltype]
+
+            if t is None:
+                break
+
+            if t > 0:
+                # shift a symbol on the stack
+                push_state(t)
+                state = t
+                row = table[t]
+                push_symbol(lookahead)
+                lookahead = None
+                continue
+
+            if t < 0:
+                # reduce a symbol on the stack, emit a production
+                func, symclass, plen, pid = prod[-t]
+
+                sym = symclass()
+                if plen:
+                    targ = symstack[-plen-1:]
+                    targ[0] = sym
+                    del symstack[-plen:]
+                    del statestack[-plen:]
+                else:
+                    targ = [sym]
+
+                pslice.slice = targ
+                self.state = state
+                func(pslice)
+
+                push_symbol(sym)
+                state = table[statestack[-1]][pid]
+                push_state(state)
+                row = table[state]
+                continue
+
+            # t == 0: accept
+            return getattr(symstack[-1], 'value', None)
+
+        # Syntax error
+        errtoken = lookahead
+        if errtoken.type == '$end':
+            errtoken = None               # End of file!
+        if self.errorfunc:
+            if errtoken and not hasattr(errtoken, 'lexer'):
+                errtoken.lexer = lexer
+            self.state = state
+            self.errorok = False
+            self.errorfunc(errtoken)
+        elif errtoken:
+            lineno = getattr(errtoken, 'lineno', 0)
+            if lineno:
+                sys.stderr.write('yacc: Syntax error at line %d, token=%s\n' % (lineno, errtoken.type))
+            else:
+                sys.stderr.write('yacc: Syntax error, token=%s' % errtoken.type)
+        else:
+            sys.stderr.write('yacc: Parse error in input. EOF\n')
+
 # -----------------------------------------------------------------------------
 #                          === Grammar Representation ===
 #
@@ -682,6 +875,35 @@ class Production(object):
         if self.func:
             self.callable = pdict[self.func]
 
+# -----------------------------------------------------------------------------
+# class MiniProduction:
+#
+# This class is a simplified representation of a Production that is restored
+# from a table cache.  It only carries the information the parsing engine needs
+# at runtime (the grammar itself is never rebuilt from a cache).
+# -----------------------------------------------------------------------------
+
+class MiniProduction(object):
+    def __init__(self, str, name, len, func, file, line):
+        self.name     = name
+        self.len      = len
+        self.func     = func
+        self.callable = None
+        self.file     = file
+        self.line     = line
+        self.str      = str
+
+    def __str__(self):
+        return self.str
+
+    def __repr__(self):
+        return 'MiniProduction(%s)' % self.str
+
+    # Bind the production function name to a callable
+    def bind(self, pdict):
+        if self.func:
+            self.callable = pdict[self.func]
+
 # -----------------------------------------------------------------------------
 # class LRItem
 #
@@ -1261,12 +1483,13 @@ class Grammar(object):
 # Inputs:  X    - An input set
 #          R    - A relation
 #          FP   - Set-valued function
+#
+# Sets are bitsets (Python integers, see LRTable.add_lalr_lookaheads()).  The
+# traversal is iterative, so deep relations can't hit the recursion limit.
 # ------------------------------------------------------------------------------
 
 def digraph(X, R, FP):
-    N = {}
-    for x in X:
-        N[x] = 0
+    N = dict.fromkeys(X, 0)
     stack = []
     F = {}
     for x in X:
@@ -1276,26 +1499,39 @@ def digraph(X, R, FP):
 
 def traverse(x, N, stack, F, X, R, FP):
     stack.append(x)
-    d = len(stack)
-    N[x] = d
+    N[x] = len(stack)
     F[x] = FP(x)             # F(X) <- F'(x)
 
-    rel = R(x)               # Get y's related to x
-    for y in rel:
-        if N[y] == 0:
-            traverse(y, N, stack, F, X, R, FP)
-        N[x] = min(N[x], N[y])
-        for a in F.get(y, []):
-            if a not in F[x]:
-                F[x].append(a)
-    if N[x] == d:
-        N[stack[-1]] = MAXINT
-        F[stack[-1]] = F[x]
-        element = stack.pop()
-        while element != x:
-            N[stack[-1]] = MAXINT
-            F[stack[-1]] = F[x]
-            element = stack.pop()
+    # Path of the traversal: (x, depth of x, iterator over y's related to x)
+    path = [(x, N[x], iter(R(x)))]
+    while path:
+        x, d, rel = path[-1]
+        for y in rel:
+            if N[y] == 0:
+                # Visit y first, x is resumed when y is done
+                stack.append(y)
+                N[y] = len(stack)
+                F[y] = FP(y)
+                path.append((y, N[y], iter(R(y))))
+                break
+            if N[y] < N[x]:
+                N[x] = N[y]
+            F[x] |= F[y]
+        else:
+            path.pop()
+            if N[x] == d:
+                # x is the root of a strongly connected component
+                while True:
+                    element = stack.pop()
+                    N[element] = MAXINT
+                    F[element] = F[x]
+                    if element == x:
+                        break
+            if path:
+                parent = path[-1][0]
+                if N[x] < N[parent]:
+                    N[parent] = N[x]
+                F[parent] |= F[x]
 
 class LALRError(YaccError):
     pass
@@ -1321,10 +1557,7 @@ class LRTable:
         self.lr_action     = {}        # Action table
         self.lr_goto       = {}        # Goto table
         self.lr_productions  = grammar.Productions    # Copy of grammar Production array
-        self.lr_goto_cache = {}        # Cache of computed gotos
-        self.lr0_cidhash   = {}        # Cache of closures
-
-        self._add_count    = 0         # Internal counter used to detect cycles
+        self.lr0_transitions = []      # LR(0) goto function: {symbol: state} of every state
 
         # Diagnostic information filled in by the table generator
         self.sr_conflict   = 0
@@ -1334,10 +1567,9 @@ class LRTable:
         self.sr_conflicts  = []
         self.rr_conflicts  = []
 
-        # Build the tables
+        # Build the tables.  LALR lookaheads don't need the FIRST and FOLLOW
+        # sets of the grammar, so they are not computed here.
         self.grammar.build_lritems()
-        self.grammar.compute_first()
-        self.grammar.compute_follow()
         self.lr_parse_table()
 
     # Bind all production function names to callable objects in pdict
@@ -1348,91 +1580,70 @@ class LRTable:
     # Compute the LR(0) closure operation on I, where I is a set of LR(0) items.
 
     def lr0_closure(self, I):
-        self._add_count += 1
-
-        # Add everything in I to J
+        # Add everything in I to J.  Items appended to J are visited by the
+        # same loop.
         J = I[:]
-        didadd = True
-        while didadd:
-            didadd = False
-            for j in J:
-                for x in j.lr_after:
-                    if getattr(x, 'lr0_added', 0) == self._add_count:
-                        continue
-                    # Add B --> .G to J
-                    J.append(x.lr_next)
-                    x.lr0_added = self._add_count
-                    didadd = True
+        added = set()
+        for j in J:
+            for x in j.lr_after:
+                if x in added:
+                    continue
+                # Add B --> .G to J
+                J.append(x.lr_next)
+                added.add(x)
 
         return J
 
-    # Compute the LR(0) goto function goto(I,X) where I is a set
-    # of LR(0) items and X is a grammar symbol.   This function is written
-    # in a way that guarantees uniqueness of the generated goto sets
-    # (i.e. the same goto set will never be returned as two different Python
-    # objects).  With uniqueness, we can later do fast set comparisons using
-    # id(obj) instead of element-wise comparison.
-
-    def lr0_goto(self, I, x):
-        # First we look for a previously cached entry
-        g = self.lr_goto_cache.get((id(I), x))
-        if g:
-            return g
-
-        # Now we generate the goto set in a way that guarantees uniqueness
-        # of the result
-
-        s = self.lr_goto_cache.get(x)
-        if not s:
-            s = {}
-            self.lr_goto_cache[x] = s
-
-        gs = []
-        for p in I:
-            n = p.lr_next
-            if n and n.lr_before == x:
-                s1 = s.get(id(n))
-                if not s1:
-                    s1 = {}
-                    s[id(n)] = s1
-                gs.append(n)
-                s = s1
-        g = s.get('$end')
-        if not g:
-            if gs:
-                g = self.lr0_closure(gs)
-                s['$end'] = g
-            else:
-                s['$end'] = gs
-        self.lr_goto_cache[(id(I), x)] = g
-        return g
+    # Compute the LR(0) sets of item function.
+    #
+    # The goto sets of a state are found in one pass over its items, by grouping
+    # the items by the symbol after the ".".  A goto set is identified by its
+    # kernel (the items it was made of, in order), so an index of kernels gives
+    # the state number of a goto set that was already seen.  The resulting
+    # goto function is stored in lr0_transitions.
+    #
+    # States are numbered in the order they are found, by symbols in the order
+    # they first appear in the items of a state.
 
-    # Compute the LR(0) sets of item function
     def lr0_items(self):
         C = [self.lr0_closure([self.grammar.Productions[0].lr_next])]
-        i = 0
-        for I in C:
-            self.lr0_cidhash[id(I)] = i
-            i += 1
+        kernels = {}                            # Kernel -> state number
+        transitions = self.lr0_transitions
 
-        # Loop over the items in C and each grammar symbols
         i = 0
         while i < len(C):
             I = C[i]
             i += 1
 
+            # Kernels of the goto(I,X) sets
+            gotos = {}
+            for p in I:
+                n = p.lr_next
+                if n:
+                    kernel = gotos.get(n.lr_before)
+                    if kernel is None:
+                        gotos[n.lr_before] = [n]
+                    else:
+                        kernel.append(n)
+
             # Collect all of the symbols that could possibly be in the goto(I,X) sets
             asyms = {}
             for ii in I:
                 for s in ii.usyms:
                     asyms[s] = None
 
+            trans = {}
             for x in asyms:
-                g = self.lr0_goto(I, x)
-                if not g or id(g) in self.lr0_cidhash:
+                kernel = gotos.get(x)
+                if kernel is None:
                     continue
-                self.lr0_cidhash[id(g)] = len(C)
-                C.append(g)
+                key = tuple(kernel)
+                j = kernels.get(key)
+                if j is None:
+                    j = kernels[key] = len(C)
+                    C.append(self.lr0_closure(kernel))
+                trans[x] = j
+            transitions.append(trans)
 
         return C
 
@@ -1494,15 +1705,14 @@ class LRTable:
     # -----------------------------------------------------------------------------
 
     def find_nonterminal_transitions(self, C):
-        trans = []
+        trans = {}
         for stateno, state in enumerate(C):
             for p in state:
                 if p.lr_index < p.len - 1:
                     t = (stateno, p.prod[p.lr_index+1])
                     if t[1] in self.grammar.Nonterminals:
-                        if t not in trans:
-                            trans.append(t)
-        return trans
+                        trans[t] = None
+        return list(trans)
 
     # -----------------------------------------------------------------------------
     # dr_relation()
@@ -1510,24 +1720,16 @@ class LRTable:
     # Computes the DR(p,A) relationships for non-terminal transitions.  The input
     # is a tuple (state,N) where state is a number and N is a nonterminal symbol.
     #
-    # Returns a list of terminals.
+    # Returns a bitset of terminals: the terminals shifted in goto(p,A).
     # -----------------------------------------------------------------------------
 
     def dr_relation(self, C, trans, nullable):
         state, N = trans
-        terms = []
-
-        g = self.lr0_goto(C[state], N)
-        for p in g:
-            if p.lr_index < p.len - 1:
-                a = p.prod[p.lr_index+1]
-                if a in self.grammar.Terminals:
-                    if a not in terms:
-                        terms.append(a)
+        terms = self.shift_sets[self.lr0_transitions[state][N]]
 
         # This extra bit is to handle the start state
         if state == 0 and N == self.grammar.Productions[0].prod[0]:
-            terms.append('$end')
+            terms |= self.terminal_bits['$end']
 
         return terms
 
@@ -1539,18 +1741,9 @@ class LRTable:
 
     def reads_relation(self, C, trans, empty):
         # Look for empty transitions
-        rel = []
         state, N = trans
-
-        g = self.lr0_goto(C[state], N)
-        j = self.lr0_cidhash.get(id(g), -1)
-        for p in g:
-            if p.lr_index < p.len - 1:
-                a = p.prod[p.lr_index + 1]
-                if a in empty:
-                    rel.append((j, a))
-
-        return rel
+        j = self.lr0_transitions[state][N]
+        return [(j, a) for a in self.lr0_transitions[j] if a in empty]
 
     # -----------------------------------------------------------------------------
     # compute_lookback_includes()
@@ -1584,10 +1777,11 @@ class LRTable:
         lookdict = {}          # Dictionary of lookback relations
         includedict = {}       # Dictionary of include relations
 
+        transitions = self.lr0_transitions
+        terminals = self.grammar.Terminals
+
         # Make a dictionary of non-terminal transitions
-        dtrans = {}
-        for t in trans:
-            dtrans[t] = 1
+        dtrans = dict.fromkeys(trans)
 
         # Loop over all transitions and compute lookbacks and includes
         for state, N in trans:
@@ -1614,7 +1808,7 @@ class LRTable:
 
                         li = lr_index + 1
                         while li < p.len:
-                            if p.prod[li] in self.grammar.Terminals:
+                            if p.prod[li] in terminals:
                                 break      # No forget it
                             if p.prod[li] not in nullable:
                                 break
@@ -1623,8 +1817,7 @@ class LRTable:
                             # Appears to be a relation between (j,t) and (state,N)
                             includes.append((j, t))
 
-                    g = self.lr0_goto(C[j], t)               # Go to next set
-                    j = self.lr0_cidhash.get(id(g), -1)      # Go to next state
+                    j = transitions[j][t]                    # Go to next state
 
                 # When we get here, j is the final state, now we have to locate the production
                 for r in C[j]:
@@ -1641,9 +1834,7 @@ class LRTable:
                     else:
                         lookb.append((j, r))
             for i in includes:
-                if i not in includedict:
-                    includedict[i] = []
-                includedict[i].append((state, N))
+                includedict.setdefault(i, []).append((state, N))
             lookdict[(state, N)] = lookb
 
         return lookdict, includedict
@@ -1683,8 +1874,8 @@ class LRTable:
     # -----------------------------------------------------------------------------
 
     def compute_follow_sets(self, ntrans, readsets, inclsets):
-        FP = lambda x: readsets[x]
-        R  = lambda x: inclsets.get(x, [])
+        FP = readsets.__getitem__
+        R  = lambda x: inclsets.get(x, ())
         F = digraph(ntrans, R, FP)
         return F
 
@@ -1697,28 +1888,51 @@ class LRTable:
     #            followset         -  Computed follow set
     #
     # This function directly attaches the lookaheads to productions contained
-    # in the lookbacks set
+    # in the lookbacks set.  Lookaheads are collected as bitsets and then
+    # turned into lists of terminals (in the order of terminal_bits).
     # -----------------------------------------------------------------------------
 
     def add_lookaheads(self, lookbacks, followset):
+        collected = {}                     # (state, item) -> lookahead bitset
         for trans, lb in lookbacks.items():
+            f = followset.get(trans, 0)
             # Loop over productions in lookback
             for state, p in lb:
-                if state not in p.lookaheads:
-                    p.lookaheads[state] = []
-                f = followset.get(trans, [])
-                for a in f:
-                    if a not in p.lookaheads[state]:
-                        p.lookaheads[state].append(a)
+                key = (state, p)
+                collected[key] = collected.get(key, 0) | f
+
+        terminals = list(self.terminal_bits)
+        for (state, p), bits in collected.items():
+            laheads = []
+            while bits:
+                low = bits & -bits
+                laheads.append(terminals[low.bit_length() - 1])
+                bits ^= low
+            p.lookaheads[state] = laheads
 
     # -----------------------------------------------------------------------------
     # add_lalr_lookaheads()
     #
     # This function does all of the work of adding lookahead information for use
-    # with LALR parsing
+    # with LALR parsing.
+    #
+    # Sets of terminals are kept as bitsets: every terminal gets a bit in
+    # terminal_bits, and set union is a bitwise or.
     # -----------------------------------------------------------------------------
 
     def add_lalr_lookaheads(self, C):
+        terminals = ['$end'] + [t for t in self.grammar.Terminals if t != '$end']
+        self.terminal_bits = {t: 1 << i for i, t in enumerate(terminals)}
+
+        # Terminals shifted in every state
+        self.shift_sets = []
+        for trans in self.lr0_transitions:
+            bits = 0
+            for a in trans:
+                if a in self.terminal_bits:
+                    bits |= self.terminal_bits[a]
+            self.shift_sets.append(bits)
+
         # Determine all of the nullable nonterminals
         nullable = self.compute_nullable_nonterminals()
 
@@ -1750,6 +1964,8 @@ class LRTable:
         log    = self.log             # Logger for output
 
         actionp = {}                  # Action production array (temporary)
+        Terminals = self.grammar.Terminals
+        Nonterminals = self.grammar.Nonterminals
 
         # Step 1: Construct C = { I0, I1, ... IN}, collection of LR(0) items
         # This determines the number of states
@@ -1757,9 +1973,11 @@ class LRTable:
         C = self.lr0_items()
         self.add_lalr_lookaheads(C)
 
-        # Build the parser table, state by state
+        # Build the parser table, state by state.  Messages of actions are
+        # kept as (format, args) and only formatted by the log.
         st = 0
         for I in C:
+            trans = self.lr0_transitions[st]
             # Loop over each production in I
             actlist = []              # List of actions
             st_action  = {}
@@ -1782,7 +2000,7 @@ class LRTable:
                             # We are at the end of a production.  Reduce!
                             laheads = p.lookaheads[st]
                             for a in laheads:
-                                actlist.append((a, p, 'reduce using rule %d (%s)' % (p.number, p)))
+                                actlist.append((a, p, ('reduce using rule %d (%s)', p.number, p)))
                                 r = st_action.get(a)
                                 if r is not None:
                                     # Whoa. Have a shift/reduce or reduce/reduce conflict
@@ -1837,12 +2055,11 @@ class LRTable:
                     else:
                         i = p.lr_index
                         a = p.prod[i+1]       # Get symbol right after the "."
-                        if a in self.grammar.Terminals:
-                            g = self.lr0_goto(I, a)
-                            j = self.lr0_cidhash.get(id(g), -1)
+                        if a in Terminals:
+                            j = trans.get(a, -1)
                             if j >= 0:
                                 # We are in a shift state
-                                actlist.append((a, p, 'shift and go to state %d' % j))
+                                actlist.append((a, p, ('shift and go to state %d', j)))
                                 r = st_action.get(a)
                                 if r is not None:
                                     # Whoa have a shift/reduce or shift/shift conflict
@@ -1888,7 +2105,7 @@ class LRTable:
             for a, p, m in actlist:
                 if a in st_action:
                     if p is st_actionp[a]:
-                        log.info('    %-15s %s', a, m)
+                        log.info('    %-15s ' + m[0], a, *m[1:])
                         _actprint[(a, m)] = 1
             log.info('')
             # Print the actions that were not used. (debugging)
@@ -1897,7 +2114,7 @@ class LRTable:
                 if a in st_action:
                     if p is not st_actionp[a]:
                         if not (a, m) in _actprint:
-                            log.debug('  ! %-15s [ %s ]', a, m)
+                            log.debug('  ! %-15s [ ' + m[0] + ' ]', a, *m[1:])
                             not_used = 1
                             _actprint[(a, m)] = 1
             if not_used:
@@ -1905,15 +2122,8 @@ class LRTable:
 
             # Construct the goto table for this state
 
-            nkeys = {}
-            for ii in I:
-                for s in ii.usyms:
-                    if s in self.grammar.Nonterminals:
-                        nkeys[s] = None
-            for n in nkeys:
-                g = self.lr0_goto(I, n)
-                j = self.lr0_cidhash.get(id(g), -1)
-                if j >= 0:
+            for n, j in trans.items():
+                if n in Nonterminals:
                     st_goto[n] = j
                     log.info('    %-30s shift and go to state %d', n, j)
 
@@ -1922,6 +2132,69 @@ class LRTable:
             goto[st] = st_goto
             st += 1
 
+# -----------------------------------------------------------------------------
+#                           == LRTable caching ==
+#
+# Building the LALR tables is by far the most expensive part of yacc().  The
+# generated action/goto/production tables can be pickled to a directory and
+# loaded back on the next run.  Each table file is named after a hash of the
+# grammar signature (see ParserReflect.signature()), so the tables are rebuilt
+# automatically as soon as the grammar, the precedence or the tokens change.
+# -----------------------------------------------------------------------------
+
+def table_filename(tabdir, signature):
+    digest = hashlib.sha256(signature.encode('utf-8')).hexdigest()[:24]
+    return os.path.join(tabdir, 'parsetab-%s-%s.pickle' % (__tabversion__, digest))
+
+class CachedLRTable:
+    def __init__(self, action, goto, productions):
+        self.lr_action      = action
+        self.lr_goto        = goto
+        self.lr_productions = productions
+
+    # Read the tables from a pickle file.  Returns None if there is no usable
+    # table for this grammar signature.
+    @classmethod
+    def read_pickle(cls, filename, signature):
+        try:
+            with open(filename, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            return None
+
+        if not isinstance(data, dict) or data.get('tabversion') != __tabversion__:
+            return None
+        if data.get('signature') != signature:
+            return None
+
+        productions = [MiniProduction(*p) for p in data['productions']]
+        return cls(data['action'], data['goto'], productions)
+
+    def bind_callables(self, pdict):
+        for p in self.lr_productions:
+            p.bind(pdict)
+
+# Write the tables of a built LRTable to a pickle file.  The file is written
+# to a temporary name first, so concurrent readers never see a partial table.
+def write_pickle(lr, filename, signature):
+    data = {
+        'tabversion':  __tabversion__,
+        'signature':   signature,
+        'action':      lr.lr_action,
+        'goto':        lr.lr_goto,
+        'productions': [(p.str, p.name, p.len, p.func, os.path.basename(p.file), p.line)
+                        for p in lr.lr_productions],
+    }
+
+    tmpname = '%s.%d.tmp' % (filename, os.getpid())
+    try:
+        with open(tmpname, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpname, filename)
+    finally:
+        if os.path.exists(tmpname):
+            os.remove(tmpname)
+
 # -----------------------------------------------------------------------------
 #                            === INTROSPECTION ===
 #
@@ -2033,8 +2306,10 @@ class ParserReflect(object):
                 parts.append(''.join([''.join(p) for p in self.prec]))
             if self.tokens:
                 parts.append(' '.join(self.tokens))
+            # Names of functions too: cached tables refer to actions by name
             for f in self.pfuncs:
                 if f[3]:
+                    parts.append(f[2])
                     parts.append(f[3])
         except (TypeError, ValueError):
             pass
@@ -2270,7 +2545,7 @@ class ParserReflect(object):
 
 def yacc(*, debug=yaccdebug, module=None, start=None,
          check_recursion=True, optimize=False, debugfile=debug_file,
-         debuglog=None, errorlog=None):
+         debuglog=None, errorlog=None, tabdir=None):
 
     # Reference to the parsing method of the last built parser
     global parse
@@ -2303,6 +2578,22 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
     if pinfo.error:
         raise YaccError('Unable to build parser')
 
+    # Try to reuse the tables generated by a previous run for the same grammar
+    signature = pinfo.signature()
+    tabfile = table_filename(tabdir, signature) if tabdir else None
+    if tabfile:
+        lr = CachedLRTable.read_pickle(tabfile, signature)
+        if lr:
+            try:
+                lr.bind_callables(pinfo.pdict)
+            except KeyError:
+                # Table refers to a function that is gone, build it again
+                lr = None
+        if lr:
+            parser = LRParser(lr, pinfo.error_func)
+            parse = parser.parse
+            return parser
+
     if debuglog is None:
         if debug:
             try:
@@ -2474,6 +2765,13 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
                 errorlog.warning('Rule (%s) is never reduced', rejected)
                 warned_never.append(rejected)
 
+    # Save the tables, so the next run doesn't have to build them again
+    if tabfile:
+        try:
+            write_pickle(lr, tabfile, signature)
+        except OSError as e:
+            errorlog.warning("Couldn't create %r. %s" % (tabfile, e))
+
     # Build the parser
     lr.bind_callables(pinfo.pdict)
     parser = LRParser(lr, pinfo.error_func)
@@ -0,0 +1,69 @@
+class Scopes:
+    """
+    Variables visible at a point of the program, for one analyzer
+
+    All scopes share one table. A definition overwrites the outer one of
+    the same name and writes what it overwrote to the undo log, and
+    leaving a scope undoes definitions made in it. So entering and leaving
+    a scope costs only as much as the definitions in it, not as all
+    visible variables.
+
+    Names are symbols (see tokens.Symbols). Scopes can be entered with
+    push() and pop() or with a `with` block.
+    """
+    def __init__(self):
+        self.table = {}  # symbol -> (depth of scope, definition)
+        self.log = []    # (symbol, entry it overwrote or None)
+        self.marks = []  # Length of the log when scopes were entered
+
+    @property
+    def depth(self):
+        return len(self.marks)
+
+    def push(self):
+        self.marks.append(len(self.log))
+
+    def pop(self):
+        table = self.table
+        log = self.log
+
+        for _ in range(len(log) - self.marks.pop()):
+            symbol, entry = log.pop()
+
+            if entry is None:
+                del table[symbol]
+            else:
+                table[symbol] = entry
+
+    def __enter__(self):
+        self.push()
+        return self
+
+    def __exit__(self, *exc):
+        self.pop()
+
+    def define(self, symbol, definition):
+        """
+        Defines variable in the innermost scope
+
+        Returns its previous definition in this scope (and keeps it), or
+        None if there's none.
+        """
+        entry = self.table.get(symbol)
+        depth = len(self.marks)
+
+        if entry is not None and entry[0] == depth:
+            return entry[1]
+
+        self.log.append((symbol, entry))
+        self.table[symbol] = (depth, definition)
+
+    def lookup(self, symbol):
+        """
+        Definition of variable visible here, or None
+        """
+        entry = self.table.get(symbol)
+        return entry[1] if entry is not None else None
+
+    def __contains__(self, symbol):
+        return symbol in self.table
@@ -0,0 +1,342 @@
+import os
+import json
+import time
+import socket
+import argparse
+import threading
+from collections import deque
+from dataclasses import asdict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import compiler
+    from cache import cache_dir, BuildCache
+    from errors import CompileError, Diagnostic
+    from log import Log
+except (ImportError, ModuleNotFoundError):
+    from . import compiler
+    from .cache import cache_dir, BuildCache
+    from .errors import CompileError, Diagnostic
+    from .log import Log
+
+# Protocol: every connection carries one request and one response, each of
+# them is a single line of JSON.
+#
+#   -> {"op": "compile", "filename": "a.mew", "source": "...", "target": "linux"}
+#   <- {"filename": "a.mew", "code": "...", "diagnostics": [...]}
+#
+#   -> {"op": "stats"}
+#   <- {"requests": 10, "workers": 2, "latency_ms": {"p50": ..., ...}}
+#
+#   -> {"op": "stop"}
+#   <- {"stopping": true}
+#
+# Any failed request is answered with {"error": "message"}: "bad request: ..."
+# for requests that are not valid, "internal error: ..." for bugs of the
+# server.
+
+def default_socket_path():
+    path = os.environ.get("MEW_SERVER_SOCKET")
+    if path:
+        return path
+
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime and os.path.isdir(runtime):
+        return os.path.join(runtime, "mew.sock")
+
+    return os.path.join(cache_dir() or "/tmp", "server.sock")
+
+def result_to_dict(result):
+    return {
+        "filename": result.filename,
+        "code": result.code,
+        "diagnostics": [asdict(i) for i in result.diagnostics],
+    }
+
+def result_from_dict(data):
+    return compiler.Result(
+        data["filename"],
+        data["code"],
+        [Diagnostic(**i) for i in data["diagnostics"]]
+    )
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of already sorted values
+    """
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, round(p / 100 * len(values) + 0.5) - 1))
+    return values[rank]
+
+class CompilerPool:
+    """
+    Pool of warm compilers
+
+    At most `size` compilers exist at once. Compilers that stay unused for
+    `idle_timeout` seconds are dropped, so memory of a quiet server shrinks
+    back. A compiler is also replaced after `max_uses` compilations.
+    """
+    def __init__(self, size, idle_timeout=300.0, max_uses=1000, build_cache=None):
+        self.idle_timeout = idle_timeout
+        self.max_uses = max_uses
+        self.build_cache = build_cache
+
+        self.slots = threading.Semaphore(size)
+        self.lock = threading.Lock()
+        self.idle = {}  # target -> [(compiler, uses, last_used)]
+        self.alive = 0
+
+    def acquire(self, target):
+        self.slots.acquire()
+
+        with self.lock:
+            idle = self.idle.get(target)
+            if idle:
+                comp, uses, _ = idle.pop()
+                return comp, uses
+
+        try:
+            comp = compiler.Compiler(target, build_cache=self.build_cache)
+        except BaseException:
+            self.slots.release()
+            raise
+
+        with self.lock:
+            self.alive += 1
+
+        return comp, 0
+
+    def release(self, target, comp, uses):
+        with self.lock:
+            if uses + 1 < self.max_uses:
+                self.idle.setdefault(target, []).append((comp, uses + 1, time.monotonic()))
+            else:
+                self.alive -= 1
+
+        self.slots.release()
+
+    def recycle(self):
+        """
+        Drops compilers which were idle for too long
+        """
+        deadline = time.monotonic() - self.idle_timeout
+
+        with self.lock:
+            for target, idle in self.idle.items():
+                fresh = [i for i in idle if i[2] >= deadline]
+                self.alive -= len(idle) - len(fresh)
+                self.idle[target] = fresh
+
+class Server:
+    RECYCLE_INTERVAL = 1.0  # Seconds between checks for idle compilers
+
+    def __init__(self, path, workers=4, idle_timeout=300.0, build_cache=None, read_timeout=30.0):
+        self.path = path
+        self.read_timeout = read_timeout  # For a request, so slow clients don't hold workers
+        self.pool = CompilerPool(workers, idle_timeout, build_cache=build_cache)
+        self.executor = ThreadPoolExecutor(workers)
+
+        self.latencies = deque(maxlen=10000)
+        self.requests = 0
+        self.stats_lock = threading.Lock()
+        self.running = False
+
+    def handle_compile(self, request):
+        target = request.get("target", "linux")
+        filename = request.get("filename", "<string>")
+
+        if not isinstance(request.get("source"), str):
+            return {"error": "bad request: `source` must be a string"}
+
+        try:
+            comp, uses = self.pool.acquire(target)
+        except CompileError as e:
+            return result_to_dict(compiler.Result(filename, diagnostics=[e.diagnostic]))
+
+        try:
+            result = comp.compile(request["source"], filename)
+        finally:
+            self.pool.release(target, comp, uses)
+
+        return result_to_dict(result)
+
+    def stats(self):
+        with self.stats_lock:
+            latencies = sorted(self.latencies)
+            requests = self.requests
+
+        return {
+            "requests": requests,
+            "workers": self.pool.alive,
+            "latency_ms": {
+                f"p{p}": round(percentile(latencies, p) * 1000, 3) for p in (50, 90, 99)
+            },
+        }
+
+    def dispatch(self, request):
+        op = request.get("op")
+
+        if op == "compile":
+            return self.handle_compile(request)
+        elif op == "stats":
+            return self.stats()
+        elif op == "stop":
+            self.running = False
+            return {"stopping": True}
+
+        return {"error": f"unknown operation `{op}`"}
+
+    def handle_request(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return {"error": f"bad request: {e}"}
+
+        if not isinstance(request, dict):
+            return {"error": "bad request: request must be a JSON object"}
+
+        try:
+            return self.dispatch(request)
+        except Exception as e:
+            # Still answered, so the client doesn't wait for nothing
+            return {"error": f"internal error: {type(e).__name__}: {e}"}
+
+    def handle_connection(self, conn):
+        with conn:
+            try:
+                line = conn.makefile("rb").readline()
+                start = time.perf_counter()
+                response = self.handle_request(line)
+                conn.sendall(json.dumps(response).encode() + b"\n")
+            except OSError:
+                return
+
+            with self.stats_lock:
+                self.requests += 1
+                self.latencies.append(time.perf_counter() - start)
+
+    def bind(self):
+        if os.path.exists(self.path):
+            # Check if the socket belongs to a living server
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise OSError(f"server is already running on {self.path}")
+            finally:
+                probe.close()
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.path)
+        sock.listen(64)
+        sock.settimeout(1.0)
+        return sock
+
+    def serve_forever(self):
+        sock = self.bind()
+        self.running = True
+
+        print(f"mew: serving on {self.path}")
+
+        next_recycle = time.monotonic() + self.RECYCLE_INTERVAL
+
+        try:
+            while self.running:
+                # Also when busy, when accept() never times out
+                if time.monotonic() >= next_recycle:
+                    self.pool.recycle()
+                    next_recycle = time.monotonic() + self.RECYCLE_INTERVAL
+
+                try:
+                    conn, _ = sock.accept()
+                except socket.timeout:
+                    continue
+
+                # Expiry raises socket.timeout (an OSError), which closes it
+                conn.settimeout(self.read_timeout)
+                self.executor.submit(self.handle_connection, conn)
+        finally:
+            sock.close()
+            self.executor.shutdown()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+def request(path, message):
+    """
+    Sends one request to the server and returns its response
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps(message).encode() + b"\n")
+        line = sock.makefile("rb").readline()
+
+    if not line:
+        raise OSError("server closed the connection without a response")
+
+    try:
+        response = json.loads(line)
+    except ValueError:
+        raise OSError("server sent a response that is not JSON")
+
+    if not isinstance(response, dict):
+        raise OSError("server sent a response that is not a JSON object")
+
+    if "error" in response:
+        raise OSError(response["error"])
+
+    return response
+
+def compile_remote(path, filename, target="linux"):
+    """
+    Compiles a file on the server and returns a Result
+    """
+    try:
+        with open(filename, "r") as f:
+            source = f.read()
+    except OSError as e:
+        return compiler.Result(filename, diagnostics=[
+            Diagnostic("error", f"Can't read file: {e.strerror}", filename)
+        ])
+
+    return result_from_dict(request(path, {
+        "op": "compile", "filename": filename, "source": source, "target": target
+    }))
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog='mew serve',
+                                        description="Keeps warm compilers and serves compile requests")
+    argparser.add_argument("--socket", default=None, help="Path of the Unix socket")
+    argparser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                           help="Maximal number of concurrent compilations")
+    argparser.add_argument("--idle-timeout", type=float, default=300.0,
+                           help="Seconds after which an idle compiler is dropped")
+    argparser.add_argument("--read-timeout", type=float, default=30.0,
+                           help="Seconds to wait for a request before closing the connection")
+    argparser.add_argument("--no-cache", action="store_true", help="Don't use build cache")
+    argparser.add_argument("--status", action="store_true", help="Show statistics of the running server")
+    argparser.add_argument("--stop", action="store_true", help="Stop the running server")
+    args = argparser.parse_args(argv)
+
+    path = args.socket or default_socket_path()
+
+    try:
+        if args.status:
+            stats = request(path, {"op": "stats"})
+            latency = stats["latency_ms"]
+            print(f"requests: {stats['requests']}, workers: {stats['workers']}")
+            print(f"latency: p50 {latency['p50']} ms, p90 {latency['p90']} ms, p99 {latency['p99']} ms")
+        elif args.stop:
+            request(path, {"op": "stop"})
+        else:
+            build_cache = None if args.no_cache else BuildCache.default()
+            server = Server(path, args.workers, args.idle_timeout, build_cache, args.read_timeout)
+            server.serve_forever()
+            print(json.dumps(server.stats()))
+    except OSError as e:
+        Log.error(f"server: {e}")
+        exit(1)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,81 @@
+import re
+from bisect import bisect_right
+
+_newline = re.compile("\n")
+
+class SourceMap:
+    """
+    Maps offsets in one source file to lines and columns
+
+    Built once per file and shared by every stage of compilation. Line
+    starts are found on first use, lookups are a binary search, and lines
+    are sliced from the source only when asked for.
+    """
+    def __init__(self, text, filename=None):
+        self.text = text
+        self.filename = filename
+        self._starts = None
+
+    @property
+    def starts(self):
+        """
+        Offsets of line starts
+        """
+        if self._starts is None:
+            self._starts = [0] + [m.end() for m in _newline.finditer(self.text)]
+        return self._starts
+
+    @property
+    def line_count(self):
+        return len(self.starts)
+
+    def lineno(self, offset):
+        """
+        Line number (from 1) of an offset
+        """
+        return bisect_right(self.starts, offset)
+
+    def location(self, offset):
+        """
+        (line number from 1, column from 0) of an offset
+        """
+        lineno = bisect_right(self.starts, offset)
+        return lineno, offset - self.starts[lineno - 1]
+
+    def line(self, lineno):
+        """
+        Text of a line without newline, None if there's no such line
+        """
+        starts = self.starts
+
+        if not 0 < lineno <= len(starts):
+            return None
+
+        start = starts[lineno - 1]
+        end = starts[lineno] - 1 if lineno < len(starts) else len(self.text)
+
+        return self.text[start:end]
+
+    def locate(self, node):
+        """
+        (line number, column or None) of a node
+
+        Only leaf nodes (names and literals) know their offset (`pos`),
+        others are located by line.
+        """
+        pos = getattr(node, "pos", None)
+        if pos is not None and pos >= 0:  # Made up nodes have -1
+            return self.location(pos)
+
+        return getattr(node, "lineno", None), None
+
+def source_map_of(lexer):
+    """
+    Source map of the text a lexer currently works on (cached in the lexer)
+    """
+    source_map = getattr(lexer, "source_map", None)
+
+    if source_map is None or source_map.text is not lexer.lexdata:
+        source_map = lexer.source_map = SourceMap(lexer.lexdata, getattr(lexer, "filename", None))
+
+    return source_map
@@ -1,32 +1,86 @@
 import os
 import sys
+import hashlib
 import subprocess as sp
-import yaml
 
 try:
-    from log import Log as log
+    from errors import CompileError, Diagnostic
 except ImportError:
-    from .log import Log as log
+    from .errors import CompileError, Diagnostic
 
 class TargetManager:
     def __init__(self, target):
         module_dir = os.path.dirname(os.path.abspath(__file__))
 
+        self.name = target
+
         self.mod_folder = module_dir + "/targets/"
         self.target_folder = self.mod_folder + target + "/"
         self.target_file   = self.mod_folder + target + ".yml"
 
         if not os.path.isdir(self.target_folder):
-            log.error(f"Target `{target}` not found! ({self.target_folder})")
-            exit(1)
+            raise CompileError(
+                Diagnostic("error", f"Target `{target}` not found! ({self.target_folder})")
+            )
+
+        self._config = None
+        self._fingerprint = None
+        self._stats = None  # Of files the fingerprint was made of
+
+    def files(self):
+        """
+        Target configuration and regular files of the target folder
+        """
+        files = [os.path.join(self.target_folder, i) for i in sorted(os.listdir(self.target_folder))]
+        return [self.target_file] + [i for i in files if os.path.isfile(i)]
+
+    def fingerprint(self):
+        """
+        Hash of the target configuration and all target files
+
+        Files are hashed again only if their list, sizes or modification
+        times changed, and then the configuration is loaded again too, so
+        long-living compilers see edited targets. Raises OSError if target
+        files can't be read.
+        """
+        files = self.files()
+        stats = []
+
+        for i in files:
+            st = os.stat(i)
+            stats.append((i, st.st_mtime_ns, st.st_size))
+
+        if stats != self._stats:
+            h = hashlib.sha256()
+
+            for i in files:
+                h.update(os.path.basename(i).encode() + b"\0")
+                with open(i, "rb") as f:
+                    h.update(f.read())
+                h.update(b"\0")
+
+            self._fingerprint = h.hexdigest()
+            self._stats = stats
+            self._config = None
+
+        return self._fingerprint
+
+    @property
+    def config(self):
+        # Target configuration is loaded only when somebody needs it
+        if self._config is None:
+            import yaml
+
+            with open(self.target_file, "r") as f:
+                self._config = yaml.load(f.read(), Loader=yaml.Loader)
 
-        with open(self.target_file, "r") as f:
-            self.config = yaml.load(f.read(), Loader=yaml.Loader)
+        return self._config
 
     def get_file_contents(self, file):
         if not os.path.isfile(self.target_folder + file):
-            log.error(f"File `{file}` not found in target `{self.target.split('/')[-1]}`")
-            exit(1)
+            raise CompileError(
+                Diagnostic("error", f"File `{file}` not found in target `{self.name}`")
+            )
         
         with open(self.target_folder + file, "r") as f:
             data = f.read()
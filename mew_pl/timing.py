@@ -0,0 +1,107 @@
+import time
+import json
+import tracemalloc
+from dataclasses import dataclass, asdict
+from contextlib import contextmanager, nullcontext
+
+@dataclass
+class PassStats:
+    """
+    Time and memory spent by one compilation phase
+    """
+    name: str      # Nested phases are named like "analyze.types"
+    wall: float    # Seconds
+    cpu: float     # Seconds of CPU time of the process
+    peak: int      # Peak of memory allocated during the phase, bytes
+
+class NullTimer:
+    """
+    Timer that doesn't measure anything (used when timing is off)
+    """
+    def phase(self, name):
+        return nullcontext()
+
+class PassTimer:
+    """
+    Measures wall time, CPU time and peak memory of compilation phases
+
+    Phases can be nested. Memory is traced with tracemalloc, which is
+    process-wide, so peaks are only exact when one file is compiled at a time.
+    """
+    def __init__(self):
+        self.passes = []
+        self.stack = []  # [name, start peak, current memory at start] of open phases
+        self.started_tracing = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    def stop(self):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    @contextmanager
+    def phase(self, name):
+        current, peak = tracemalloc.get_traced_memory()
+
+        if self.stack:
+            # Peak is reset for the nested phase, keep the peak of outer one
+            outer = self.stack[-1]
+            outer[1] = max(outer[1], peak)
+            name = outer[0] + "." + name
+
+        tracemalloc.reset_peak()
+        frame = [name, current, current]
+        self.stack.append(frame)
+
+        # Place for the phase in the report (outer phases come first)
+        index = len(self.passes)
+        self.passes.append(None)
+
+        wall = time.perf_counter()
+        cpu = time.process_time()
+
+        try:
+            yield
+        finally:
+            cpu = time.process_time() - cpu
+            wall = time.perf_counter() - wall
+
+            self.stack.pop()
+            frame[1] = max(frame[1], tracemalloc.get_traced_memory()[1])
+
+            if self.stack:
+                self.stack[-1][1] = max(self.stack[-1][1], frame[1])
+
+            self.passes[index] = PassStats(name, wall, cpu, frame[1] - frame[2])
+
+def format_table(passes):
+    """
+    Returns passes as a text table, nested phases are indented
+    """
+    lines = [f"  {'phase':<20} {'wall (ms)':>10} {'cpu (ms)':>10} {'peak (KiB)':>11}"]
+
+    for i in passes:
+        depth = i.name.count(".")
+        name = "  " * depth + i.name.rsplit(".", 1)[-1]
+        lines.append(f"  {name:<20} {i.wall * 1000:10.2f} {i.cpu * 1000:10.2f} {i.peak / 1024:11.1f}")
+
+    top = [i for i in passes if "." not in i.name]
+    lines.append(f"  {'total':<20} {sum(i.wall for i in top) * 1000:10.2f} "
+                 f"{sum(i.cpu for i in top) * 1000:10.2f} {max((i.peak for i in top), default=0) / 1024:11.1f}")
+
+    return "\n".join(lines)
+
+def format_json(results):
+    """
+    Returns passes of all results as a JSON document
+    """
+    return json.dumps({
+        "files": [
+            {"filename": r.filename, "ok": r.ok, "passes": [asdict(i) for i in r.passes]}
+            for r in results
+        ]
+    }, indent=2)
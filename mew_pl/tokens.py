@@ -0,0 +1,279 @@
+from array import array
+
+try:
+    from ply.lex import LexToken, LexError
+except (ImportError, ModuleNotFoundError):
+    from .ply.lex import LexToken, LexError
+
+class Symbols:
+    """
+    Intern table of identifiers
+
+    Every identifier gets a small integer id (its symbol) and one string
+    shared by all its uses. A Compiler has one table for all files it
+    compiles, so later stages can key their tables by symbols.
+    """
+    def __init__(self):
+        self.names = []  # symbol -> identifier
+        self.ids = {}    # identifier -> symbol
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """
+        Returns symbol of identifier, adding it to the table if it's new
+        """
+        symbol = self.ids.get(name)
+
+        if symbol is None:
+            symbol = self.ids[name] = len(self.names)
+            self.names.append(name)
+
+        return symbol
+
+class TokenBuffer:
+    """
+    Tokens of one source stored in columns
+
+    For every token only its type id, offset and length are kept (in
+    arrays), values are sliced from the source when asked for. Values that
+    are not just the text of a token (like numbers) are kept separately.
+    Identifiers are interned in `symbols`, so equal names share one string.
+    """
+    def __init__(self, text, type_names, symbols=None):
+        self.text = text
+        self.type_names = type_names
+        self.id_type = type_names.index("ID") if "ID" in type_names else None
+
+        self.types = array('H')
+        self.offsets = array('I')
+        self.lengths = array('I')
+        self.values = {}  # index -> value of tokens whose value is not their text
+
+        self.symbols = symbols if symbols is not None else Symbols()
+
+    def __len__(self):
+        return len(self.types)
+
+    def type(self, i):
+        return self.type_names[self.types[i]]
+
+    def text_of(self, i):
+        offset = self.offsets[i]
+        return self.text[offset:offset + self.lengths[i]]
+
+    def value(self, i):
+        if i in self.values:
+            return self.values[i]
+
+        if self.types[i] == self.id_type:
+            return self.symbols.names[self.symbol(i)]
+
+        return self.text_of(i)
+
+    def symbol(self, i):
+        """
+        Symbol of identifier token
+        """
+        return self.symbols.intern(self.text_of(i))
+
+    def nbytes(self):
+        """
+        Memory used by token columns
+        """
+        return sum(len(i) * i.itemsize for i in (self.types, self.offsets, self.lengths))
+
+def tokenize(lexer, text, type_names):
+    """
+    Lexes text to a TokenBuffer using rules of a PLY lexer
+
+    Works like Lexer.token(), but makes no object per token: rules that are
+    functions get one reused token object.
+    """
+    buffer = TokenBuffer(text, type_names, getattr(lexer, "symbols", None))
+    ids = {name: i for i, name in enumerate(type_names)}
+
+    add_type = buffer.types.append
+    add_offset = buffer.offsets.append
+    add_length = buffer.lengths.append
+    values = buffer.values
+
+    lexer.input(text)
+    lexer.lineno = 1
+
+    tok = LexToken()
+    tok.lexer = lexer
+
+    master = lexer.lexre
+    ignore = lexer.lexignore
+    length = len(text)
+    pos = 0
+
+    while pos < length:
+        if text[pos] in ignore:
+            pos += 1
+            continue
+
+        for lexre, lexindexfunc in master:
+            m = lexre.match(text, pos)
+            if not m:
+                continue
+
+            func, type_ = lexindexfunc[m.lastindex]
+            end = m.end()
+
+            if not func:
+                # If no token type was set, it's an ignored token
+                if type_:
+                    add_type(ids[type_])
+                    add_offset(pos)
+                    add_length(end - pos)
+                pos = end
+                break
+
+            value = m.group()
+            tok.value = value
+            tok.type = type_
+            tok.lineno = lexer.lineno
+            tok.lexpos = pos
+
+            lexer.lexmatch = m
+            lexer.lexpos = end
+
+            newtok = func(tok)
+            if newtok:
+                # Identifiers are interned to strings equal to their text
+                if newtok.value != value:
+                    values[len(buffer.types)] = newtok.value
+
+                add_type(ids[newtok.type])
+                add_offset(pos)
+                add_length(end - pos)
+
+            pos = lexer.lexpos  # Rule could have moved it
+            break
+        else:
+            if not lexer.lexerrorf:
+                raise LexError(f"Illegal character {text[pos]!r} at index {pos}", text[pos:])
+
+            tok.value = text[pos:]
+            tok.type = "error"
+            tok.lineno = lexer.lineno
+            tok.lexpos = pos
+            lexer.lexpos = pos
+
+            lexer.lexerrorf(tok)
+
+            if lexer.lexpos == pos:
+                raise LexError(f"Scanning error. Illegal character {text[pos]!r}", text[pos:])
+            pos = lexer.lexpos
+
+    lexer.lexpos = pos
+    return buffer
+
+class BufferLexer:
+    """
+    Feeds tokens of a TokenBuffer to the parser
+
+    Token objects are made one at a time, when the parser asks for them.
+    The parser keeps them on its stack and actions read their attributes,
+    so the savings of the buffer are in lexing and in keeping the token
+    stream, not in parsing: every token still becomes one LexToken.
+    """
+    def __init__(self, buffer, lexer, source_map):
+        self.buffer = buffer
+        self.lexer = lexer
+        self.source_map = source_map
+        self.index = 0
+
+    def __getattr__(self, name):
+        return getattr(self.lexer, name)
+
+    def token(self):
+        buffer = self.buffer
+        i = self.index
+
+        if i >= len(buffer.types):
+            return None
+
+        self.index = i + 1
+
+        tok = LexToken()
+        tok.type = buffer.type_names[buffer.types[i]]
+
+        if buffer.types[i] == buffer.id_type:
+            tok.symbol = buffer.symbol(i)
+            tok.value = buffer.symbols.names[tok.symbol]
+        else:
+            tok.value = buffer.value(i)
+        tok.lexpos = buffer.offsets[i]
+        tok.lineno = self.source_map.lineno(tok.lexpos)
+        tok.lexer = self.lexer
+
+        return tok
+
+class TerminatorFilter:
+    """
+    Normalizes statement terminators between the lexer and the parser
+
+    Every run of NEWLINE and SEMICOLON tokens is passed on as one token
+    (SEMICOLON if the run has one, NEWLINE otherwise). Runs at the start of
+    the input and right after `{` are dropped, so blank lines and stray
+    semicolons never become End operations.
+    """
+    TERMINATORS = frozenset(("NEWLINE", "SEMICOLON"))
+
+    def __init__(self, lexer):
+        self.lexer = lexer
+        self.next_token = lexer.token
+
+        self.lookahead = None
+        self.has_lookahead = False
+        self.previous = None  # Type of the last passed token
+
+        self.dropped = 0  # Number of removed tokens
+
+    def __getattr__(self, name):
+        # Parser passes the lexer it was given to p_error
+        return getattr(self.lexer, name)
+
+    def input(self, text):
+        self.lexer.input(text)
+
+    def token(self):
+        if self.has_lookahead:
+            tok = self.lookahead
+            self.has_lookahead = False
+        else:
+            tok = self.next_token()
+
+        if tok is None:
+            return None
+
+        if tok.type not in self.TERMINATORS:
+            self.previous = tok.type
+            return tok
+
+        first = tok
+        semicolon = None
+        length = 0
+
+        while tok is not None and tok.type in self.TERMINATORS:
+            if semicolon is None and tok.type == "SEMICOLON":
+                semicolon = tok
+            length += 1
+            tok = self.next_token()
+
+        self.lookahead = tok
+        self.has_lookahead = True
+
+        if self.previous is None or self.previous == "CURLY_OPEN":
+            self.dropped += length
+            return self.token()
+
+        self.dropped += length - 1
+
+        tok = semicolon or first
+        self.previous = tok.type
+        return tok
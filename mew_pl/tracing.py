@@ -0,0 +1,60 @@
+"""
+Debug tracing of the compiler, enabled by categories:
+
+    MEW_TRACE=parse,types python3 -m mew_pl file.mew
+
+Categories are listed in CATEGORIES, `all` enables all of them. Trace is
+written to stderr, so stdout keeps only the compiler's output.
+
+Every category is a module-level flag, and call sites check it before
+building any message, so disabled tracing costs a single branch:
+
+    if tracing.types:
+        tracing.log("types", "Resolved:", typ)
+"""
+
+import os
+import sys
+
+CATEGORIES = (
+    "parse",      # AST after parsing
+    "types",      # Type resolution
+    "overloads",  # Matching function calls to functions
+    "codegen",    # Code generation
+)
+
+parse = False
+types = False
+overloads = False
+codegen = False
+
+def configure(spec):
+    """
+    Enables categories from comma-separated `spec` (and disables others)
+
+    Returns list of unknown categories
+    """
+    names = {i.strip() for i in spec.split(",") if i.strip()}
+
+    if "all" in names:
+        names.discard("all")
+        names.update(CATEGORIES)
+
+    flags = globals()
+    for i in CATEGORIES:
+        flags[i] = i in names
+
+    return sorted(names - set(CATEGORIES))
+
+def log(category, *args):
+    print(f"[{category}]", *args, file=sys.stderr)
+
+def dump(category, obj):
+    """
+    Pretty-prints an object (like AST) to the trace
+    """
+    from pprint import pformat
+
+    log(category, pformat(obj))
+
+configure(os.environ.get("MEW_TRACE", ""))
@@ -16,7 +16,7 @@ def unpack_func_args(args):
     total = []
 
     for i in args:
-        if type(i) is AST.TypedVarDefinition:
+        if i.kind == AST.TypedVarDefinition.kind:
             curtype = i.type
             array = i.array
             total.append(i)
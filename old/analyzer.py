@@ -4,9 +4,15 @@ from typing import Any
 from dataclasses import dataclass
 
 try:
+    import tracing
     import abstract_syntax_tree as AST
+    from errors import CompileError, Diagnostic
+    from source_map import SourceMap
 except ImportError:
+    from . import tracing
     from . import abstract_syntax_tree as AST
+    from .errors import CompileError, Diagnostic
+    from .source_map import SourceMap
 
 # TODO/FIXME: Add support to check structs and class of DIFFERENT types
 #             
@@ -61,6 +67,8 @@ class ASTAnalyzer:
             "string": AST.String
         }
 
+        self.source_map = SourceMap(self.code, filename)
+
         self.variable_table = {}
         self.func_table = []
 
@@ -68,23 +76,16 @@ class ASTAnalyzer:
         """
         Get line of code we loaded
         """
-        data = self.code.split("\n")
-
-        if ln > len(data):
-            return None
-        
-        return data[ln - 1]
+        return self.source_map.line(ln)
 
     def fatal_error(self, op, message, note=None, fixcode=None):
-        print(Fore.LIGHTRED_EX + "error: " + Fore.RESET + \
-              f"(at {self.filename}:{op.lineno}): " + \
-              message)
-        print(" "*8 + f"{Fore.MAGENTA}{op.lineno}{Fore.RESET} | " + self.__get_line(op.lineno))
-        if note:
-            print(Fore.LIGHTCYAN_EX + "note: " + Fore.RESET + note)
         if fixcode:
-            print(" "*8 + f"{Fore.MAGENTA}{op.lineno}{Fore.RESET} |  " + fixcode)
-        exit(1)
+            note = (note + "\n" if note else "") + \
+                   " "*8 + f"{Fore.MAGENTA}{op.lineno}{Fore.RESET} |  " + fixcode
+        raise CompileError(
+            Diagnostic("error", message, self.filename, op.lineno,
+                       note=note, line=self.__get_line(op.lineno))
+        )
 
     def warn(self, op, message, note=None, fixcode=None):
         print(Fore.LIGHTYELLOW_EX + "warning: " + Fore.RESET + \
@@ -237,18 +238,15 @@ class ASTAnalyzer:
                 # Return it
                 return funcs[n]
 
-        # FIXME: Remake it to real error ↓↓↓
-
-        # Debug information
-        print(f"No one function call arguments for `{funcname}` was found!")
-        print(f"Debug: total found: {len(argument_types_for_every_func)} funcs with the same name")
-        print()
-        print(f"Call is: {funcname}({[i.__name__ for i in call_args_types]})")
-        print()
-        print("Available:")
-        for i in argument_types_for_every_func:
-            print(f"=> {funcname}({[j.__name__ for j in i]})")
-        exit(1)
+        available = "\n".join(
+            f"=> {funcname}({[j.__name__ for j in i]})" for i in argument_types_for_every_func
+        )
+        self.fatal_error(
+            call,
+            f"No one function call arguments for `{funcname}` was found! " + \
+            f"(call is: {funcname}({[i.__name__ for i in call_args_types]}))",
+            "Available:\n" + available
+        )
 
     def resolve_struct_endpoint_type(self, op: AST.Struct, path_elems: list):
         fields = self.unpack_func_args(op.value.value[0].value)
@@ -257,8 +255,7 @@ class ASTAnalyzer:
             if i.var.value == path_elems[0].value:
                 return self.get_type(op, i.type.value)
 
-        print("Debug: Field `{path_elems[0]}` not found in struct `{op.name.value}`")
-        exit(1)
+        self.fatal_error(op, f"Field `{path_elems[0].value}` not found in struct `{op.name.value}`")
 
     def resolve_path_endpoint_type(self, op: AST.Path, path_elems: list):
         start = path_elems[0].value  # Name
@@ -309,7 +306,8 @@ class ASTAnalyzer:
             return self.get_type(binop, binop.obj.value)
 
         if type(binop) is AST.Indexed:
-            print("indexed!")
+            if tracing.types:
+                tracing.log("types", "Indexed:", binop.var.value)
 
             vname = binop.var.value
             typename = self.get_var(binop, vname).type.value
@@ -352,7 +350,8 @@ class ASTAnalyzer:
 
         # Lead to one type
         if bl is br:
-            print("Resolved:", bl, "/", br, "=>", bl)
+            if tracing.types:
+                tracing.log("types", "Resolved:", bl, "/", br, "=>", bl)
             # return type(bl) # if type(bl) is not type else bl
             return bl
         else:
@@ -362,7 +361,6 @@ class ASTAnalyzer:
                 parent,
                 f"An attempt to evaluate binary operation with two unsupported types: ({typenamel} and {typenamer})"
             )
-            exit(1)
         return binop
 
     def analyze_part(self, op, loop=False, func=None):
@@ -4,10 +4,7 @@ set -e  # exit on error
 
 PROJECT="mew_pl/__main__.py"
 
-for i in examples/*.mew; do \
-	echo "=====================" $i "====================="
-	python3 $PROJECT $i
-done;
+python3 $PROJECT -j "$(nproc)" examples/*.mew
 
 
 echo 
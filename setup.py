@@ -7,6 +7,7 @@ exec(open("mew_pl/version.py").read(), {}, local)
 setup(
     name='mew_pl',
     version=local['__version__'],
+    python_requires='>=3.10',
     install_requires=[
         'colorama',
         'pyyaml'